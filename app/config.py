@@ -0,0 +1,64 @@
+import os
+from dotenv import load_dotenv
+
+def load_config():
+    """Build the pipeline configuration from the environment (and .env)."""
+    load_dotenv()
+    return {
+        "SCALE_FACTOR": os.getenv("SCALE_FACTOR", "2"),
+        "UPLOAD_DIR": os.getenv("UPLOAD_DIR", "storage/uploads"),
+        "OUTPUT_DIR": os.getenv("OUTPUT_DIR", "storage/outputs"),
+        "TEMP_DIR": os.getenv("TEMP_DIR", "storage/temp"),
+        "USE_AI": os.getenv("USE_AI", "True"),
+        "MODEL_PATH": os.getenv("MODEL_PATH", "models/RealESRGAN_x4plus.pth"),
+        "MODEL_MANIFEST": os.getenv("MODEL_MANIFEST", "models/manifest.json"),
+        "MODEL_SELECTION": os.getenv("MODEL_SELECTION", "auto"),
+        "BATCH_SIZE": os.getenv("BATCH_SIZE", "4"),
+        "OVERLAP": os.getenv("OVERLAP", "True"),
+        "RING_FRAMES": os.getenv("RING_FRAMES", "0"),
+        "INTERPOLATION": os.getenv("INTERPOLATION", "cubic"),
+        "SHARPEN": os.getenv("SHARPEN", "0"),
+        "OPENCV_THREADS": os.getenv("OPENCV_THREADS", "0"),
+        "TILE_SIZE": os.getenv("TILE_SIZE", "0"),
+        "TILE_OVERLAP": os.getenv("TILE_OVERLAP", "16"),
+        "MEMORY_BUDGET_MB": os.getenv("MEMORY_BUDGET_MB", "2048"),
+        "PRECISION": os.getenv("PRECISION", "fp32"),
+        "CHANNELS_LAST": os.getenv("CHANNELS_LAST", "False"),
+        "COMPILE_MODE": os.getenv("COMPILE_MODE", "off"),
+        "MAX_LOADED_MODELS": os.getenv("MAX_LOADED_MODELS", "2"),
+        "DEDUPE": os.getenv("DEDUPE", "off"),
+        "DEDUPE_CACHE_SIZE": os.getenv("DEDUPE_CACHE_SIZE", "8"),
+        "DEDUPE_THRESHOLD": os.getenv("DEDUPE_THRESHOLD", "1.0"),
+        "INCREMENTAL": os.getenv("INCREMENTAL", "False"),
+        "INCREMENTAL_TILE": os.getenv("INCREMENTAL_TILE", "64"),
+        "INCREMENTAL_MARGIN": os.getenv("INCREMENTAL_MARGIN", "16"),
+        "INCREMENTAL_THRESHOLD": os.getenv("INCREMENTAL_THRESHOLD", "8.0"),
+        "INCREMENTAL_REFRESH": os.getenv("INCREMENTAL_REFRESH", "60"),
+        "WORKERS": os.getenv("WORKERS", "1"),
+        "THREADS_PER_WORKER": os.getenv("THREADS_PER_WORKER", "0"),
+        "CHUNK_MODE": os.getenv("CHUNK_MODE", "time"),
+        "CHUNK_SECONDS": os.getenv("CHUNK_SECONDS", "10"),
+        "SCENE_THRESHOLD": os.getenv("SCENE_THRESHOLD", "0.4"),
+        "CHECKPOINT": os.getenv("CHECKPOINT", "True"),
+        "CHECKPOINT_MAX_AGE_HOURS": os.getenv("CHECKPOINT_MAX_AGE_HOURS", "72"),
+        "STREAM_OUTPUT": os.getenv("STREAM_OUTPUT", "False"),
+        "CPU_PARTITION": os.getenv("CPU_PARTITION", "False"),
+        "CPU_CORES": os.getenv("CPU_CORES", ""),
+        "CPU_AFFINITY": os.getenv("CPU_AFFINITY", "False"),
+        "COORDINATOR": os.getenv("COORDINATOR", "False"),
+        "WORKER_TIMEOUT": os.getenv("WORKER_TIMEOUT", "30"),
+        "WORKER_WAIT": os.getenv("WORKER_WAIT", "60"),
+        "QUEUE_DB": os.getenv("QUEUE_DB", "storage/jobs.db"),
+        "MAX_CONCURRENT_JOBS": os.getenv("MAX_CONCURRENT_JOBS", "1"),
+        "MAX_QUEUED_JOBS": os.getenv("MAX_QUEUED_JOBS", "20"),
+        "MAX_JOB_ATTEMPTS": os.getenv("MAX_JOB_ATTEMPTS", "3"),
+        "QUEUE_ORDER": os.getenv("QUEUE_ORDER", "priority"),
+        "MAX_JOB_SECONDS": os.getenv("MAX_JOB_SECONDS", "0"),
+        "DOWN_TIER": os.getenv("DOWN_TIER", "True"),
+        "CALIBRATE": os.getenv("CALIBRATE", "True"),
+        "PREVIEW_TTL_MINUTES": os.getenv("PREVIEW_TTL_MINUTES", "60"),
+        "PROFILE": os.getenv("PROFILE", "off"),
+        "PROFILE_DIR": os.getenv("PROFILE_DIR", "storage/profiles"),
+        "RESULT_CACHE": os.getenv("RESULT_CACHE", "True"),
+        "RESULT_CACHE_MAX_MB": os.getenv("RESULT_CACHE_MAX_MB", "10240")
+    }
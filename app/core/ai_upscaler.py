@@ -1,23 +1,91 @@
 import torch
 import cv2
 import os
+import threading
+import warnings
+import weakref
 import numpy as np
-from spandrel import ModelLoader, ImageModelDescriptor
-from .base import BaseUpscaler
+from .base import BaseUpscaler, resize_frame, write_frames
+from .model_registry import registry as default_registry
+
+DEFAULT_MODEL_PATH = os.path.join("models", "RealESRGAN_x4plus.pth")
+
+# Smallest tile edge (input pixels) we shrink to before giving up on the model
+MIN_TILE_SIZE = 32
+
+PRECISIONS = ("fp32", "bf16", "int8")
+COMPILE_MODES = ("off", "trace", "compile")
+
+# Traced / compiled forward functions per shared model, dropped with the model
+_compiled_forwards = weakref.WeakKeyDictionary()
+
+def _is_out_of_memory(error):
+    """True if an exception raised during inference means we ran out of memory."""
+    if isinstance(error, MemoryError):
+        return True
+    message = str(error).lower()
+    return "out of memory" in message or "can't allocate memory" in message or "not enough memory" in message
 
 class AIUpscaler(BaseUpscaler):
-    """AI-based upscaler using Spandrel (supports Real-ESRGAN models)."""
-    def __init__(self, scale_factor: int, model_path=None):
+    """AI-based upscaler using Spandrel (supports Real-ESRGAN models).
+
+    Large frames are split into overlapping tiles so peak memory follows the
+    tile size instead of the frame size. ``tile_size=0`` picks the tile edge
+    from ``memory_budget_mb``; a positive value forces that edge in pixels.
+
+    Weights come from a ModelRegistry so every upscaler in the process shares
+    one loaded copy; call close() to hand the model back.
+
+    Execution modes trade a little quality for speed: ``precision`` "bf16"
+    runs the model under bfloat16 autocast and "int8" uses dynamically
+    quantised Linear weights (models without Linear layers run as fp32, and
+    ``precision`` says so); ``channels_last`` keeps weights and activations in
+    NHWC layout; ``compile_mode`` "trace" (TorchScript) or "compile"
+    (torch.compile) builds an optimised forward per input shape, which is
+    cached with the shared model.
+    """
+    def __init__(self, scale_factor: int, model_path=None, tile_size=0, tile_overlap=16, memory_budget_mb=2048, registry=None, device=None,
+                 precision="fp32", channels_last=False, compile_mode="off"):
         super().__init__(scale_factor)
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        if compile_mode not in COMPILE_MODES:
+            raise ValueError(f"Unknown compile mode: {compile_mode}")
+
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.memory_budget_mb = memory_budget_mb
+        # Lowered whenever a tile runs out of memory, so later batches start small
+        self._max_tile_size = None
         
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = torch.device(device)
+
+        self.precision = precision
+        self.channels_last = channels_last
+        self.compile_mode = compile_mode
+        if precision == "int8" and self.device.type != "cpu":
+            print("int8 quantisation is CPU only, using fp32.")
+            self.precision = "fp32"
+        # bf16 autocast runs on the fp32 weights, so it shares them with fp32
+        self._weights = "int8" if self.precision == "int8" else "fp32"
         
         # Default model path if not provided
         if model_path is None:
-            model_path = os.path.join("models", "RealESRGAN_x4plus.pth")
+            model_path = DEFAULT_MODEL_PATH
         
         self.model_path = model_path
         self.model = None
+        self.registry = registry or default_registry
+
+        # Reused between batches; guarded by a lock since callers may share one upscaler
+        self._lock = threading.Lock()
+        self._input_u8 = None
+        self._input_float = None
+        self._output_u8 = None
+        # Frames served by the OpenCV fallback instead of the model
+        self.fallback_frames = 0
         
         if os.path.exists(model_path):
             self._load_model()
@@ -25,55 +93,218 @@ class AIUpscaler(BaseUpscaler):
             print(f"Warning: Model file not found at {model_path}. AI upscaling will fallback to OpenCV until the model is downloaded.")
 
     def _load_model(self):
-        """Load the model using Spandrel."""
+        """Get the shared model from the registry (loaded with Spandrel on first use)."""
         try:
-            loader = ModelLoader()
-            self.model = loader.load_from_file(self.model_path)
-            self.model.to(self.device)
-            self.model.eval()
-            print(f"Loaded AI model from {self.model_path}")
+            self.model = self.registry.acquire(self.model_path, self.device, self._weights, self.channels_last)
         except Exception as e:
             print(f"Failed to load model with Spandrel: {e}")
             self.model = None
+            return
+        if self._weights == "int8" and not self.registry.supports_int8(self.model_path):
+            # The registry served the fp32 weights; say so instead of claiming int8
+            self.precision = self._weights = "fp32"
+        if self.precision == "bf16" and not self.model.supports_bfloat16:
+            print("Model does not support bf16, using fp32.")
+            self.precision = "fp32"
+
+    def close(self):
+        """Release the shared model; the upscaler falls back to OpenCV afterwards."""
+        if self.model is not None:
+            self.model = None
+            self.registry.release(self.model_path, self.device, self._weights, self.channels_last)
+
+    def upscale_array(self, img):
+        return self.upscale_batch([img])[0]
 
-    def upscale(self, frame_path: str, output_path: str):
-        img = cv2.imread(frame_path)
-        if img is None:
-            raise ValueError(f"Could not read frame: {frame_path}")
+    def upscale_batch(self, frames, out=None):
+        """Upscale a batch of BGR frames as one NCHW batch (tiled if needed).
 
+        Args:
+            frames: List of (H, W, 3) uint8 arrays of the same size, or a
+                stacked (N, H, W, 3) array.
+            out: Optional list of writable (H * scale, W * scale, 3) uint8
+                arrays the results are written into, e.g. frame ring slots.
+
+        Returns:
+            ``out``, or a list of upscaled BGR frames owned by the caller.
+            Either way they are copied out of the shared output buffer once,
+            before the lock is released, so threads sharing one upscaler
+            never see each other's frames.
+        """
         if self.model is None:
             # Fallback to OpenCV if model not loaded
-            self._opencv_fallback(img, output_path)
-            return
+            with self._lock:
+                self.fallback_frames += len(frames)
+            return self._opencv_fallback_batch(frames, out)
 
         try:
-            # Convert BGR to RGB and to tensor
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            img_tensor = torch.from_numpy(img_rgb).permute(2, 0, 1).float().divide(255).unsqueeze(0).to(self.device)
-
-            with torch.no_grad():
-                # Spandrel models handle the forward pass
-                output_tensor = self.model(img_tensor)
-                
-                # Convert back to numpy/BGR
-                output_img = output_tensor.squeeze(0).permute(1, 2, 0).cpu().clamp(0, 1).numpy()
-                output_img = (output_img * 255).astype(np.uint8)
-                output_img = cv2.cvtColor(output_img, cv2.COLOR_RGB2BGR)
-                
+            with self._lock, torch.inference_mode():
+                batch = self._infer_batch(frames)
                 # Resize to exact scale factor if model output differs (Real-ESRGAN x4 usually outputs 4x)
-                if self.scale_factor != 4:
-                    h, w = img.shape[:2]
+                if self.scale_factor != self.model.scale:
+                    h, w = frames[0].shape[:2]
                     target_size = (w * self.scale_factor, h * self.scale_factor)
-                    output_img = cv2.resize(output_img, target_size, interpolation=cv2.INTER_LANCZOS4)
-                
-                cv2.imwrite(output_path, output_img)
-                
+                    targets = out if out is not None else [None] * len(batch)
+                    results = [cv2.resize(img, target_size, dst=target, interpolation=cv2.INTER_LANCZOS4)
+                               for img, target in zip(batch, targets)]
+                    return out if out is not None else results
+                # The output buffer is reused by the next call, from any thread
+                return write_frames(batch, out) if out is not None else list(batch.copy())
+
         except Exception as e:
             print(f"AI Upscaling failed: {e}. Falling back to OpenCV.")
-            self._opencv_fallback(img, output_path)
+            with self._lock:
+                self.fallback_frames += len(frames)
+            return self._opencv_fallback_batch(frames, out)
+
+    def _infer_batch(self, frames):
+        """Run frames through the model as one NCHW tensor, reusing buffers."""
+        n = len(frames)
+        h, w = frames[0].shape[:2]
+        scale = self.model.scale
+
+        if self._input_u8 is None or tuple(self._input_u8.shape) != (n, h, w, 3):
+            pin = self.device.type == 'cuda'
+            self._input_u8 = torch.empty((n, h, w, 3), dtype=torch.uint8, pin_memory=pin)
+            self._input_float = torch.empty((n, 3, h, w), dtype=torch.float32, device=self.device)
+            self._output_u8 = torch.empty((n, h * scale, w * scale, 3), dtype=torch.uint8)
+
+        # Stage frames in the pinned/host buffer without building a new stacked array
+        staging = self._input_u8.numpy()
+        for i, img in enumerate(frames):
+            staging[i] = img
+
+        # BGR (NHWC uint8) -> RGB (NCHW float) with the channel swap done by the copy
+        source = self._input_u8.to(self.device, non_blocking=True)
+        for c in range(3):
+            self._input_float[:, c].copy_(source[..., 2 - c])
+        self._input_float.div_(255)
+
+        tile = self._pick_tile_size(n, h, w)
+        while True:
+            try:
+                self._run_tiles(h, w, tile)
+                break
+            except (RuntimeError, MemoryError) as e:
+                if not _is_out_of_memory(e) or tile <= MIN_TILE_SIZE:
+                    raise
+                tile = max(MIN_TILE_SIZE, min(tile, max(h, w)) // 2)
+                self._max_tile_size = tile
+                print(f"Out of memory during inference, retrying with {tile}px tiles...")
+
+        return self._output_u8.numpy()
+
+    def _pick_tile_size(self, n, h, w):
+        """Tile edge in input pixels for a batch of n frames of size h x w."""
+        if self.tile_size > 0:
+            tile = self.tile_size
+        else:
+            # Rough activation footprint of an RRDB-style network per input pixel (fp32)
+            bytes_per_pixel = 4 * (256 + 192 * self.model.scale ** 2)
+            budget = self.memory_budget_mb * 1024 * 1024
+            tile = int((budget / (bytes_per_pixel * n)) ** 0.5)
+            tile = max(MIN_TILE_SIZE, tile - tile % 8)
+
+        if self._max_tile_size is not None:
+            tile = min(tile, self._max_tile_size)
+        return tile
+
+    @staticmethod
+    def _tile_starts(length, tile, overlap):
+        """Start offsets of tiles covering [0, length), the last one flush with the edge."""
+        if tile >= length:
+            return [0]
+        stride = tile - overlap
+        return list(range(0, length - tile, stride)) + [length - tile]
+
+    def _blend_mask(self, height, width, top, left):
+        """Weights for a tile's output that ramp in over the overlap with earlier tiles."""
+        ramp_y = torch.ones(height, device=self.device)
+        ramp_x = torch.ones(width, device=self.device)
+        if top:
+            ramp_y[:top] = torch.arange(1, top + 1, device=self.device) / (top + 1)
+        if left:
+            ramp_x[:left] = torch.arange(1, left + 1, device=self.device) / (left + 1)
+        return torch.minimum(ramp_y[:, None], ramp_x[None, :])[None, :, :, None]
+
+    def _run_tiles(self, h, w, tile):
+        """Run the staged input through the model tile by tile into the output buffer.
+
+        Tiles are visited in raster order; where a tile overlaps the ones above
+        or to its left its output is cross-faded into what is already there, so
+        only one tile's activations are alive at a time.
+        """
+        scale = self.model.scale
+        overlap = min(self.tile_overlap, tile // 2)
+        ys = self._tile_starts(h, tile, overlap)
+        xs = self._tile_starts(w, tile, overlap)
+
+        for iy, y0 in enumerate(ys):
+            y1 = min(y0 + tile, h)
+            top = ys[iy - 1] + tile - y0 if iy > 0 else 0
+            for ix, x0 in enumerate(xs):
+                x1 = min(x0 + tile, w)
+                left = xs[ix - 1] + tile - x0 if ix > 0 else 0
+
+                output = self._forward(self._input_float[:, :, y0:y1, x0:x1])
+                output.clamp_(0, 1).mul_(255)
+
+                region = self._output_u8[:, y0 * scale:y1 * scale, x0 * scale:x1 * scale]
+                if not top and not left:
+                    # Quantise in place and swap back to BGR (NHWC uint8) on the host
+                    output.round_()
+                    for c in range(3):
+                        region[..., c].copy_(output[:, 2 - c])
+                else:
+                    alpha = self._blend_mask((y1 - y0) * scale, (x1 - x0) * scale, top * scale, left * scale)
+                    tile_bgr = output.flip(1).permute(0, 2, 3, 1)
+                    blended = torch.lerp(region.to(self.device, torch.float32), tile_bgr, alpha)
+                    region.copy_(blended.round_())
+
+    def _forward(self, batch):
+        """One model call in the configured precision, layout and compile mode."""
+        if self.channels_last:
+            batch = batch.contiguous(memory_format=torch.channels_last)
+        _, _, h, w = batch.shape
+        with torch.autocast(self.device.type, dtype=torch.bfloat16, enabled=self.precision == "bf16"):
+            # Compiled forwards bypass Spandrel's padding, so only use them on sizes that need none
+            if self.compile_mode != "off" and self.model.size_requirements.check(w, h):
+                try:
+                    output = self._compiled_forward(batch)(batch)
+                except Exception as e:
+                    if _is_out_of_memory(e):
+                        raise
+                    print(f"Model {self.compile_mode} failed ({e}), running it eagerly.")
+                    self.compile_mode = "off"
+                    output = self.model(batch)
+            else:
+                # Spandrel models handle the forward pass
+                output = self.model(batch)
+        # Quantise from fp32 so bf16 rounding does not add to the 8-bit rounding
+        return output if output.dtype == torch.float32 else output.float()
+
+    def _compiled_forward(self, batch):
+        """Traced or compiled forward for this batch shape, built on first use."""
+        forwards = _compiled_forwards.setdefault(self.model, {})
+        # torch.compile specialises on shapes itself; TorchScript traces one shape
+        shape = tuple(batch.shape) if self.compile_mode == "trace" else None
+        key = (self.compile_mode, self.precision, shape)
+        forward = forwards.get(key)
+        if forward is None:
+            if self.compile_mode == "trace":
+                with warnings.catch_warnings():
+                    # torch.jit.trace is deprecated in favour of torch.compile but still works
+                    warnings.simplefilter("ignore", FutureWarning)
+                    forward = torch.jit.trace(self.model.model, batch)
+            else:
+                forward = torch.compile(self.model.model, dynamic=False)
+            forwards[key] = forward
+        return forward
+
+    def _opencv_fallback(self, img, out=None):
+        return resize_frame(img, self.scale_factor, cv2.INTER_CUBIC, out=out)
 
-    def _opencv_fallback(self, img, output_path):
-        height, width = img.shape[:2]
-        new_size = (width * self.scale_factor, height * self.scale_factor)
-        upscaled = cv2.resize(img, new_size, interpolation=cv2.INTER_CUBIC)
-        cv2.imwrite(output_path, upscaled)
+    def _opencv_fallback_batch(self, frames, out):
+        targets = out if out is not None else [None] * len(frames)
+        results = [self._opencv_fallback(img, target) for img, target in zip(frames, targets)]
+        return out if out is not None else results
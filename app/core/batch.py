@@ -0,0 +1,162 @@
+import csv
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .chunking import default_threads_per_worker
+from .resources import resource_manager_from_config
+
+# Files picked up when a directory is given
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v")
+
+# Columns of the CSV report, in order
+REPORT_FIELDS = ["input", "output", "status", "seconds", "frames", "fps", "error"]
+
+def collect_inputs(source=None, manifest=None):
+    """Videos to process from a directory, a glob pattern and/or a manifest.
+
+    Args:
+        source: A directory (its video files, not recursive), a glob
+            pattern (``**`` recurses) or a single file.
+        manifest: Text file with one path per line; blank lines and lines
+            starting with # are skipped, relative paths are resolved
+            against the manifest's directory.
+
+    Returns:
+        Sorted list of unique paths.
+    """
+    paths = []
+    if source:
+        if os.path.isdir(source):
+            paths += [
+                os.path.join(source, name) for name in os.listdir(source)
+                if name.lower().endswith(VIDEO_EXTENSIONS) and os.path.isfile(os.path.join(source, name))
+            ]
+        elif os.path.isfile(source):
+            paths.append(source)
+        else:
+            paths += [path for path in glob.glob(source, recursive=True) if os.path.isfile(path)]
+    if manifest:
+        base_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    paths.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return sorted(set(paths))
+
+def is_up_to_date(input_path, output_path):
+    """True if the output exists and is newer than its input."""
+    return os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+
+def run_batch(config, inputs, jobs=1, force=False):
+    """Upscale many videos in one process, sharing the loaded upscaler.
+
+    One UpscalePipeline is built per concurrent job up front and reused for
+    every file it takes; AI models come from the process-wide registry, so
+    they are loaded once however many jobs run. With CPU_PARTITION enabled
+    each file gets a CpuBudget of an even share of the cores per job;
+    otherwise, with several jobs and OPENCV_THREADS unset, the OpenCV tier's
+    threads are split evenly between them.
+
+    Args:
+        config: Pipeline configuration.
+        inputs: Video paths, e.g. from collect_inputs().
+        jobs: Videos processed at the same time.
+        force: Also process inputs whose output is already up to date.
+
+    Returns:
+        One report row per input (see REPORT_FIELDS), in input order.
+        status is "completed", "skipped" or "failed".
+    """
+    from .pipeline import UpscalePipeline
+
+    jobs = max(1, jobs)
+    resources = resource_manager_from_config(config, max_jobs=jobs)
+    if resources is None and jobs > 1 and int(config.get("OPENCV_THREADS", 0)) == 0:
+        config = dict(config, OPENCV_THREADS=str(default_threads_per_worker(jobs)))
+    pipeline = UpscalePipeline(config)
+
+    rows = []
+    outputs = {}
+    work = []
+    for input_path in inputs:
+        output_path = pipeline.output_path_for(input_path)
+        row = {"input": input_path, "output": output_path, "status": None, "seconds": 0.0,
+               "frames": 0, "fps": None, "error": None}
+        rows.append(row)
+        # Output names only depend on the file name, so the first input with a name wins
+        if output_path in outputs:
+            row.update(status="failed", error=f"Output name clashes with {outputs[output_path]}")
+        elif not force and is_up_to_date(input_path, output_path):
+            row["status"] = "skipped"
+        else:
+            work.append(row)
+        outputs.setdefault(output_path, input_path)
+
+    jobs = max(1, min(jobs, len(work)))
+    pipelines = queue.Queue()
+    pipelines.put(pipeline)
+    for _ in range(jobs - 1):
+        pipelines.put(UpscalePipeline(config))
+    finished = [0]
+    lock = threading.Lock()
+
+    def process(row):
+        pipeline = pipelines.get()
+        pipeline.budget = resources.acquire(row["input"]) if resources is not None else None
+        start = time.time()
+        try:
+            result = pipeline.process(row["input"])
+            row.update(status="completed", frames=result["frames"])
+        except Exception as e:
+            row.update(status="failed", error=str(e))
+        finally:
+            if pipeline.budget is not None:
+                pipeline.budget.release()
+            pipelines.put(pipeline)
+        row["seconds"] = round(time.time() - start, 2)
+        if row["frames"] and row["seconds"] > 0:
+            row["fps"] = round(row["frames"] / row["seconds"], 2)
+        with lock:
+            finished[0] += 1
+            detail = f"{row['fps']} fps" if row["status"] == "completed" else row["error"]
+            print(f"[{finished[0]}/{len(work)}] {row['input']}: {row['status']} in {row['seconds']}s ({detail})")
+
+    print(f"Batch: {len(work)} to process, {len(inputs) - len(work)} skipped, {jobs} at a time.")
+    try:
+        with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="batch-job") as executor:
+            list(executor.map(process, work))
+    finally:
+        while not pipelines.empty():
+            pipelines.get().close()
+    return rows
+
+def summarize(rows, seconds):
+    """Totals over report rows."""
+    completed = [row for row in rows if row["status"] == "completed"]
+    frames = sum(row["frames"] for row in completed)
+    return {
+        "files": len(rows),
+        "completed": len(completed),
+        "skipped": sum(row["status"] == "skipped" for row in rows),
+        "failed": sum(row["status"] == "failed" for row in rows),
+        "frames": frames,
+        "seconds": round(seconds, 2),
+        "fps": round(frames / seconds, 2) if seconds > 0 else None
+    }
+
+def write_report(rows, summary, path):
+    """Write the report as CSV (by extension) or JSON with the summary."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "files": rows}, f, indent=2)
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+def hash_file(path):
+    """sha256 of a file's full content.
+
+    Used to recognise a re-submitted input even when it was uploaded under a
+    different name. Every byte counts: inputs that differ anywhere must never
+    resume from each other's chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _acquire_lock(path):
+    """Exclusive, non-blocking OS lock on a lock file, or None if another job holds it.
+
+    The OS drops the lock when its holder exits, so a crashed job never
+    leaves a directory locked. Locks taken through separate opens conflict
+    within one process too, so concurrent jobs in a server or batch run
+    exclude each other.
+    """
+    while True:
+        f = open(path, "a+b")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+        # The previous holder may have removed the file after we opened it
+        try:
+            if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                return f
+        except FileNotFoundError:
+            pass
+        f.close()
+
+def _release_lock(lock, path):
+    # Removed while still held, so nobody can lock the old file in between
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    lock.close()
+
+def prune_checkpoints(temp_dir, max_age_sec):
+    """Delete resume directories untouched for max_age_sec that no running job holds.
+
+    Failed jobs keep their chunks so a re-submission can resume; this stops
+    the ones nobody re-submits from piling up.
+    """
+    if not max_age_sec or not os.path.isdir(temp_dir):
+        return
+    now = time.time()
+    for name in os.listdir(temp_dir):
+        work_dir = os.path.join(temp_dir, name)
+        if not name.startswith("resume_") or not os.path.isdir(work_dir):
+            continue
+        manifest_path = os.path.join(work_dir, "manifest.json")
+        touched = os.path.getmtime(manifest_path if os.path.exists(manifest_path) else work_dir)
+        if now - touched < max_age_sec:
+            continue
+        lock = _acquire_lock(work_dir + ".lock")
+        if lock is None:
+            continue
+        shutil.rmtree(work_dir, ignore_errors=True)
+        _release_lock(lock, work_dir + ".lock")
+
+class Checkpoint:
+    """Tracks which chunks of a job are finished so the job can resume.
+
+    Each finished chunk is an encoded segment in ``work_dir``; a small
+    ``manifest.json`` next to them records the chunk plan, the settings it was
+    made with and which chunks are complete. A manifest written with different
+    settings is ignored and the work directory starts over, as it does when
+    ``resume`` is False.
+
+    Checkpoints from for_job() hold a lock on their directory until
+    release() or discard(), so no two running jobs ever share one.
+    """
+    def __init__(self, work_dir, settings, resume=True):
+        self.work_dir = work_dir
+        self.settings = settings
+        self.manifest_path = os.path.join(work_dir, "manifest.json")
+        self.resume = resume
+        self.chunks = None
+        self.completed = {}
+        self._lock = None
+
+        if not resume:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        elif os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = None
+            if manifest and manifest.get("settings") == settings:
+                self.chunks = [tuple(chunk) for chunk in manifest["chunks"]]
+                self.completed = {
+                    int(index): tuple(stats) for index, stats in manifest["completed"].items()
+                    if os.path.exists(self.segment_path(int(index)))
+                }
+            else:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir, exist_ok=True)
+
+    @classmethod
+    def for_job(cls, temp_dir, video_path, settings, content_hash=None, max_age_sec=0):
+        """Checkpoint whose location depends only on the input content and settings.
+
+        If an identical job is already running from that directory, this job
+        gets a private, non-resumable directory instead of sharing it.
+
+        Args:
+            temp_dir: Directory holding the resume_* directories.
+            video_path: Path to the source video.
+            settings: Settings that change the output.
+            content_hash: sha256 of the input if already known (else computed).
+            max_age_sec: Also prune resume directories idle for this long (0 keeps them).
+        """
+        os.makedirs(temp_dir, exist_ok=True)
+        prune_checkpoints(temp_dir, max_age_sec)
+        key_source = json.dumps({"input": content_hash or hash_file(video_path), "settings": settings}, sort_keys=True)
+        key = hashlib.sha256(key_source.encode()).hexdigest()[:16]
+        work_dir = os.path.join(temp_dir, f"resume_{key}")
+        lock = _acquire_lock(work_dir + ".lock")
+        resume = lock is not None
+        if not resume:
+            print(f"An identical job is using {work_dir}; working in a private directory instead.")
+            work_dir = f"{work_dir}_{uuid.uuid4().hex[:8]}"
+            lock = _acquire_lock(work_dir + ".lock")
+        checkpoint = cls(work_dir, settings, resume=resume)
+        checkpoint._lock = lock
+        return checkpoint
+
+    def set_chunks(self, chunks):
+        self.chunks = [tuple(chunk) for chunk in chunks]
+        self.completed = {}
+        self._save()
+        return self.chunks
+
+    def segment_path(self, index):
+        return os.path.join(self.work_dir, f"chunk_{index:05d}.mp4")
+
+    def segment_paths(self):
+        return [self.segment_path(i) for i in range(len(self.chunks))]
+
+    def is_done(self, index):
+        return index in self.completed
+
+    def mark_done(self, index, frames, reused):
+        """Record a finished chunk (its segment must already be fully written)."""
+        self.completed[index] = (frames, reused)
+        self._save()
+
+    def totals(self):
+        """(frames, frames reused) over all completed chunks."""
+        return (
+            sum(stats[0] for stats in self.completed.values()),
+            sum(stats[1] for stats in self.completed.values())
+        )
+
+    def discard(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        self.release()
+
+    def release(self):
+        """Let other jobs use the work directory again (kept for resuming)."""
+        if self._lock is not None:
+            _release_lock(self._lock, self.work_dir + ".lock")
+            self._lock = None
+
+    def _save(self):
+        manifest = {
+            "settings": self.settings,
+            "chunks": self.chunks,
+            "completed": {str(index): stats for index, stats in self.completed.items()}
+        }
+        # Write then rename so a crash never leaves a half-written manifest
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,89 @@
+import os
+from .metrics import JobMetrics
+
+def _merge_cuts(cuts, total_frames, min_frames):
+    """Turn candidate cut frames into chunk boundaries at least min_frames apart."""
+    boundaries = [0]
+    for cut in sorted(set(cuts)):
+        if cut - boundaries[-1] >= min_frames and total_frames - cut >= min_frames:
+            boundaries.append(cut)
+    return boundaries
+
+def plan_chunks(ffmpeg, video_path, meta, mode="time", chunk_seconds=10, scene_threshold=0.4):
+    """Split a video into frame ranges that can be upscaled independently.
+
+    Args:
+        ffmpeg: FFmpegRunner used to probe keyframes / scene cuts.
+        video_path: Path to the source video.
+        meta: Metadata from FFmpegRunner.get_video_metadata.
+        mode: "time" for fixed-length chunks, "keyframe" to cut only at
+            keyframes, or "scene" to cut at detected scene changes.
+        chunk_seconds: Chunk length for "time"; minimum length otherwise.
+        scene_threshold: Scene change score (0-1) used by "scene".
+
+    Returns:
+        List of (start_frame, frame_count) tuples in order. The last chunk's
+        frame_count is None so it reads to the end of the stream even if the
+        container's frame count is off.
+    """
+    total = meta['frames']
+    chunk_frames = max(1, int(round(chunk_seconds * meta['fps'])))
+
+    if mode == "time":
+        boundaries = list(range(0, max(total, 1), chunk_frames))
+    elif mode in ("keyframe", "scene"):
+        if mode == "keyframe":
+            times = ffmpeg.get_keyframe_times(video_path)
+        else:
+            times = ffmpeg.detect_scene_cuts(video_path, scene_threshold)
+        cuts = [int(round((t - meta['start_time']) * meta['fps'])) for t in times]
+        boundaries = _merge_cuts([c for c in cuts if 0 < c < total], total, chunk_frames)
+    else:
+        raise ValueError(f"Unknown chunk mode: {mode}")
+
+    chunks = []
+    for i, start in enumerate(boundaries):
+        end = boundaries[i + 1] if i + 1 < len(boundaries) else None
+        chunks.append((start, end - start if end is not None else None))
+    return chunks
+
+# Per-process state for pool workers (each worker builds its own upscaler once)
+_worker_pipeline = None
+
+def init_worker(config, threads):
+    """Process pool initializer: cap library threads and build the worker's pipeline."""
+    global _worker_pipeline
+    import cv2
+    cv2.setNumThreads(threads)
+    if config.get("USE_AI", "True").lower() == "true":
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    from .pipeline import UpscalePipeline
+    # The OpenCV tier's own thread pool must stay inside this worker's budget
+    _worker_pipeline = UpscalePipeline(dict(config, OPENCV_THREADS=str(threads)))
+    # And so must every FFmpeg process the worker starts
+    _worker_pipeline.ffmpeg.threads = threads
+
+def process_chunk(video_path, meta, start_frame, frame_count, segment_path):
+    """Upscale one frame range into a video-only segment. Runs in a pool worker.
+
+    Returns:
+        (frames written, frames reused, JobMetrics.as_dict() for the chunk)
+    """
+    metrics = JobMetrics()
+    written, reused = _worker_pipeline.upscale_range(
+        video_path,
+        meta,
+        segment_path,
+        start_frame=start_frame,
+        frame_count=frame_count,
+        metrics=metrics
+    )
+    return written, reused, metrics.as_dict()
+
+def default_threads_per_worker(workers):
+    return max(1, (os.cpu_count() or 1) // workers)
@@ -0,0 +1,404 @@
+import json
+import os
+import queue
+import shutil
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import OrderedDict
+from .metrics import JobMetrics
+
+class ChunkCoordinator:
+    """Hands chunks of running jobs to remote workers and collects their segments.
+
+    Workers register, then repeatedly lease a chunk, upscale it and upload the
+    encoded segment (see ChunkWorker). A worker that has not been heard from
+    for ``worker_timeout`` seconds is dropped and its chunks go back to the
+    front of the queue. A chunk that was leased ``max_attempts`` times
+    without finishing fails its job. If a lost worker's upload arrives after
+    all, the first finished copy of a chunk wins and later ones are refused.
+
+    Jobs call run_chunks() from their own thread and block until every chunk
+    is back, so the pipeline joins segments exactly as it does locally. If
+    no worker is registered for ``worker_wait`` seconds, the job takes its
+    remaining chunks back to process them itself.
+    There is no authentication: only expose the worker API on a trusted network.
+    """
+    def __init__(self, worker_timeout=30, max_attempts=3, worker_wait=60, clock=time.time):
+        self.worker_timeout = worker_timeout
+        self.worker_wait = worker_wait
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._jobs = {}
+        self._tasks = {}
+        self._pending = []
+
+    @property
+    def heartbeat_seconds(self):
+        """How often workers should check in: several beats fit in one timeout."""
+        return max(self.worker_timeout / 3, 0.5)
+
+    def register(self, name):
+        worker_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._workers[worker_id] = {"name": name, "last_seen": self.clock(), "chunks_done": 0}
+        print(f"Worker {name} registered as {worker_id}")
+        return worker_id
+
+    def heartbeat(self, worker_id):
+        """Mark a worker alive; False if it is unknown (e.g. dropped), so it re-registers."""
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if worker is None:
+                return False
+            worker["last_seen"] = self.clock()
+            return True
+
+    def workers(self):
+        """Registered workers with their current chunk, for monitoring."""
+        self.reap()
+        now = self.clock()
+        with self._lock:
+            leased = {task["worker_id"]: task["task_id"] for task in self._tasks.values() if task["worker_id"]}
+            return [
+                {
+                    "worker_id": worker_id,
+                    "name": worker["name"],
+                    "seconds_since_seen": round(now - worker["last_seen"], 1),
+                    "chunks_done": worker["chunks_done"],
+                    "task_id": leased.get(worker_id)
+                }
+                for worker_id, worker in self._workers.items()
+            ]
+
+    def lease(self, worker_id):
+        """Next chunk for a worker, or None when there is nothing to do.
+
+        Raises:
+            KeyError: The worker is not registered.
+        """
+        self.reap()
+        with self._lock:
+            if worker_id not in self._workers:
+                raise KeyError(worker_id)
+            self._workers[worker_id]["last_seen"] = self.clock()
+            if not self._pending:
+                return None
+            task = self._tasks[self._pending.pop(0)]
+            task["worker_id"] = worker_id
+            task["attempts"] += 1
+            job = self._jobs[task["job_id"]]
+            return {
+                "task_id": task["task_id"],
+                "job_id": task["job_id"],
+                "index": task["index"],
+                "start_frame": task["start_frame"],
+                "frame_count": task["frame_count"],
+                "meta": job["meta"],
+                "settings": job["settings"]
+            }
+
+    def input_path(self, job_id):
+        """Source video of a running job (KeyError once the job is gone)."""
+        with self._lock:
+            return self._jobs[job_id]["video_path"]
+
+    def upload_path(self, task_id, worker_id):
+        """Where a worker's upload is staged before complete() accepts it.
+
+        Raises:
+            KeyError: The chunk is unknown or already finished.
+        """
+        with self._lock:
+            task = self._tasks[task_id]
+            return f"{task['segment_path']}.{worker_id}.part"
+
+    def complete(self, task_id, worker_id, upload_path, frames, reused, metrics):
+        """Accept an uploaded segment; False if the chunk was already finished or cancelled."""
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            if task is None:
+                return False
+            if task_id in self._pending:
+                # Reassigned in the meantime, but this copy is complete
+                self._pending.remove(task_id)
+            os.replace(upload_path, task["segment_path"])
+            if worker_id in self._workers:
+                self._workers[worker_id]["last_seen"] = self.clock()
+                self._workers[worker_id]["chunks_done"] += 1
+            self._jobs[task["job_id"]]["events"].put(("done", task["index"], (frames, reused, metrics)))
+        return True
+
+    def fail(self, task_id, worker_id, error):
+        """A worker could not process a chunk: retry it elsewhere or fail the job."""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task["worker_id"] != worker_id:
+                return
+            print(f"Chunk {task['index']} failed on worker {worker_id}: {error}")
+            self._release(task, error)
+
+    def reap(self):
+        """Drop workers that stopped sending heartbeats and requeue their chunks."""
+        now = self.clock()
+        with self._lock:
+            dead = [wid for wid, w in self._workers.items() if now - w["last_seen"] > self.worker_timeout]
+            for worker_id in dead:
+                print(f"Worker {self._workers[worker_id]['name']} ({worker_id}) timed out")
+                del self._workers[worker_id]
+            for task in list(self._tasks.values()):
+                if task["worker_id"] in dead:
+                    self._release(task, f"worker {task['worker_id']} stopped responding")
+
+    def run_chunks(self, video_path, meta, settings, chunks, segment_path, on_done, poll_seconds=1.0):
+        """Have workers upscale chunks of a video and wait until all are done.
+
+        Args:
+            video_path: Source video, served to workers by input_path().
+            meta: Metadata from FFmpegRunner.get_video_metadata.
+            settings: Config values workers apply on top of their own config.
+            chunks: List of (index, start_frame, frame_count) to process.
+            segment_path: callable(index) -> where the chunk's segment goes.
+            on_done: callable(index, frames, reused, metrics dict), called
+                from this thread as each segment arrives.
+            poll_seconds: How often to check for lost workers while waiting.
+
+        Returns:
+            Chunks (index, start_frame, frame_count) taken back because no
+            worker was registered for ``worker_wait`` seconds; the caller
+            processes them locally. Empty when workers did everything.
+
+        Raises:
+            RuntimeError: A chunk failed on ``max_attempts`` workers.
+        """
+        job_id = uuid.uuid4().hex
+        events = queue.Queue()
+        with self._lock:
+            self._jobs[job_id] = {"video_path": video_path, "meta": meta, "settings": settings, "events": events}
+            for index, start_frame, frame_count in chunks:
+                task_id = f"{job_id}-{index}"
+                self._tasks[task_id] = {
+                    "task_id": task_id,
+                    "job_id": job_id,
+                    "index": index,
+                    "start_frame": start_frame,
+                    "frame_count": frame_count,
+                    "segment_path": segment_path(index),
+                    "worker_id": None,
+                    "attempts": 0
+                }
+                self._pending.append(task_id)
+
+        try:
+            remaining = len(chunks)
+            waiting_since = self.clock()
+            while remaining:
+                try:
+                    kind, index, payload = events.get(timeout=poll_seconds)
+                except queue.Empty:
+                    self.reap()
+                    if self._workers:
+                        waiting_since = self.clock()
+                    elif self.worker_wait and self.clock() - waiting_since > self.worker_wait:
+                        return self._take_back(job_id, events, on_done)
+                    continue
+                if kind == "failed":
+                    raise RuntimeError(f"Chunk {index} failed: {payload}")
+                on_done(index, *payload)
+                remaining -= 1
+            return []
+        finally:
+            with self._lock:
+                del self._jobs[job_id]
+                for task_id in [t for t, task in self._tasks.items() if task["job_id"] == job_id]:
+                    del self._tasks[task_id]
+                self._pending = [t for t in self._pending if t in self._tasks]
+
+    def _take_back(self, job_id, events, on_done):
+        """Withdraw a job's unfinished chunks so it can process them itself."""
+        with self._lock:
+            left = sorted(
+                (task for task in self._tasks.values() if task["job_id"] == job_id),
+                key=lambda task: task["index"]
+            )
+            for task in left:
+                del self._tasks[task["task_id"]]
+            self._pending = [t for t in self._pending if t in self._tasks]
+        # Segments that arrived before the chunks were withdrawn still count
+        while True:
+            try:
+                kind, index, payload = events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "failed":
+                raise RuntimeError(f"Chunk {index} failed: {payload}")
+            on_done(index, *payload)
+        print(f"No workers for {self.worker_wait:.0f}s, processing {len(left)} chunks locally")
+        return [(task["index"], task["start_frame"], task["frame_count"]) for task in left]
+
+    def _release(self, task, error):
+        """Put a leased chunk back in front of the queue, or fail its job (lock held)."""
+        task["worker_id"] = None
+        if task["attempts"] >= self.max_attempts:
+            del self._tasks[task["task_id"]]
+            self._jobs[task["job_id"]]["events"].put(("failed", task["index"], error))
+        else:
+            self._pending.insert(0, task["task_id"])
+
+class ChunkWorker:
+    """Pulls chunks from a ChunkCoordinator over HTTP and uploads the segments.
+
+    Heartbeats are sent from a background thread so long chunks do not look
+    like a dead worker. The pipeline is kept between chunks of jobs with the
+    same settings (the model stays loaded), and the last few source videos
+    are kept so consecutive chunks of a job download it once.
+
+    Args:
+        coordinator_url: Base URL of the API server, e.g. http://host:8001.
+        config: Worker config from load_config(); job settings are applied on top.
+        name: Shown in the coordinator's worker list (defaults to the hostname).
+        poll_seconds: Wait between lease attempts when there is no work.
+    """
+    # Source videos kept on disk for upcoming chunks of the same jobs
+    cached_inputs = 2
+
+    def __init__(self, coordinator_url, config, name=None, poll_seconds=2.0):
+        self.base_url = coordinator_url.rstrip("/")
+        self.config = config
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.poll_seconds = poll_seconds
+        self.work_dir = os.path.join(config["TEMP_DIR"], f"worker_{uuid.uuid4().hex[:8]}")
+        self.worker_id = None
+        self.heartbeat_seconds = 10
+        self._stop = threading.Event()
+        self._pipeline = None
+        self._pipeline_settings = None
+        self._inputs = OrderedDict()
+
+    def run(self):
+        """Process chunks until stop() is called."""
+        os.makedirs(self.work_dir, exist_ok=True)
+        self._register()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="worker-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    status, body = self._request("POST", f"/cluster/workers/{self.worker_id}/lease")
+                except OSError as e:
+                    print(f"Coordinator unreachable: {e}")
+                    self._stop.wait(self.poll_seconds)
+                    continue
+                if status == 404:
+                    self._register()
+                elif status == 204:
+                    self._stop.wait(self.poll_seconds)
+                else:
+                    self._process(json.loads(body))
+        finally:
+            self._stop.set()
+            if self._pipeline is not None:
+                self._pipeline.close()
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def stop(self):
+        self._stop.set()
+
+    def _register(self):
+        while not self._stop.is_set():
+            try:
+                _, body = self._request("POST", "/cluster/workers", json.dumps({"name": self.name}).encode(),
+                                        {"Content-Type": "application/json"})
+                info = json.loads(body)
+                self.worker_id = info["worker_id"]
+                self.heartbeat_seconds = info["heartbeat_seconds"]
+                print(f"Registered with {self.base_url} as {self.worker_id}")
+                return
+            except OSError as e:
+                print(f"Coordinator unreachable: {e}")
+                self._stop.wait(self.poll_seconds)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self._request("POST", f"/cluster/workers/{self.worker_id}/heartbeat")
+            except OSError:
+                pass
+
+    def _process(self, task):
+        print(f"Chunk {task['index']} of job {task['job_id']} (frames from {task['start_frame']})")
+        segment_path = os.path.join(self.work_dir, f"{task['task_id']}.mp4")
+        try:
+            video_path = self._fetch_input(task["job_id"])
+            metrics = JobMetrics()
+            written, reused = self._pipeline_for(task["settings"]).upscale_range(
+                video_path,
+                task["meta"],
+                segment_path,
+                start_frame=task["start_frame"],
+                frame_count=task["frame_count"],
+                metrics=metrics
+            )
+            query = f"worker_id={self.worker_id}&frames={written}&reused={reused}"
+            with open(segment_path, "rb") as f:
+                status, _ = self._request("POST", f"/cluster/chunks/{task['task_id']}?{query}", f, {
+                    "Content-Type": "video/mp4",
+                    "Content-Length": str(os.path.getsize(segment_path)),
+                    "X-Chunk-Metrics": json.dumps(metrics.as_dict())
+                })
+            if status == 409:
+                print(f"Chunk {task['index']} was already finished elsewhere")
+        except Exception as e:
+            print(f"Chunk {task['index']} failed: {e}")
+            try:
+                self._request("POST", f"/cluster/chunks/{task['task_id']}/fail?worker_id={self.worker_id}",
+                              json.dumps({"error": str(e)}).encode(), {"Content-Type": "application/json"})
+            except OSError:
+                pass
+        finally:
+            if os.path.exists(segment_path):
+                os.remove(segment_path)
+
+    def _fetch_input(self, job_id):
+        if job_id in self._inputs:
+            self._inputs.move_to_end(job_id)
+            return self._inputs[job_id]
+        path = os.path.join(self.work_dir, f"input_{job_id}")
+        with urllib.request.urlopen(f"{self.base_url}/cluster/inputs/{job_id}") as response, open(path, "wb") as f:
+            shutil.copyfileobj(response, f)
+        self._inputs[job_id] = path
+        while len(self._inputs) > self.cached_inputs:
+            _, old_path = self._inputs.popitem(last=False)
+            os.remove(old_path)
+        return path
+
+    def _pipeline_for(self, settings):
+        """Pipeline for a job's settings; raises if this worker would run other models."""
+        from .pipeline import UpscalePipeline
+
+        if settings != self._pipeline_settings:
+            if self._pipeline is not None:
+                self._pipeline.close()
+            # The job's output settings must win so segments from every worker concat cleanly
+            self._pipeline = UpscalePipeline(dict(self.config, **settings))
+            self._pipeline_settings = settings
+        # Models come from each worker's own MODEL_PATH / manifest, and segments
+        # from different models must not be joined into one video
+        models = "+".join(self._pipeline.model_names)
+        if "MODELS" in settings and models != settings["MODELS"]:
+            raise RuntimeError(f"Job runs models '{settings['MODELS']}' but this worker has '{models}'")
+        return self._pipeline
+
+    def _request(self, method, path, data=None, headers=None):
+        """(status, body) of a coordinator request; HTTP errors are returned, not raised."""
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers or {}, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
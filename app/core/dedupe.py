@@ -0,0 +1,101 @@
+import hashlib
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+class FrameDeduplicator:
+    """Reuses upscaled results for frames that repeat recently seen content.
+
+    Modes:
+        exact: frames must be byte-identical (BLAKE2 hash of the pixels).
+        perceptual: frames match when their 32x32 thumbnails differ by at most
+            ``threshold`` on average (0-255 scale), which also catches static
+            shots with light sensor noise or re-encoding artifacts.
+
+    Only the ``max_entries`` most recently used results are kept in memory.
+    """
+    def __init__(self, mode="exact", max_entries=8, threshold=1.0):
+        if mode not in ("exact", "perceptual"):
+            raise ValueError(f"Unknown dedupe mode: {mode}")
+        self.mode = mode
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.reused = 0
+        self._index = OrderedDict()
+        self._next_id = 0
+
+    def signature(self, frame):
+        """Hash (exact) or thumbnail (perceptual) identifying a frame's content."""
+        if self.mode == "exact":
+            return hashlib.blake2b(np.ascontiguousarray(frame), digest_size=16).digest()
+        thumbnail = cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA)
+        return thumbnail.astype(np.int16)
+
+    def matches(self, a, b):
+        if self.mode == "exact":
+            return a == b
+        return np.abs(a - b).mean() <= self.threshold
+
+    def lookup(self, signature):
+        """Return the stored upscaled frame for a signature, or None."""
+        if self.mode == "exact":
+            key = signature if signature in self._index else None
+        else:
+            # Most recent first: repeats are usually of the previous frame
+            key = next((k for k in reversed(self._index) if self.matches(signature, self._index[k][0])), None)
+        if key is None:
+            return None
+        self._index.move_to_end(key)
+        return self._index[key][1]
+
+    def store(self, signature, upscaled):
+        """Remember an upscaled frame, evicting the least recently used one if full."""
+        if self.mode == "exact":
+            key = signature
+        else:
+            key = self._next_id
+            self._next_id += 1
+        # Keep a private copy: batch outputs may live in a reused buffer
+        stored = upscaled.copy()
+        self._index[key] = (signature, stored)
+        while len(self._index) > self.max_entries:
+            self._index.popitem(last=False)
+        return stored
+
+    def upscale_batch(self, upscaler, frames, out=None):
+        """Upscale a batch, only sending frames with unseen content to the upscaler.
+
+        With ``out`` the upscaler writes new frames there directly and reused
+        results are copied in.
+        """
+        signatures = [self.signature(frame) for frame in frames]
+        results = [self.lookup(sig) for sig in signatures]
+
+        # Frames to compute, plus repeats inside this batch that can share a result
+        todo = []
+        aliases = {}
+        for i, sig in enumerate(signatures):
+            if results[i] is not None:
+                continue
+            source = next((j for j in todo if self.matches(sig, signatures[j])), None)
+            if source is None:
+                todo.append(i)
+            else:
+                aliases[i] = source
+
+        if todo:
+            targets = [out[i] for i in todo] if out is not None else None
+            upscaled = upscaler.upscale_batch([frames[i] for i in todo], targets)
+            for i, result in zip(todo, upscaled):
+                results[i] = self.store(signatures[i], result)
+        for i, source in aliases.items():
+            results[i] = results[source]
+
+        self.reused += len(frames) - len(todo)
+        if out is None:
+            return results
+        computed = set(todo)
+        for i, result in enumerate(results):
+            if i not in computed:
+                out[i][...] = result
+        return out
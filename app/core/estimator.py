@@ -0,0 +1,90 @@
+import sqlite3
+import threading
+import time
+import numpy as np
+
+class ThroughputModel:
+    """Upscaling throughput of this host per tier, used to predict job times.
+
+    Rates are input pixels per second (frame width x height x frames), so a
+    measurement at one resolution carries over to others. They come from
+    two sources: calibrate() times the upscaler alone on synthetic frames,
+    which gives a first, optimistic figure; record() is fed every finished
+    job's wall time, which includes decode, encode and muxing. Job
+    measurements replace a calibration and are then averaged with weight
+    ``alpha`` for the newest one.
+
+    Args:
+        db_path: SQLite database file (shared with the job queue).
+        alpha: Weight of a new job measurement in the running average.
+    """
+    def __init__(self, db_path, alpha=0.3):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS throughput (
+                    key TEXT PRIMARY KEY,
+                    pixels_per_sec REAL NOT NULL,
+                    samples INTEGER NOT NULL,
+                    source TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def rate(self, key):
+        """Measured input pixels per second for a tier, or None if never measured."""
+        with self._lock:
+            row = self._db.execute("SELECT pixels_per_sec FROM throughput WHERE key = ?", (key,)).fetchone()
+        return row["pixels_per_sec"] if row is not None else None
+
+    def rates(self):
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM throughput ORDER BY key").fetchall()
+        return [dict(row) for row in rows]
+
+    def estimate(self, key, meta):
+        """Predicted processing seconds for a video (metadata from get_video_metadata), or None."""
+        rate = self.rate(key)
+        if rate is None:
+            return None
+        return meta['width'] * meta['height'] * meta['frames'] / rate
+
+    def record(self, key, pixels, seconds, source="jobs"):
+        """Add a throughput measurement; a calibration never overrides job measurements."""
+        if pixels <= 0 or seconds <= 0:
+            return
+        measured = pixels / seconds
+        with self._lock, self._db:
+            row = self._db.execute("SELECT * FROM throughput WHERE key = ?", (key,)).fetchone()
+            if row is not None and row["source"] == "jobs" and source != "jobs":
+                return
+            if row is not None and row["source"] == source:
+                measured = (1 - self.alpha) * row["pixels_per_sec"] + self.alpha * measured
+                samples = row["samples"] + 1
+            else:
+                samples = 1
+            self._db.execute(
+                "INSERT OR REPLACE INTO throughput (key, pixels_per_sec, samples, source, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, measured, samples, source, time.time())
+            )
+
+    def calibrate(self, key, upscaler, width=320, height=240, frames=4):
+        """Time an upscaler on synthetic frames and record the rate.
+
+        One batch runs untimed first so model warm-up is not measured.
+
+        Returns:
+            The measured input pixels per second.
+        """
+        rng = np.random.default_rng(0)
+        batch = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(frames)]
+        upscaler.upscale_batch(batch[:1])
+        start = time.perf_counter()
+        upscaler.upscale_batch(batch)
+        seconds = time.perf_counter() - start
+        self.record(key, width * height * frames, seconds, source="calibration")
+        return width * height * frames / seconds
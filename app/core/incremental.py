@@ -0,0 +1,144 @@
+import cv2
+import numpy as np
+from .base import BaseUpscaler
+
+class IncrementalUpscaler(BaseUpscaler):
+    """Re-upscales only the parts of each frame that changed.
+
+    Every frame is compared, tile by tile, with the input each tile of the
+    previous output was computed from. Tiles in which no pixel differs by
+    more than ``threshold`` (0-255 scale, largest channel) keep their
+    previous upscaled pixels, so a cursor or a subtitle is caught however
+    small it is next to the tile. Changed tiles are cut out with ``margin``
+    pixels of context, run through the wrapped upscaler, and only their
+    centre is pasted back. Comparing against that reference rather than the
+    previous frame means slow changes still add up to a recompute, and a
+    full frame is run every ``refresh_interval`` frames (and whenever more
+    than ``max_changed`` of the tiles changed) so seams and sub-threshold
+    noise cannot accumulate.
+
+    Holds state between calls, so use one instance per range of
+    consecutive frames.
+
+    Args:
+        upscaler: Upscaler that does the actual work.
+        tile_size: Tile edge in input pixels.
+        margin: Context around a changed tile, in input pixels.
+        threshold: Largest per-pixel difference of an unchanged tile; keep
+            it above the codec noise.
+        refresh_interval: Frames between full refreshes (0 for never).
+        max_changed: Fraction of changed tiles above which the whole frame
+            is run instead.
+    """
+    def __init__(self, upscaler, tile_size=64, margin=16, threshold=8.0, refresh_interval=60, max_changed=0.5):
+        super().__init__(upscaler.scale_factor)
+        self.upscaler = upscaler
+        self.batch_size_hint = upscaler.batch_size_hint
+        self.tile_size = max(1, tile_size)
+        self.margin = max(0, margin)
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.max_changed = max_changed
+        self.tiles_checked = 0
+        self.tiles_recomputed = 0
+        # Input pixels the current output was computed from, and that output
+        self._reference = None
+        self._previous = None
+        # Whether the caller was handed _previous (so it must not be patched in place)
+        self._previous_shared = False
+        self._since_refresh = 0
+
+    def upscale_array(self, img):
+        return self.upscale_batch([img])[0]
+
+    def changed_tiles(self, frame):
+        """Boolean grid (rows x columns) of tiles that differ from the reference."""
+        height, width = frame.shape[:2]
+        diff = cv2.absdiff(frame, self._reference).max(axis=2)
+        ys = np.arange(0, height, self.tile_size)
+        xs = np.arange(0, width, self.tile_size)
+        peaks = np.maximum.reduceat(np.maximum.reduceat(diff, ys, axis=0), xs, axis=1)
+        return peaks > self.threshold
+
+    def upscale_batch(self, frames, out=None):
+        """Upscale consecutive frames, recomputing only changed tiles.
+
+        All full frames and all changed tiles of the batch go to the wrapped
+        upscaler together (tiles grouped by crop size), then each output is
+        composited from the one before it. With ``out`` full frames are
+        written there by the wrapped upscaler and composited ones copied in.
+        """
+        plans = [self._plan(frame) for frame in frames]
+
+        full = [i for i, plan in enumerate(plans) if plan is None]
+        full_outputs = {}
+        if full:
+            targets = [out[i] for i in full] if out is not None else None
+            upscaled = self.upscaler.upscale_batch([frames[i] for i in full], targets)
+            full_outputs = dict(zip(full, upscaled))
+
+        by_shape = {}
+        for i, plan in enumerate(plans):
+            for core, crop in plan or ():
+                y0, y1, x0, x1 = crop
+                by_shape.setdefault((y1 - y0, x1 - x0), []).append((i, core, crop))
+        patches = {}
+        for jobs in by_shape.values():
+            crops = [frames[i][y0:y1, x0:x1] for i, _, (y0, y1, x0, x1) in jobs]
+            for (i, core, crop), upscaled in zip(jobs, self.upscaler.upscale_batch(crops)):
+                patches.setdefault(i, []).append((core, crop, upscaled))
+
+        scale = self.scale_factor
+        results = []
+        for i in range(len(frames)):
+            if i in full_outputs:
+                # Batch outputs may live in a reused buffer or the caller's out
+                output = np.array(full_outputs[i])
+            else:
+                output = self._previous.copy() if self._previous_shared else self._previous
+                for (y0, y1, x0, x1), (cy, _, cx, _), upscaled in patches.get(i, ()):
+                    output[y0 * scale:y1 * scale, x0 * scale:x1 * scale] = upscaled[
+                        (y0 - cy) * scale:(y1 - cy) * scale, (x0 - cx) * scale:(x1 - cx) * scale
+                    ]
+                if out is not None:
+                    out[i][...] = output
+            self._previous = output
+            self._previous_shared = out is None
+            results.append(output)
+        return out if out is not None else results
+
+    def _plan(self, frame):
+        """Decide what to recompute for a frame and update the reference.
+
+        Returns:
+            None to run the whole frame, else a list of ((y0, y1, x0, x1) tile,
+            (y0, y1, x0, x1) crop with margin) in input pixels.
+        """
+        height, width = frame.shape[:2]
+        tile = self.tile_size
+        count = -(-height // tile) * -(-width // tile)
+        self.tiles_checked += count
+
+        grid = None
+        refresh_due = self.refresh_interval > 0 and self._since_refresh >= self.refresh_interval
+        if self._reference is not None and self._reference.shape == frame.shape and not refresh_due:
+            grid = self.changed_tiles(frame)
+            if grid.mean() > self.max_changed:
+                grid = None
+        if grid is None:
+            self._reference = frame.copy()
+            self._since_refresh = 1
+            self.tiles_recomputed += count
+            return None
+
+        self._since_refresh += 1
+        plan = []
+        for row, col in np.argwhere(grid):
+            y0, x0 = row * tile, col * tile
+            y1, x1 = min(y0 + tile, height), min(x0 + tile, width)
+            self._reference[y0:y1, x0:x1] = frame[y0:y1, x0:x1]
+            crop = (max(0, y0 - self.margin), min(height, y1 + self.margin),
+                    max(0, x0 - self.margin), min(width, x1 + self.margin))
+            plan.append(((y0, y1, x0, x1), crop))
+        self.tiles_recomputed += len(plan)
+        return plan
@@ -0,0 +1,319 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.submit when no more jobs can be admitted."""
+    def __init__(self, queued):
+        super().__init__(f"Queue is full ({queued} jobs waiting)")
+        self.queued = queued
+
+class JobQueue:
+    """SQLite-backed job queue served by a bounded pool of worker threads.
+
+    Jobs survive server restarts: anything still queued is picked up again
+    when the queue starts, and jobs that were interrupted mid-run are queued
+    again (the pipeline resumes them from their checkpoint) until they have
+    been started ``max_attempts`` times. Higher ``priority`` runs first, then
+    oldest first; with ``order="sjf"``, jobs of equal priority run shortest
+    estimated first instead (jobs without an estimate go last). Jobs
+    submitted with the same ``cache_key`` while one is still queued or
+    processing are coalesced into that job.
+
+    Args:
+        db_path: SQLite database file.
+        handler: callable(job, progress_callback) -> result dict, run by a
+            worker for each job. progress_callback(frames_done, frames_total)
+            updates the job's progress and measured frames per second.
+        max_workers: Jobs processed at the same time.
+        max_queued: Waiting jobs admitted before submit() raises QueueFullError.
+        max_attempts: Times an interrupted job is started before it is failed.
+        order: "priority" (then oldest first) or "sjf" (then shortest first).
+    """
+    def __init__(self, db_path, handler, max_workers=1, max_queued=20, max_attempts=3, order="priority"):
+        if order not in ("priority", "sjf"):
+            raise ValueError(f"Unknown queue order: {order}. Choose from priority, sjf")
+        self.db_path = db_path
+        self.handler = handler
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.order = order
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    filename TEXT,
+                    input_path TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    progress REAL,
+                    fps REAL,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    cache_key TEXT,
+                    estimated_sec REAL
+                )
+            """)
+            # Databases created before attempts / cache keys were tracked
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(jobs)")]
+            if "attempts" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            if "cache_key" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN cache_key TEXT")
+            if "estimated_sec" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN estimated_sec REAL")
+
+    def start(self):
+        """Recover jobs from a previous run and start the worker threads."""
+        self.recover()
+        self._stopping.clear()
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"upscale-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def recover(self):
+        """Re-queue jobs a previous run left processing, failing those out of attempts."""
+        with self._lock, self._db:
+            # A job still marked processing was cut off when the server stopped
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE status = 'processing' AND attempts >= ?",
+                ("Interrupted too many times", time.time(), self.max_attempts)
+            )
+            requeued = self._db.execute(
+                "UPDATE jobs SET status = 'queued' WHERE status = 'processing'"
+            ).rowcount
+        if requeued:
+            print(f"Re-queued {requeued} interrupted job(s).")
+
+    def stop(self, timeout=None):
+        """Ask workers to exit once their current job is done."""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def is_full(self):
+        """True when submit() would currently be rejected."""
+        with self._lock:
+            return self._queued_count() >= self.max_queued
+
+    def _queued_count(self):
+        return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def submit(self, input_path, params, priority=0, filename=None, job_id=None, cache_key=None, estimated_sec=None):
+        """Queue a job and return its status dict (including queue_position).
+
+        If a job with the same cache_key is already queued or processing, no
+        new job is created and that job's status dict is returned instead.
+        estimated_sec is the predicted processing time, used for ETAs and
+        shortest-job-first ordering.
+        """
+        job_id = job_id or str(uuid.uuid4())
+        with self._lock, self._db:
+            active = None
+            if cache_key is not None:
+                active = self._db.execute(
+                    "SELECT id FROM jobs WHERE cache_key = ? AND status IN ('queued', 'processing') "
+                    "ORDER BY created_at ASC LIMIT 1",
+                    (cache_key,)
+                ).fetchone()
+            if active is not None:
+                job_id = active["id"]
+            else:
+                queued = self._queued_count()
+                if queued >= self.max_queued:
+                    raise QueueFullError(queued)
+                self._db.execute(
+                    "INSERT INTO jobs (id, status, priority, filename, input_path, params, created_at, cache_key, "
+                    "estimated_sec) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, priority, filename, input_path, json.dumps(params), time.time(), cache_key, estimated_sec)
+                )
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.get(job_id)
+
+    def add_completed(self, input_path, params, result, filename=None, job_id=None, cache_key=None):
+        """Record a job that is already done (e.g. served from a result cache)."""
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, filename, input_path, params, created_at, started_at, "
+                "finished_at, progress, result, cache_key) VALUES (?, 'completed', ?, ?, ?, ?, ?, ?, 100.0, ?, ?)",
+                (job_id, filename, input_path, json.dumps(params), now, now, now, json.dumps(result), cache_key)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Status dict for a job, or None if it does not exist.
+
+        Jobs with an estimate also get eta_sec: the predicted seconds until
+        they finish, counting the estimated work ahead of them.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            position = None
+            wait = 0.0
+            if row["status"] == "queued":
+                queued = self._queued_in_order()
+                ahead = queued[:[job["id"] for job in queued].index(job_id)]
+                position = len(ahead) + 1
+                wait = self._wait_seconds(ahead)
+        job = self._to_dict(row, position)
+        estimate = row["estimated_sec"]
+        if estimate is not None and row["status"] in ("queued", "processing"):
+            remaining = estimate * (1 - (row["progress"] or 0) / 100.0)
+            job["eta_sec"] = round(wait + remaining, 1)
+        return job
+
+    def estimate_wait(self, priority=0, estimated_sec=None):
+        """Predicted seconds before a job submitted now with these values would start."""
+        new_job = {"priority": priority, "estimated_sec": estimated_sec, "created_at": time.time()}
+        with self._lock:
+            queued = self._queued_in_order()
+            ahead = [job for job in queued if self._sort_key(job) <= self._sort_key(new_job)]
+            return self._wait_seconds(ahead)
+
+    def _sort_key(self, job):
+        if self.order == "sjf":
+            estimate = job["estimated_sec"]
+            return (-job["priority"], estimate if estimate is not None else float("inf"), job["created_at"])
+        return (-job["priority"], job["created_at"])
+
+    def _queued_in_order(self):
+        rows = self._db.execute(
+            "SELECT id, priority, estimated_sec, created_at FROM jobs WHERE status = 'queued'"
+        ).fetchall()
+        return sorted((dict(row) for row in rows), key=self._sort_key)
+
+    def _wait_seconds(self, ahead):
+        """Estimated work of running jobs plus ``ahead``, spread over the workers (lock held)."""
+        running = self._db.execute(
+            "SELECT estimated_sec, progress FROM jobs WHERE status = 'processing' AND estimated_sec IS NOT NULL"
+        ).fetchall()
+        work = sum(row["estimated_sec"] * (1 - (row["progress"] or 0) / 100.0) for row in running)
+        work += sum(job["estimated_sec"] or 0 for job in ahead)
+        return work / self.max_workers
+
+    def counts(self):
+        """Number of jobs per status."""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    @staticmethod
+    def _to_dict(row, position=None):
+        job = {
+            "task_id": row["id"],
+            "status": row["status"],
+            "priority": row["priority"],
+            "filename": row["filename"],
+            "input_path": row["input_path"],
+            "config": json.loads(row["params"]),
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "progress": row["progress"],
+            "fps": row["fps"],
+            "attempts": row["attempts"],
+            "cache_key": row["cache_key"],
+            "estimated_sec": row["estimated_sec"]
+        }
+        if position is not None:
+            job["queue_position"] = position
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+        return job
+
+    def _claim_next(self):
+        """Atomically move the next queued job to processing."""
+        with self._lock, self._db:
+            queued = self._queued_in_order()
+            if not queued:
+                return None
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (queued[0]["id"],)).fetchone()
+            started_at = time.time()
+            self._db.execute(
+                "UPDATE jobs SET status = 'processing', started_at = ?, progress = 0, attempts = attempts + 1 WHERE id = ?",
+                (started_at, row["id"])
+            )
+        job = self._to_dict(row)
+        job["status"] = "processing"
+        job["started_at"] = started_at
+        job["attempts"] += 1
+        return job
+
+    def _update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            job = self._claim_next()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=1.0)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        # (time, frames) at the first progress report, so model loading and
+        # probing are not counted against the measured frame rate
+        first_report = []
+        last_update = [0.0]
+
+        def progress_callback(done, total):
+            now = time.time()
+            if not first_report:
+                first_report.append((now, done))
+            # Throttle database writes; progress arrives once per batch
+            if now - last_update[0] < 1.0 and done < total:
+                return
+            last_update[0] = now
+            first_time, first_done = first_report[0]
+            elapsed = now - first_time
+            self._update(
+                job["task_id"],
+                progress=round(100.0 * done / total, 1) if total else None,
+                fps=round((done - first_done) / elapsed, 2) if elapsed > 0 else None
+            )
+
+        try:
+            result = self.handler(job, progress_callback)
+            self._update(
+                job["task_id"],
+                status="completed",
+                progress=100.0,
+                result=json.dumps(result),
+                finished_at=time.time()
+            )
+        except Exception as e:
+            self._update(job["task_id"], status="failed", error=str(e), finished_at=time.time())
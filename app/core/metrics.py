@@ -0,0 +1,175 @@
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+class JobMetrics:
+    """Stage timings and counters collected while one job runs."""
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block and add it to the named stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def timed_iter(self, name, iterable):
+        """Yield from iterable, charging the time spent waiting for each item to a stage."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - start)
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+    def merge(self, other):
+        """Add another job's as_dict() output (e.g. from a chunk worker)."""
+        for name, seconds in other["stages_sec"].items():
+            self.add_time(name, seconds)
+        for name, value in other["counters"].items():
+            self.count(name, value)
+
+    def as_dict(self):
+        return {
+            "stages_sec": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "counters": dict(self.counters)
+        }
+
+class MetricsRegistry:
+    """Process-wide counters and summaries exposed in Prometheus text format on /metrics."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._summaries = {}
+        self._help = {}
+
+    def inc(self, name, value=1, help_text=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+            if help_text:
+                self._help[name] = help_text
+
+    def observe(self, name, value, help_text=None):
+        """Add an observation to a summary (exported as ``<name>_sum`` and ``<name>_count``)."""
+        with self._lock:
+            total = self._summaries.setdefault(name, [0, 0])
+            total[0] += value
+            total[1] += 1
+            if help_text:
+                self._help[name] = help_text
+
+    def record_job(self, status, job_metrics=None, queue_wait=None):
+        """Fold a finished job's metrics (JobMetrics.as_dict()) into the totals."""
+        self.inc("upscale_jobs_total", help_text="Jobs finished, by status.", status=status)
+        if queue_wait is not None:
+            self.observe("upscale_queue_wait_seconds", queue_wait, "Time jobs waited in the queue.")
+        if job_metrics is None:
+            return
+        for stage, seconds in job_metrics["stages_sec"].items():
+            self.inc("upscale_stage_seconds_total", seconds, "Time spent per pipeline stage.", stage=stage)
+        for name, value in job_metrics["counters"].items():
+            metric = f"upscale_{name}"
+            if not metric.endswith("_total"):
+                metric += "_total"
+            self.inc(metric, value, f"Total {name.replace('_', ' ')} across jobs.")
+
+    def render(self, gauges=None):
+        """Prometheus text exposition of all counters plus the given gauges.
+
+        Args:
+            gauges: Optional list of (name, help, value, labels dict) tuples
+                sampled by the caller at scrape time.
+        """
+        lines = []
+        with self._lock:
+            by_name = {}
+            for (name, labels), value in sorted(self._values.items()):
+                by_name.setdefault(name, []).append((labels, value))
+            summaries = {name: tuple(total) for name, total in sorted(self._summaries.items())}
+            help_texts = dict(self._help)
+
+        def emit(name, kind, help_text, samples):
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        for name, samples in by_name.items():
+            emit(name, "counter", help_texts.get(name), samples)
+        for name, (total, count) in summaries.items():
+            if help_texts.get(name):
+                lines.append(f"# HELP {name} {help_texts[name]}")
+            lines.append(f"# TYPE {name} summary")
+            lines.append(f"{name}_sum {total}")
+            lines.append(f"{name}_count {count}")
+
+        gauge_samples = {}
+        for name, help_text, value, labels in gauges or []:
+            gauge_samples.setdefault(name, (help_text, []))[1].append((tuple(sorted(labels.items())), value))
+        for name, (help_text, samples) in gauge_samples.items():
+            emit(name, "gauge", help_text, samples)
+        return "\n".join(lines) + "\n"
+
+@contextmanager
+def profiled(mode, path_prefix):
+    """Profile the enclosed block for one job.
+
+    Args:
+        mode: "off", "cprofile" (writes ``<prefix>.prof``, readable with
+            pstats or snakeviz) or "torch" (writes a Chrome trace
+            ``<prefix>.trace.json``).
+        path_prefix: Report path without extension.
+
+    Yields:
+        Dict that holds the report path under "path" once the block exits.
+    """
+    report = {}
+    if mode == "off":
+        yield report
+        return
+    if mode not in ("cprofile", "torch"):
+        raise ValueError(f"Unknown profile mode: {mode}")
+
+    os.makedirs(os.path.dirname(path_prefix) or ".", exist_ok=True)
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield report
+        finally:
+            profiler.disable()
+            report["path"] = path_prefix + ".prof"
+            profiler.dump_stats(report["path"])
+    else:
+        import torch
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        with torch.profiler.profile(activities=activities) as profiler:
+            try:
+                yield report
+            finally:
+                report["path"] = path_prefix + ".trace.json"
+        profiler.export_chrome_trace(report["path"])
+
+# Shared by the server's jobs and the /metrics endpoint
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,159 @@
+import itertools
+import json
+import os
+import threading
+
+# Longest chain of models tried when no single model has the requested scale
+MAX_CHAIN_LENGTH = 3
+
+# Last plan per (settings, scale), with the state of the files it was made from
+_selections = {}
+_selections_lock = threading.Lock()
+
+def inspect_model(path):
+    """Native scale and architecture of a model file, read with Spandrel."""
+    from spandrel import ModelLoader
+    descriptor = ModelLoader().load_from_file(path)
+    return {"scale": descriptor.scale, "architecture": descriptor.architecture.name}
+
+class ModelCatalog:
+    """Models listed in a JSON manifest with their native scale and architecture.
+
+    Each manifest entry has ``name``, ``file`` (relative to the manifest's
+    directory), ``scale``, ``architecture`` and optionally a download ``url``.
+    Only entries whose file exists are used for upscaling.
+    """
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.model_dir = os.path.dirname(manifest_path)
+        self.models = []
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.models = json.load(f)["models"]
+
+    def path_for(self, entry):
+        return os.path.join(self.model_dir, entry["file"])
+
+    def available(self):
+        """Entries whose weights are on disk, with their full path under "path"."""
+        return [dict(entry, path=self.path_for(entry)) for entry in self.models if os.path.exists(self.path_for(entry))]
+
+    def find(self, path):
+        """Entry for a model file, or None if the manifest does not list it."""
+        target = os.path.abspath(path)
+        for entry in self.models:
+            if os.path.abspath(self.path_for(entry)) == target:
+                return dict(entry, path=self.path_for(entry))
+        return None
+
+    def register(self, path, name=None, url=None):
+        """Add (or refresh) a model file in the manifest, inspecting it for scale and architecture."""
+        info = inspect_model(path)
+        entry = {
+            "name": name or os.path.splitext(os.path.basename(path))[0],
+            "file": os.path.relpath(path, self.model_dir).replace(os.sep, "/"),
+            "scale": info["scale"],
+            "architecture": info["architecture"]
+        }
+        if url:
+            entry["url"] = url
+        self.models = [m for m in self.models if m["name"] != entry["name"]] + [entry]
+        self.save()
+        return entry
+
+    def save(self):
+        os.makedirs(self.model_dir or ".", exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"models": self.models}, f, indent=2)
+            f.write("\n")
+
+def plan_models(candidates, scale):
+    """Pick the cheapest chain of models for an upscale factor.
+
+    A single model with exactly that scale wins, then the shortest chain whose
+    scales multiply to it (e.g. x2 then x2 for x4). Without an exact match
+    the chain that overshoots least is used and resized down afterwards, or
+    failing that the one that gets closest from below and is resized up.
+    Ties go to the chain with the least work, estimated as each model's file
+    size times the pixels it runs on.
+
+    Args:
+        candidates: Catalogue entries with "scale" and "path".
+        scale: Requested upscale factor.
+
+    Returns:
+        List of entries to run in order (empty if there are no candidates).
+    """
+    def cost(chain):
+        total, pixels = 0, 1
+        for entry in chain:
+            total += os.path.getsize(entry["path"]) * pixels
+            pixels *= entry["scale"] ** 2
+        return total
+
+    def rank(chain):
+        product = 1
+        for entry in chain:
+            product *= entry["scale"]
+        if product == scale:
+            return (0, len(chain), cost(chain))
+        if product > scale:
+            return (1, product, len(chain), cost(chain))
+        return (2, -product, len(chain), cost(chain))
+
+    chains = [
+        list(chain)
+        for length in range(1, MAX_CHAIN_LENGTH + 1)
+        for chain in itertools.product(candidates, repeat=length)
+    ]
+    return min(chains, key=rank) if chains else []
+
+def _file_state(path):
+    """(mtime, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def select_models(config, scale):
+    """Models the AI tier should run for this scale under the given config.
+
+    With MODEL_SELECTION "fixed" only MODEL_PATH is used, resized to the
+    requested factor as needed. With "auto" MODEL_PATH joins the catalogue
+    from MODEL_MANIFEST as one more candidate for plan_models().
+
+    The plan is cached until the manifest, MODEL_PATH or a listed model file
+    changes, so the server's cache keys and the jobs it starts always agree
+    on the models without inspecting weights on every call.
+    """
+    model_path = config.get("MODEL_PATH", os.path.join("models", "RealESRGAN_x4plus.pth"))
+    catalog = ModelCatalog(config.get("MODEL_MANIFEST", os.path.join("models", "manifest.json")))
+    selection = config.get("MODEL_SELECTION", "auto").lower()
+    key = (os.path.abspath(model_path), os.path.abspath(catalog.manifest_path), selection, scale)
+    state = [_file_state(path) for path in [catalog.manifest_path, model_path]]
+    state += [_file_state(catalog.path_for(entry)) for entry in catalog.models]
+    with _selections_lock:
+        cached = _selections.get(key)
+    if cached is not None and cached[0] == state:
+        return list(cached[1])
+
+    models = _plan_for(catalog, model_path, selection, scale)
+    with _selections_lock:
+        _selections[key] = (state, models)
+    return list(models)
+
+def _plan_for(catalog, model_path, selection, scale):
+    entry = catalog.find(model_path)
+    if entry is None and os.path.exists(model_path):
+        try:
+            entry = dict(inspect_model(model_path), name=os.path.splitext(os.path.basename(model_path))[0], path=model_path)
+        except Exception as e:
+            print(f"Could not inspect {model_path}: {e}")
+
+    if selection == "fixed":
+        return [entry] if entry is not None else []
+    candidates = catalog.available()
+    if entry is not None and not any(os.path.abspath(c["path"]) == os.path.abspath(entry["path"]) for c in candidates):
+        candidates.append(entry)
+    return plan_models(candidates, scale)
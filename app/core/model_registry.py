@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict
+import torch
+from spandrel import ModelLoader
+
+class _Entry:
+    def __init__(self, model):
+        self.model = model
+        self.refs = 0
+
+class ModelRegistry:
+    """Process-wide cache of loaded models shared by every pipeline.
+
+    Models are keyed by (model path, device, precision, channels_last) and
+    loaded at most once. Precision "int8" dynamically quantises the model's
+    Linear layers; models without any (conv-only networks such as RRDB)
+    would be unchanged, so they are served as fp32 instead (see
+    supports_int8()). channels_last converts the weights to NHWC layout.
+    Other precisions (e.g. bf16 autocast) run on the fp32 weights.
+
+    Callers acquire() a model and release() it when done; once more than
+    ``max_models`` are loaded, the least recently used ones that nobody holds
+    are evicted.
+    """
+    def __init__(self, max_models=2):
+        self.max_models = max_models
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Models found to have nothing int8 dynamic quantisation applies to
+        self._no_int8 = set()
+
+    def _key(self, model_path, device, precision, channels_last):
+        path = os.path.abspath(model_path)
+        if precision == "int8" and path in self._no_int8:
+            precision = "fp32"
+        return (path, str(device), precision, channels_last)
+
+    def supports_int8(self, model_path):
+        """False once a model turned out to have no Linear layers to quantise."""
+        with self._lock:
+            return os.path.abspath(model_path) not in self._no_int8
+
+    def _get_or_load(self, model_path, device, precision, channels_last):
+        key = self._key(model_path, device, precision, channels_last)
+        entry = self._entries.get(key)
+        if entry is None:
+            model = ModelLoader().load_from_file(model_path)
+            model.to(device)
+            model.eval()
+            if key[2] == "int8":
+                # Dynamic quantisation only covers Linear layers (transformer architectures)
+                if any(isinstance(module, torch.nn.Linear) for module in model.model.modules()):
+                    torch.ao.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+                else:
+                    print(f"{model_path} has no Linear layers for int8 dynamic quantisation, using fp32.")
+                    self._no_int8.add(key[0])
+                    key = self._key(model_path, device, "fp32", channels_last)
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                        return self._entries[key]
+            if channels_last:
+                model.model.to(memory_format=torch.channels_last)
+            layout = ", channels_last" if channels_last else ""
+            print(f"Loaded AI model from {model_path} ({device}, {key[2]}{layout})")
+            entry = self._entries[key] = _Entry(model)
+        self._entries.move_to_end(key)
+        return entry
+
+    def acquire(self, model_path, device, precision="fp32", channels_last=False):
+        """Return the shared model for this key, loading it on first use."""
+        with self._lock:
+            entry = self._get_or_load(model_path, device, precision, channels_last)
+            entry.refs += 1
+            self._evict()
+            return entry.model
+
+    def release(self, model_path, device, precision="fp32", channels_last=False):
+        """Drop one reference taken with acquire()."""
+        with self._lock:
+            entry = self._entries.get(self._key(model_path, device, precision, channels_last))
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+            self._evict()
+
+    def preload(self, model_path, device, precision="fp32", channels_last=False, warmup_size=64):
+        """Load a model ahead of time and run one dummy inference to warm it up."""
+        with self._lock:
+            entry = self._get_or_load(model_path, device, precision, channels_last)
+            self._evict()
+        dummy = torch.zeros((1, 3, warmup_size, warmup_size), device=device)
+        if channels_last:
+            dummy = dummy.contiguous(memory_format=torch.channels_last)
+        with torch.inference_mode():
+            entry.model(dummy)
+        return entry.model
+
+    def loaded(self):
+        """Keys of the models currently in memory, least recently used first."""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def _evict(self):
+        while len(self._entries) > self.max_models:
+            idle = next((key for key, entry in self._entries.items() if entry.refs == 0), None)
+            if idle is None:
+                break
+            del self._entries[idle]
+            print(f"Evicted AI model {idle[0]} ({idle[1]}, {idle[2]}{', channels_last' if idle[3] else ''})")
+
+# Shared by every AIUpscaler in this process
+registry = ModelRegistry()
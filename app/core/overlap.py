@@ -0,0 +1,168 @@
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+# How often blocked stages check whether another stage has failed
+POLL_SECONDS = 0.1
+
+class FrameRing:
+    """Fixed set of frame slots in one shared memory block.
+
+    Stages pass slot indices instead of arrays, so frames are written in
+    place (the decoder reads straight into a slot) and never pickled or
+    copied between stages. ``free`` holds the indices of unused slots; taking
+    one blocks when every slot is in flight, which is what bounds memory.
+    The block can be attached from another process by ``name``.
+    """
+    def __init__(self, slots, shape):
+        self.shape = tuple(shape)
+        frame_bytes = int(np.prod(self.shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * frame_bytes)
+        self.name = self._shm.name
+        self.frames = np.ndarray((slots, *self.shape), dtype=np.uint8, buffer=self._shm.buf)
+        self.free = queue.Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+
+    def close(self):
+        self.frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A view is still referenced (e.g. by a traceback); the mapping
+            # is released with it, unlinking below still frees the name
+            pass
+        self._shm.unlink()
+
+class _Stopped(Exception):
+    """Raised in a stage when another stage failed."""
+
+def run_overlapped(reader, writer, upscale_batch, batch_size, input_shape, output_shape, ring_frames, metrics, on_batch=None):
+    """Decode, upscale and encode concurrently, connected through frame rings.
+
+    A decoder thread reads frames into the input ring and an encoder thread
+    writes them from the output ring while the calling thread runs inference.
+    Each ring's free slots form a bounded queue, so a slow stage makes the
+    faster ones wait instead of buffering: peak memory is set by
+    ``ring_frames``, not the video length.
+
+    Args:
+        reader: FrameReader for the source frames.
+        writer: FrameWriter for the upscaled frames.
+        upscale_batch: callable(frames, out) writing the upscaled frames
+            into ``out``, a list of output ring slots.
+        batch_size: Frames per upscale_batch call.
+        input_shape: (height, width, 3) of decoded frames.
+        output_shape: (height, width, 3) of upscaled frames.
+        ring_frames: Slots per ring; at least batch_size.
+        metrics: JobMetrics receiving decode / upscale / encode time (which
+            overlap) and the time inference waited on either neighbour.
+        on_batch: Optional callable(frames in batch) after each batch is queued.
+
+    Returns:
+        Number of frames written.
+    """
+    ring_frames = max(ring_frames, batch_size)
+    inputs = FrameRing(ring_frames, input_shape)
+    outputs = FrameRing(ring_frames, output_shape)
+    decoded = queue.Queue()
+    upscaled = queue.Queue()
+    failed = threading.Event()
+    errors = []
+
+    def take(source):
+        while True:
+            if failed.is_set():
+                raise _Stopped()
+            try:
+                return source.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                pass
+
+    def decode():
+        try:
+            while True:
+                slot = take(inputs.free)
+                with metrics.stage("decode"):
+                    more = reader.readinto(inputs.frames[slot])
+                if not more:
+                    decoded.put(None)
+                    return
+                decoded.put(slot)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            failed.set()
+
+    def encode():
+        try:
+            while True:
+                slot = take(upscaled)
+                if slot is None:
+                    return
+                with metrics.stage("encode"):
+                    writer.write(outputs.frames[slot])
+                outputs.free.put(slot)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            failed.set()
+
+    threads = [
+        threading.Thread(target=decode, name="upscale-decode", daemon=True),
+        threading.Thread(target=encode, name="upscale-encode", daemon=True)
+    ]
+    for thread in threads:
+        thread.start()
+
+    written = 0
+    try:
+        finished = False
+        while not finished:
+            start = time.perf_counter()
+            slots = []
+            while len(slots) < batch_size:
+                slot = take(decoded)
+                if slot is None:
+                    finished = True
+                    break
+                slots.append(slot)
+            metrics.add_time("wait_decode", time.perf_counter() - start)
+            if not slots:
+                break
+
+            start = time.perf_counter()
+            targets = [take(outputs.free) for _ in slots]
+            metrics.add_time("wait_encode", time.perf_counter() - start)
+
+            # The upscaler writes straight into the output slots, so no frame is copied between stages
+            with metrics.stage("upscale"):
+                upscale_batch([inputs.frames[slot] for slot in slots], [outputs.frames[slot] for slot in targets])
+            metrics.count("upscale_calls")
+            for slot in targets:
+                upscaled.put(slot)
+            # Input slots are recycled only once the upscaler is done reading them
+            for slot in slots:
+                inputs.free.put(slot)
+            written += len(slots)
+            if on_batch is not None:
+                on_batch(len(slots))
+        upscaled.put(None)
+    except _Stopped:
+        pass
+    except BaseException:
+        failed.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+        inputs.close()
+        outputs.close()
+
+    if errors:
+        raise errors[0]
+    return written
@@ -1,90 +1,607 @@
 import os
-import shutil
 import time
+import multiprocessing
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
 from tqdm import tqdm
 from ..utils.ffmpeg import FFmpegRunner
-from .base import OpenCVUpscaler
+from .base import OpenCVUpscaler, ChainedUpscaler
+from .checkpoint import Checkpoint
+from .chunking import plan_chunks, init_worker, process_chunk, default_threads_per_worker
+from .dedupe import FrameDeduplicator
+from .incremental import IncrementalUpscaler
+from .metrics import JobMetrics, profiled
+from .model_catalog import select_models
+from .overlap import run_overlapped
+from .streaming import PLAYLIST_NAME, SegmentStream, stream_dir
+
+# Config keys that change a job's output
+OUTPUT_SETTINGS = (
+    "SCALE_FACTOR", "USE_AI", "PRECISION", "INTERPOLATION", "SHARPEN", "CHUNK_MODE",
+    "CHUNK_SECONDS", "SCENE_THRESHOLD", "DEDUPE", "DEDUPE_THRESHOLD", "INCREMENTAL",
+    "INCREMENTAL_TILE", "INCREMENTAL_MARGIN", "INCREMENTAL_THRESHOLD", "INCREMENTAL_REFRESH"
+)
+
+def job_settings(config, model_names):
+    """Settings that change the output of a job run with this config and these models.
+
+    A checkpoint only resumes, and a cached result is only reused, if they match.
+    """
+    settings = {key: str(config.get(key, "")) for key in OUTPUT_SETTINGS}
+    settings["MODELS"] = "+".join(model_names)
+    return settings
 
 class UpscalePipeline:
-    def __init__(self, config):
+    def __init__(self, config, coordinator=None, budget=None):
         self.config = config
+        # ChunkCoordinator that farms chunks out to remote workers, if any
+        self.coordinator = coordinator
+        # CpuBudget from a ResourceManager; caps this job's thread pools
+        self.budget = budget
         self.ffmpeg = FFmpegRunner()
         
         scale = int(config.get("SCALE_FACTOR", 2))
+        self.batch_size = max(1, int(config.get("BATCH_SIZE", 4)))
+        self.dedupe_mode = config.get("DEDUPE", "off").lower()
+        self.incremental = config.get("INCREMENTAL", "False").lower() == "true"
+        self.checkpointing = config.get("CHECKPOINT", "True").lower() == "true"
+        self.overlap = config.get("OVERLAP", "True").lower() == "true"
+        self.streaming = config.get("STREAM_OUTPUT", "False").lower() == "true"
         use_ai = config.get("USE_AI", "True").lower() == "true"
+        # Names of the AI models that run, in order (empty for the OpenCV tier)
+        self.model_names = []
         
         if use_ai:
             print("Initializing AI Upscaler (Real-ESRGAN)...")
             try:
-                from .ai_upscaler import AIUpscaler
-                self.upscaler = AIUpscaler(scale_factor=scale)
+                self.upscaler = self._create_ai_upscaler(scale)
             except Exception as e:
                 print(f"Failed to load AI model/dependencies: {e}. Falling back to OpenCV.")
-                self.upscaler = OpenCVUpscaler(scale_factor=scale)
+                self.model_names = []
+                self.upscaler = self._create_opencv_upscaler(scale)
         else:
-            print("Using OpenCV Upscaler (Bicubic)...")
-            self.upscaler = OpenCVUpscaler(scale_factor=scale)
+            self.upscaler = self._create_opencv_upscaler(scale)
+            print(f"Using OpenCV Upscaler ({self.upscaler.interpolation}, {self.upscaler.threads} threads)...")
+
+        self.batch_size = max(self.batch_size, self.upscaler.batch_size_hint)
+        # Two batches in flight per ring lets decode and encode run ahead of inference
+        self.ring_frames = int(config.get("RING_FRAMES", 0)) or 2 * self.batch_size + 2
+
+    def _create_ai_upscaler(self, scale):
+        """AIUpscaler for the cheapest model (or chain of models) that reaches the scale."""
+        from .ai_upscaler import AIUpscaler
+
+        options = dict(
+            tile_size=int(self.config.get("TILE_SIZE", 0)),
+            tile_overlap=int(self.config.get("TILE_OVERLAP", 16)),
+            memory_budget_mb=int(self.config.get("MEMORY_BUDGET_MB", 2048)),
+            precision=self.config.get("PRECISION", "fp32").lower(),
+            channels_last=self.config.get("CHANNELS_LAST", "False").lower() == "true",
+            compile_mode=self.config.get("COMPILE_MODE", "off").lower()
+        )
+        models = select_models(self.config, scale)
+        if not models:
+            # Nothing on disk yet: AIUpscaler warns and serves OpenCV until the model is downloaded
+            return AIUpscaler(scale_factor=scale, model_path=self.config.get("MODEL_PATH"), **options)
+
+        self.model_names = [model["name"] for model in models]
+        chain = " -> ".join(f"{model['name']} (x{model['scale']})" for model in models)
+        print(f"Using {chain} for x{scale}")
+        if len(models) == 1:
+            return AIUpscaler(scale_factor=scale, model_path=models[0]["path"], **options)
+        stages = [AIUpscaler(scale_factor=m["scale"], model_path=m["path"], **options) for m in models]
+        return ChainedUpscaler(stages, scale)
+
+    def _create_opencv_upscaler(self, scale):
+        return OpenCVUpscaler(
+            scale_factor=scale,
+            interpolation=self.config.get("INTERPOLATION", "cubic").lower(),
+            sharpen=float(self.config.get("SHARPEN", 0)),
+            threads=int(self.config.get("OPENCV_THREADS", 0))
+        )
+
+    def process(self, video_path, progress_callback=None, content_hash=None):
+        """Run the full upscaling pipeline.
 
-    def process(self, video_path):
-        """Run the full upscaling pipeline."""
+        Frames are streamed from the decoder, upscaled in memory and piped
+        straight into the encoder, so no intermediate images touch the disk.
+        With WORKERS > 1 the video is split into chunks that are upscaled in
+        separate processes and joined losslessly afterwards. With CHECKPOINT
+        enabled, finished chunks are kept until the job succeeds, so running
+        the same input with the same settings again resumes where it stopped.
+        With a coordinator, chunks are upscaled by remote workers instead
+        (locally if no worker registers within WORKER_WAIT seconds).
+        With STREAM_OUTPUT enabled, finished chunks are also published as an
+        HLS playlist under OUTPUT_DIR/streams/<video id> while the job runs
+        (see SegmentStream); the final MP4 is still joined from the chunks.
+
+        Args:
+            video_path: Path to the source video.
+            progress_callback: Optional callable(frames_done, frames_total)
+                invoked as frames are finished.
+            content_hash: sha256 of the input, if the caller already has it;
+                saves hashing the file again for the checkpoint.
+
+        The result includes per-stage timings and counters under "metrics",
+        and "playlist_path" when streaming. With INCREMENTAL enabled on the
+        AI tier, "tiles_recomputed" is the fraction of tiles that went
+        through the model (see IncrementalUpscaler).
+        With PROFILE set to "cprofile" or "torch" the job is also profiled
+        and the report path is returned as "profile_path".
+        """
+        video_id = os.path.splitext(os.path.basename(video_path))[0]
+        profile_prefix = os.path.join(self.config.get("PROFILE_DIR", "storage/profiles"), f"{video_id}_profile")
+        with profiled(self.config.get("PROFILE", "off").lower(), profile_prefix) as report:
+            result = self._process(video_path, video_id, progress_callback, content_hash)
+        if "path" in report:
+            print(f"Profile written to {report['path']}")
+            result["profile_path"] = report["path"]
+        return result
+
+    def _process(self, video_path, video_id, progress_callback=None, content_hash=None):
         start_time = time.time()
+        metrics = JobMetrics()
+        self._apply_budget()
         
         # 1. Get Metadata
         print(f"Extracting metadata for {video_path}...")
-        meta = self.ffmpeg.get_video_metadata(video_path)
+        with metrics.stage("probe"):
+            meta = self.ffmpeg.get_video_metadata(video_path)
         print(f"Original Resolution: {meta['width']}x{meta['height']} | FPS: {meta['fps']}")
 
-        # 2. Setup Temp Dirs
-        video_id = os.path.splitext(os.path.basename(video_path))[0]
-        extraction_dir = os.path.join(self.config["TEMP_DIR"], f"{video_id}_input")
-        processed_dir = os.path.join(self.config["TEMP_DIR"], f"{video_id}_output")
+        # 2. Prepare Output
+        output_path = self.output_path_for(video_path)
+
+        # 3. Decode -> Upscale -> Encode
+        print(f"Upscaling frames (Scale: {self.upscaler.scale_factor}x)...")
+        workers = int(self.config.get("WORKERS", 1))
+        frames_resumed = 0
+        playlist_path = None
+        # Streaming and remote workers go chunk by chunk, so they always take the chunked path
+        if workers > 1 or self.checkpointing or self.streaming or self.coordinator is not None:
+            if self.checkpointing:
+                checkpoint = Checkpoint.for_job(
+                    self.config["TEMP_DIR"],
+                    video_path,
+                    self._job_settings(),
+                    content_hash=content_hash,
+                    max_age_sec=float(self.config.get("CHECKPOINT_MAX_AGE_HOURS", 72)) * 3600
+                )
+            else:
+                checkpoint = Checkpoint(os.path.join(self.config["TEMP_DIR"], f"{video_id}_chunks"), None, resume=False)
+            stream = stream_dir(self.config["OUTPUT_DIR"], video_id) if self.streaming else None
+            try:
+                frame_count, frames_reused, frames_resumed = self._process_chunked(
+                    video_path, meta, output_path, workers, checkpoint, metrics, progress_callback, stream
+                )
+            except BaseException:
+                # Keep finished chunks around so a re-submitted job can resume
+                if checkpoint.resume:
+                    checkpoint.release()
+                else:
+                    checkpoint.discard()
+                raise
+            checkpoint.discard()
+            if stream is not None:
+                playlist_path = os.path.join(stream, PLAYLIST_NAME)
+        else:
+            # Encode video only, then mux the audio with stream copy: -shortest
+            # on a live pipe can cut the video when the audio copy runs ahead
+            video_only_path = os.path.join(self.config["TEMP_DIR"], f"{video_id}_video.mp4")
+            try:
+                progress = tqdm(desc="Upscaling", total=meta['frames'])
+                frame_count, frames_reused = self.upscale_range(
+                    video_path,
+                    meta,
+                    video_only_path,
+                    progress=progress,
+                    progress_callback=progress_callback,
+                    metrics=metrics
+                )
+                progress.close()
+                with metrics.stage("mux"):
+                    self.ffmpeg.concat_segments([video_only_path], output_path, audio_path=video_path)
+            finally:
+                if os.path.exists(video_only_path):
+                    os.remove(video_only_path)
+        print(f"Upscaled {frame_count} frames ({frames_reused} reused from duplicates, {frames_resumed} resumed).")
+
+        end_time = time.time()
+        duration = end_time - start_time
         
-        os.makedirs(extraction_dir, exist_ok=True)
-        os.makedirs(processed_dir, exist_ok=True)
-
-        try:
-            # 3. Extract Frames
-            print("Extracting frames...")
-            self.ffmpeg.extract_frames(video_path, extraction_dir)
-            
-            frames = sorted([f for f in os.listdir(extraction_dir) if f.endswith('.png')])
-            print(f"Extracted {len(frames)} frames.")
-
-            # 4. Upscale Frames
-            print(f"Upscaling frames (Scale: {self.upscaler.scale_factor}x)...")
-            for frame_name in tqdm(frames, desc="Upscaling"):
-                input_frame = os.path.join(extraction_dir, frame_name)
-                output_frame = os.path.join(processed_dir, frame_name)
-                self.upscaler.upscale(input_frame, output_frame)
-
-            # 5. Assemble Video
-            output_filename = f"{video_id}_upscaled_{self.upscaler.scale_factor}x.mp4"
-            output_path = os.path.join(self.config["OUTPUT_DIR"], output_filename)
-            
-            print("Assembling video...")
-            self.ffmpeg.assemble_video(
-                processed_dir, 
-                video_path, 
-                output_path, 
-                fps=meta['fps']
+        # 4. Return Metadata for output
+        with metrics.stage("probe"):
+            final_meta = self.ffmpeg.get_video_metadata(output_path)
+        result = {
+            "status": "success",
+            "output_path": output_path,
+            "process_duration_sec": round(duration, 2),
+            "frames": frame_count,
+            "frames_reused": frames_reused,
+            "frames_resumed": frames_resumed,
+            "original_resolution": f"{meta['width']}x{meta['height']}",
+            "new_resolution": f"{final_meta['width']}x{final_meta['height']}",
+            "filesize": final_meta['filesize'],
+            "metrics": metrics.as_dict()
+        }
+        if playlist_path is not None:
+            result["playlist_path"] = playlist_path
+        counters = result["metrics"]["counters"]
+        if counters.get("tiles_checked"):
+            result["tiles_recomputed"] = round(counters["tiles_recomputed"] / counters["tiles_checked"], 4)
+        return result
+
+    def output_path_for(self, video_path):
+        """Where process() writes the upscaled version of video_path."""
+        video_id = os.path.splitext(os.path.basename(video_path))[0]
+        return os.path.join(self.config["OUTPUT_DIR"], f"{video_id}_upscaled_{self.upscaler.scale_factor}x.mp4")
+
+    def preview(self, video_path, frames=3, clip_seconds=0.0, preview_dir=None):
+        """Upscale a few sampled frames to show the result before a full run.
+
+        Frames are taken at evenly spaced points by seeking, so only they are
+        decoded. Each is saved as a side-by-side still (source enlarged with
+        nearest neighbour on the left, upscaled on the right). With
+        clip_seconds > 0 a short clip from the middle is upscaled as well.
+        The measured time per frame gives a projection for the whole video.
+
+        Args:
+            video_path: Path to the source video.
+            frames: Number of stills to sample.
+            clip_seconds: Length of the optional preview clip.
+            preview_dir: Where the stills and clip go (default
+                OUTPUT_DIR/previews); the caller owns the files.
+
+        Returns:
+            Dict with the still and clip paths, sec_per_frame and projected_sec.
+        """
+        start_time = time.time()
+        meta = self.ffmpeg.get_video_metadata(video_path)
+        scale = self.upscaler.scale_factor
+        total = max(meta['frames'], 1)
+        video_id = os.path.splitext(os.path.basename(video_path))[0]
+        preview_dir = preview_dir or os.path.join(self.config["OUTPUT_DIR"], "previews")
+        os.makedirs(preview_dir, exist_ok=True)
+
+        positions = sorted({int(total * (i + 1) / (frames + 1)) for i in range(max(frames, 1))})
+        stills = []
+        frame_times = []
+        for i, position in enumerate(positions):
+            sampled = list(self.ffmpeg.read_frames(
+                video_path, meta['width'], meta['height'], start_frame=position, frame_count=1, fps=meta['fps']
+            ))
+            if not sampled:
+                continue
+            if i == 0:
+                # Untimed first run so model warm-up (tracing, CUDA init) is not projected
+                self.upscaler.upscale_batch(sampled)
+            mark = time.perf_counter()
+            upscaled = self.upscaler.upscale_batch(sampled)[0]
+            frame_times.append(time.perf_counter() - mark)
+
+            source = cv2.resize(sampled[0], (upscaled.shape[1], upscaled.shape[0]), interpolation=cv2.INTER_NEAREST)
+            still_path = os.path.join(preview_dir, f"{video_id}_preview_{position:06d}.png")
+            cv2.imwrite(still_path, np.hstack([source, upscaled]))
+            stills.append(still_path)
+
+        sec_per_frame = float(np.median(frame_times)) if frame_times else None
+        clip_path = None
+        if clip_seconds > 0:
+            clip_frames = max(1, int(round(clip_seconds * meta['fps'])))
+            clip_start = max(0, min(total - clip_frames, total // 2 - clip_frames // 2))
+            clip_path = os.path.join(preview_dir, f"{video_id}_preview.mp4")
+            mark = time.perf_counter()
+            written, _ = self.upscale_range(video_path, meta, clip_path, start_frame=clip_start, frame_count=clip_frames)
+            if written:
+                # Includes decode and encode, so it is the better estimate
+                sec_per_frame = (time.perf_counter() - mark) / written
+
+        workers = max(1, int(self.config.get("WORKERS", 1)))
+        projected = sec_per_frame * meta['frames'] / workers if sec_per_frame is not None else None
+        return {
+            "stills": stills,
+            "clip_path": clip_path,
+            "sec_per_frame": round(sec_per_frame, 4) if sec_per_frame is not None else None,
+            "projected_sec": round(projected, 1) if projected is not None else None,
+            "frames_total": meta['frames'],
+            "original_resolution": f"{meta['width']}x{meta['height']}",
+            "new_resolution": f"{meta['width'] * scale}x{meta['height'] * scale}",
+            "preview_duration_sec": round(time.time() - start_time, 2)
+        }
+
+    def upscale_range(self, video_path, meta, output_path, start_frame=0, frame_count=None, progress=None, progress_callback=None, metrics=None):
+        """Stream a range of frames through the upscaler into a video-only file.
+
+        Args:
+            video_path: Path to the source video.
+            meta: Metadata from FFmpegRunner.get_video_metadata.
+            output_path: Where to write the encoded frames.
+            start_frame: First frame of the range.
+            frame_count: Number of frames, or None to go to the end.
+            progress: Optional tqdm bar updated per batch.
+            progress_callback: Optional callable(frames_done, frames_total).
+            metrics: Optional JobMetrics that receives decode / upscale /
+                encode timings and frame, fallback and temp byte counts.
+
+        With OVERLAP enabled, decoding and encoding run on their own threads
+        alongside inference (see run_overlapped); otherwise the three stages
+        take turns.
+
+        Returns:
+            (frames written, frames reused from duplicates)
+        """
+        metrics = metrics if metrics is not None else JobMetrics()
+        self._apply_budget()
+        dedupe = self._create_deduplicator()
+        incremental = self._create_incremental()
+        upscaler = incremental if incremental is not None else self.upscaler
+        fallbacks_before = getattr(self.upscaler, "fallback_frames", 0)
+
+        def upscale_batch(batch, out=None):
+            self._apply_budget()
+            if dedupe is not None:
+                return dedupe.upscale_batch(upscaler, batch, out)
+            return upscaler.upscale_batch(batch, out)
+
+        if self.overlap:
+            written = self._upscale_range_overlapped(
+                video_path, meta, output_path, start_frame, frame_count, upscale_batch, metrics,
+                progress, progress_callback
+            )
+        else:
+            written = self._upscale_range_serial(
+                video_path, meta, output_path, start_frame, frame_count, upscale_batch, metrics,
+                progress, progress_callback
             )
 
-            end_time = time.time()
-            duration = end_time - start_time
-            
-            # 6. Return Metadata for output
-            final_meta = self.ffmpeg.get_video_metadata(output_path)
-            return {
-                "status": "success",
-                "output_path": output_path,
-                "process_duration_sec": round(duration, 2),
-                "original_resolution": f"{meta['width']}x{meta['height']}",
-                "new_resolution": f"{final_meta['width']}x{final_meta['height']}",
-                "filesize": final_meta['filesize']
-            }
-
-        finally:
-            # 7. Cleanup
-            print("Cleaning up temporary files...")
-            shutil.rmtree(extraction_dir, ignore_errors=True)
-            shutil.rmtree(processed_dir, ignore_errors=True)
+        reused = dedupe.reused if dedupe is not None else 0
+        metrics.count("frames", written)
+        metrics.count("frames_reused", reused)
+        if incremental is not None:
+            metrics.count("tiles_checked", incremental.tiles_checked)
+            metrics.count("tiles_recomputed", incremental.tiles_recomputed)
+        metrics.count("fallback_frames", getattr(self.upscaler, "fallback_frames", 0) - fallbacks_before)
+        metrics.count("temp_bytes", os.path.getsize(output_path))
+        return written, reused
+
+    def _open_range_writer(self, meta, output_path):
+        return self.ffmpeg.open_writer(
+            output_path,
+            meta['width'] * self.upscaler.scale_factor,
+            meta['height'] * self.upscaler.scale_factor,
+            fps=meta['fps']
+        )
+
+    def _upscale_range_overlapped(self, video_path, meta, output_path, start_frame, frame_count, upscale_batch, metrics, progress, progress_callback):
+        scale = self.upscaler.scale_factor
+        done = [0]
+
+        def on_batch(count):
+            done[0] += count
+            if progress is not None:
+                progress.update(count)
+            if progress_callback is not None:
+                progress_callback(done[0], frame_count or meta['frames'])
+
+        reader = self.ffmpeg.open_reader(
+            video_path,
+            meta['width'],
+            meta['height'],
+            start_frame=start_frame,
+            frame_count=frame_count,
+            fps=meta['fps']
+        )
+        with reader, self._open_range_writer(meta, output_path) as writer:
+            written = run_overlapped(
+                reader,
+                writer,
+                upscale_batch,
+                self.batch_size,
+                (meta['height'], meta['width'], 3),
+                (meta['height'] * scale, meta['width'] * scale, 3),
+                self.ring_frames,
+                metrics,
+                on_batch
+            )
+            # Waiting for the encoder to flush counts as encode time
+            flush_start = time.perf_counter()
+        metrics.add_time("encode", time.perf_counter() - flush_start)
+        return written
+
+    def _upscale_range_serial(self, video_path, meta, output_path, start_frame, frame_count, upscale_batch, metrics, progress, progress_callback):
+        written = 0
+        frames = self.ffmpeg.read_frames(
+            video_path,
+            meta['width'],
+            meta['height'],
+            start_frame=start_frame,
+            frame_count=frame_count,
+            fps=meta['fps']
+        )
+        with closing(frames):
+            with self._open_range_writer(meta, output_path) as writer:
+                for batch in metrics.timed_iter("decode", self._batched(frames)):
+                    with metrics.stage("upscale"):
+                        upscaled_batch = upscale_batch(batch)
+                    metrics.count("upscale_calls")
+                    with metrics.stage("encode"):
+                        for upscaled in upscaled_batch:
+                            writer.write(upscaled)
+                    written += len(batch)
+                    if progress is not None:
+                        progress.update(len(batch))
+                    if progress_callback is not None:
+                        progress_callback(written, frame_count or meta['frames'])
+                # Waiting for the encoder to flush counts as encode time
+                flush_start = time.perf_counter()
+            metrics.add_time("encode", time.perf_counter() - flush_start)
+        return written
+
+    def _job_settings(self):
+        return job_settings(self.config, self.model_names)
+
+    def _process_chunked(self, video_path, meta, output_path, workers, checkpoint, metrics, progress_callback=None, stream=None):
+        """Upscale the chunks not yet in the checkpoint, then concat them and mux audio once.
+
+        Stage timings from pool workers are added up, so with several workers
+        they can exceed the job's wall time. With ``stream`` set to a
+        directory, chunks are published there as they finish (SegmentStream).
+
+        Returns:
+            (frames, frames reused from duplicates, frames taken from an earlier run)
+        """
+        chunks = checkpoint.chunks
+        if chunks is None:
+            with metrics.stage("plan"):
+                chunks = checkpoint.set_chunks(plan_chunks(
+                    self.ffmpeg,
+                    video_path,
+                    meta,
+                    mode=self.config.get("CHUNK_MODE", "time"),
+                    chunk_seconds=float(self.config.get("CHUNK_SECONDS", 10)),
+                    scene_threshold=float(self.config.get("SCENE_THRESHOLD", 0.4))
+                ))
+        pending = [i for i in range(len(chunks)) if not checkpoint.is_done(i)]
+        frames_resumed, _ = checkpoint.totals()
+        if frames_resumed:
+            print(f"Resuming: {len(chunks) - len(pending)} of {len(chunks)} chunks already done.")
+
+        progress = tqdm(desc="Upscaling", total=meta['frames'], initial=frames_resumed)
+
+        segments = None
+        if stream is not None:
+            segments = SegmentStream(self.ffmpeg, video_path, meta, chunks, stream)
+            for i in sorted(checkpoint.completed):
+                segments.publish(i, checkpoint.segment_path(i), checkpoint.completed[i][0])
+
+        def finished(index, written, reused):
+            checkpoint.mark_done(index, written, reused)
+            if segments is not None:
+                with metrics.stage("stream"):
+                    segments.publish(index, checkpoint.segment_path(index), written)
+            if progress_callback is not None:
+                progress_callback(checkpoint.totals()[0], meta['frames'])
+
+        if self.coordinator is not None and pending:
+            print(f"Split into {len(chunks)} chunks for remote workers.")
+
+            def remote_done(index, written, reused, chunk_metrics):
+                metrics.merge(chunk_metrics)
+                progress.update(written)
+                finished(index, written, reused)
+
+            left = self.coordinator.run_chunks(
+                video_path,
+                meta,
+                self._job_settings(),
+                [(i, *chunks[i]) for i in pending],
+                checkpoint.segment_path,
+                remote_done
+            )
+            # Chunks taken back because no worker showed up are done here
+            pending = [index for index, _, _ in left]
+
+        if workers > 1 and len(pending) > 1:
+            threads = int(self.config.get("THREADS_PER_WORKER", 0)) or default_threads_per_worker(workers)
+            if self.budget is not None:
+                # Pool workers are processes of their own, so they can split the job's share exactly
+                threads = max(1, self.budget.threads // workers)
+            print(f"Split into {len(chunks)} chunks across {workers} workers ({threads} threads each).")
+
+            # Spawn (not fork) so workers never inherit torch/OpenMP thread state
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(pending)),
+                mp_context=context,
+                initializer=init_worker,
+                initargs=(self.config, threads)
+            ) as pool:
+                futures = {
+                    pool.submit(process_chunk, video_path, meta, *chunks[i], checkpoint.segment_path(i)): i
+                    for i in pending
+                }
+                for future in as_completed(futures):
+                    written, reused, chunk_metrics = future.result()
+                    metrics.merge(chunk_metrics)
+                    progress.update(written)
+                    finished(futures[future], written, reused)
+        else:
+            for i in pending:
+                start, count = chunks[i]
+                done_before = checkpoint.totals()[0]
+                written, reused = self.upscale_range(
+                    video_path,
+                    meta,
+                    checkpoint.segment_path(i),
+                    start_frame=start,
+                    frame_count=count,
+                    progress=progress,
+                    progress_callback=progress_callback and (
+                        lambda done, total: progress_callback(done_before + done, meta['frames'])
+                    ),
+                    metrics=metrics
+                )
+                finished(i, written, reused)
+        progress.close()
+
+        print("Joining chunks...")
+        with metrics.stage("mux"):
+            self.ffmpeg.concat_segments(checkpoint.segment_paths(), output_path, audio_path=video_path)
+        if segments is not None:
+            segments.finish()
+        frame_count, frames_reused = checkpoint.totals()
+        return frame_count, frames_reused, frames_resumed
+
+    def _apply_budget(self):
+        """Cap this job's FFmpeg processes and OpenCV frame pool at its current CPU budget.
+
+        Called before every batch, so the caps follow other jobs starting and
+        finishing; FFmpeg picks up a new value with the next process it starts.
+        """
+        if self.budget is None:
+            return
+        self.budget.apply()
+        threads = self.budget.threads
+        self.ffmpeg.threads = threads
+        if isinstance(self.upscaler, OpenCVUpscaler):
+            self.upscaler.set_threads(threads)
+
+    def close(self):
+        """Release the upscaler (e.g. hand a shared AI model back to the registry)."""
+        self.upscaler.close()
+
+    def _create_deduplicator(self):
+        """Per-job duplicate frame index, or None when DEDUPE is off."""
+        if self.dedupe_mode == "off":
+            return None
+        return FrameDeduplicator(
+            mode=self.dedupe_mode,
+            max_entries=int(self.config.get("DEDUPE_CACHE_SIZE", 8)),
+            threshold=float(self.config.get("DEDUPE_THRESHOLD", 1.0))
+        )
+
+    def _create_incremental(self):
+        """Per-range changed-tile upscaler, or None unless INCREMENTAL is on and the AI tier runs."""
+        # OpenCV costs the same per pixel as the diff itself, so only the model is worth skipping
+        if not self.incremental or not self.model_names:
+            return None
+        return IncrementalUpscaler(
+            self.upscaler,
+            tile_size=int(self.config.get("INCREMENTAL_TILE", 64)),
+            margin=int(self.config.get("INCREMENTAL_MARGIN", 16)),
+            threshold=float(self.config.get("INCREMENTAL_THRESHOLD", 8.0)),
+            refresh_interval=int(self.config.get("INCREMENTAL_REFRESH", 60))
+        )
+
+    def _batched(self, frames):
+        """Group a frame iterator into lists of up to batch_size frames."""
+        batch = []
+        for frame in frames:
+            batch.append(frame)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
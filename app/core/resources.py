@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+
+def parse_cores(spec):
+    """CPU ids from a list like "0-3,8,10-11"."""
+    cores = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cores.update(range(int(first), int(last) + 1))
+        else:
+            cores.add(int(part))
+    return sorted(cores)
+
+def available_cores():
+    """CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+class CpuBudget:
+    """Threads one running job may use: its share of the cores right now.
+
+    ``threads`` is re-read from the manager on every access, so it grows
+    when other jobs finish and shrinks when new ones are admitted.
+    """
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+
+    @property
+    def threads(self):
+        return self.manager.share()
+
+    def apply(self):
+        """Size the process-wide torch / OpenCV pools (once per manager).
+
+        Those pools are shared by every job in the process, so they stay at
+        the fixed ``pool_threads`` split; the job's own FFmpeg processes and
+        OpenCV frame pool follow ``threads`` (see UpscalePipeline).
+
+        Returns:
+            True if the pools were resized by this call.
+        """
+        return self.manager.apply_threads()
+
+    def release(self):
+        self.manager.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+class ResourceManager:
+    """Splits the host's cores evenly between the jobs one process is running.
+
+    Each running job's budget is ``len(cores) // running jobs`` threads, so
+    a job alone gets every core and the shares shrink as jobs are admitted
+    and grow back as they are released. Pipelines re-read their budget
+    between batches and cap the job's FFmpeg processes and OpenCV frame pool
+    at it.
+
+    torch and OpenCV also keep process-wide pools, and affinity set from a
+    thread only binds that thread, so cores cannot be carved out per job
+    inside one process. Those pools are sized once to ``pool_threads``
+    (``len(cores) // max_jobs``), which stays within the cores however many
+    jobs run.
+
+    Args:
+        cores: CPU ids to use (default: all this process may use).
+        max_jobs: Jobs the process runs at the same time.
+        pin: Restrict the whole process to ``cores`` (Linux only). Threads
+            inherit the mask of the thread that starts them, so create the
+            manager from the main thread before worker threads start.
+    """
+    def __init__(self, cores=None, max_jobs=1, pin=False):
+        self.cores = sorted(cores) if cores else available_cores()
+        self.max_jobs = max(1, max_jobs)
+        self.pool_threads = max(1, len(self.cores) // self.max_jobs)
+        self.pin = pin
+        self._lock = threading.Lock()
+        self._budgets = []
+        self._sized = set()
+        if pin and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cores)
+
+    def acquire(self, job_id):
+        budget = CpuBudget(self, job_id)
+        with self._lock:
+            self._budgets.append(budget)
+        return budget
+
+    def release(self, budget):
+        with self._lock:
+            if budget in self._budgets:
+                self._budgets.remove(budget)
+
+    def share(self):
+        """Threads each running job may use now."""
+        with self._lock:
+            return max(1, len(self.cores) // max(1, len(self._budgets)))
+
+    def budgets(self):
+        """(job id, threads) of every running job, for monitoring."""
+        share = self.share()
+        with self._lock:
+            return [(budget.job_id, share) for budget in self._budgets]
+
+    def apply_threads(self):
+        """Set the torch / OpenCV pools to pool_threads, once per library."""
+        import cv2
+        with self._lock:
+            changed = False
+            if "cv2" not in self._sized:
+                cv2.setNumThreads(self.pool_threads)
+                self._sized.add("cv2")
+                changed = True
+            # Only jobs on the AI tier import torch; no need to pull it in otherwise
+            torch = sys.modules.get("torch")
+            if torch is not None and "torch" not in self._sized:
+                torch.set_num_threads(self.pool_threads)
+                self._sized.add("torch")
+                changed = True
+            return changed
+
+def resource_manager_from_config(config, max_jobs=1):
+    """ResourceManager for CPU_PARTITION / CPU_CORES / CPU_AFFINITY, or None when partitioning is off."""
+    if config.get("CPU_PARTITION", "False").lower() != "true":
+        return None
+    cores = parse_cores(config.get("CPU_CORES", "")) or None
+    return ResourceManager(cores, max_jobs=max_jobs, pin=config.get("CPU_AFFINITY", "False").lower() == "true")
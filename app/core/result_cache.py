@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+def cache_key(content_hash, settings):
+    """Key for a result: the same input with the same settings gives the same output.
+
+    Args:
+        content_hash: sha256 of the input.
+        settings: Output settings from pipeline.job_settings().
+    """
+    source = json.dumps([content_hash, settings], sort_keys=True)
+    return hashlib.sha256(source.encode()).hexdigest()
+
+class ResultCache:
+    """Content-addressed cache of finished outputs, evicted least recently used.
+
+    Each entry owns an output file, the upload it was made from and, for
+    streamed jobs, the directory of published segments. When the
+    files of all entries add up to more than ``max_bytes``, the least
+    recently used entries are removed along with their files.
+
+    Args:
+        db_path: SQLite database file (can be shared with the JobQueue).
+        max_bytes: Size cap for cached outputs plus uploads.
+    """
+    def __init__(self, db_path, max_bytes):
+        self.max_bytes = max_bytes
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    key TEXT PRIMARY KEY,
+                    output_path TEXT NOT NULL,
+                    input_path TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+
+    def get(self, key):
+        """Cache entry for key (with the stored job result under "result"), or None.
+
+        Entries whose output file has gone missing are dropped.
+        """
+        with self._lock, self._db:
+            row = self._db.execute("SELECT * FROM result_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(row["output_path"]):
+                self._db.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE result_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        return dict(row, result=json.loads(row["result"]))
+
+    def put(self, key, input_path, result):
+        """Remember a finished job's output, then evict down to the size cap.
+
+        The new entry itself is never evicted, even if it alone exceeds the cap.
+        """
+        output_path = result["output_path"]
+        paths = [output_path, input_path]
+        stream = os.path.dirname(result["playlist_path"]) if "playlist_path" in result else None
+        if stream and os.path.isdir(stream):
+            paths += [os.path.join(stream, name) for name in os.listdir(stream)]
+        size = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO result_cache (key, output_path, input_path, result, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, output_path, input_path, json.dumps(result), size, time.time())
+            )
+        self.evict(keep=key)
+
+    def total_bytes(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM result_cache").fetchone()[0]
+
+    def evict(self, keep=None):
+        """Delete least recently used entries (except ``keep``) until the cache fits in max_bytes."""
+        with self._lock, self._db:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM result_cache").fetchone()[0]
+            rows = self._db.execute("SELECT * FROM result_cache ORDER BY last_used ASC").fetchall()
+            for row in rows:
+                if total <= self.max_bytes:
+                    break
+                if row["key"] == keep:
+                    continue
+                for path in (row["output_path"], row["input_path"]):
+                    if os.path.exists(path):
+                        os.remove(path)
+                playlist_path = json.loads(row["result"]).get("playlist_path")
+                if playlist_path:
+                    shutil.rmtree(os.path.dirname(playlist_path), ignore_errors=True)
+                self._db.execute("DELETE FROM result_cache WHERE key = ?", (row["key"],))
+                total -= row["size"]
+                print(f"Evicted cached result {row['output_path']}")
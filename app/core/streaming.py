@@ -0,0 +1,119 @@
+import math
+import os
+import shutil
+import struct
+
+PLAYLIST_NAME = "index.m3u8"
+
+def stream_dir(output_dir, video_id):
+    """Where a job's progressive segments and playlist are published."""
+    return os.path.join(output_dir, "streams", video_id)
+
+def _init_size(path):
+    """Bytes before the first 'moof' box of a fragmented MP4 (its init segment)."""
+    offset = 0
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No media fragment in {path}")
+            size, box_type = struct.unpack(">I4s", header)
+            if box_type == b"moof":
+                return offset
+            header_size = 8
+            if size == 0:
+                # The box runs to the end of the file, so no moof can follow it
+                raise ValueError(f"No media fragment in {path}")
+            if size == 1:
+                large = f.read(8)
+                if len(large) < 8:
+                    raise ValueError(f"Truncated box header in {path}")
+                size = struct.unpack(">Q", large)[0]
+                header_size = 16
+            if size < header_size:
+                raise ValueError(f"Invalid {box_type!r} box size {size} in {path}")
+            f.seek(size - header_size, os.SEEK_CUR)
+            offset += size
+
+class SegmentStream:
+    """Publishes finished chunks as an HLS (fMP4) playlist while a job runs.
+
+    Each chunk segment is remuxed (video stream copy, audio for the same time
+    range added as AAC) into a fragmented MP4 timestamped at its place in the
+    video. Chunks may finish out of order, so only the unbroken run from the
+    first chunk is listed; the playlist is rewritten atomically as it grows and
+    gets an end tag from finish(). Every file is a playable MP4 on its own,
+    and the playlist addresses its init and media parts by byte range.
+    """
+    def __init__(self, ffmpeg, video_path, meta, chunks, directory):
+        self.ffmpeg = ffmpeg
+        self.video_path = video_path
+        self.fps = meta['fps']
+        self.chunks = chunks
+        self.directory = directory
+        self.playlist_path = os.path.join(directory, PLAYLIST_NAME)
+        self.entries = []
+        self._ready = {}
+        # Set from the plan so it rarely changes once published; the last chunk runs to the end
+        last_count = max(meta['frames'] - chunks[-1][0], 1)
+        longest = max(count or last_count for _, count in chunks)
+        self.target_duration = max(1, math.ceil(longest / self.fps))
+
+        # Segments from an earlier run may have other settings, so start clean
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        self._write_playlist(ended=False)
+
+    def publish(self, index, segment_path, frames):
+        """Add a finished chunk; it is listed once every chunk before it is."""
+        self._ready[index] = (segment_path, frames)
+        while len(self.entries) in self._ready:
+            self._add(len(self.entries), *self._ready.pop(len(self.entries)))
+        self._write_playlist(ended=False)
+
+    def finish(self):
+        self._write_playlist(ended=True)
+
+    def _add(self, index, segment_path, frames):
+        start_frame = self.chunks[index][0]
+        name = f"segment_{index:05d}.mp4"
+        path = os.path.join(self.directory, name)
+        tmp_path = path + ".tmp"
+        self.ffmpeg.fragment_segment(
+            segment_path, tmp_path, start_frame / self.fps, frames / self.fps, audio_path=self.video_path
+        )
+        os.replace(tmp_path, path)
+        init_size = _init_size(path)
+        duration = frames / self.fps
+        self.target_duration = max(self.target_duration, math.ceil(duration))
+        self.entries.append({
+            "name": name,
+            "duration": duration,
+            "init_size": init_size,
+            "media_size": os.path.getsize(path) - init_size
+        })
+
+    def _write_playlist(self, ended):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:7",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            "#EXT-X-INDEPENDENT-SEGMENTS",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0"
+        ]
+        for entry in self.entries:
+            # Separately encoded chunks carry their own codec headers
+            lines += [
+                f"#EXT-X-MAP:URI=\"{entry['name']}\",BYTERANGE=\"{entry['init_size']}@0\"",
+                f"#EXTINF:{entry['duration']:.6f},",
+                f"#EXT-X-BYTERANGE:{entry['media_size']}@{entry['init_size']}",
+                entry["name"]
+            ]
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+
+        tmp_path = self.playlist_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.playlist_path)
@@ -1,36 +1,52 @@
+import argparse
 import os
 import sys
-from dotenv import load_dotenv
+import time
+from app.config import load_config
+from app.core.batch import collect_inputs, run_batch, summarize, write_report
 from app.core.pipeline import UpscalePipeline
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python -m app.main <path_to_video>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Upscale a video, or a batch of videos.")
+    parser.add_argument("video", nargs="?", help="Input video, or a directory / glob pattern for batch mode")
+    parser.add_argument("--manifest", help="Batch mode: text file listing one input path per line")
+    parser.add_argument("--jobs", type=int, default=1, help="Batch mode: videos processed at the same time")
+    parser.add_argument("--force", action="store_true", help="Batch mode: redo inputs whose output is up to date")
+    parser.add_argument("--report", help="Batch mode: report path, .json or .csv (default OUTPUT_DIR/batch_report.json)")
+    parser.add_argument("--preview", action="store_true", help="Only upscale a few sampled frames and project the full run time")
+    parser.add_argument("--preview-frames", type=int, default=3, help="Stills sampled by --preview")
+    parser.add_argument("--preview-clip", type=float, default=0.0, help="Also upscale a clip of this many seconds with --preview")
+    args = parser.parse_args()
 
-    video_input = sys.argv[1]
-    if not os.path.exists(video_input):
-        print(f"Error: File {video_input} not found.")
-        sys.exit(1)
+    video_input = args.video
+    if video_input is None and args.manifest is None:
+        parser.error("a video, directory, glob pattern or --manifest is required")
 
-    # Load configuration into environment
-    load_dotenv()
-    
-    # Ensure folder config for pipeline
-    config = {
-        "SCALE_FACTOR": os.getenv("SCALE_FACTOR", "2"),
-        "UPLOAD_DIR": os.getenv("UPLOAD_DIR", "storage/uploads"),
-        "OUTPUT_DIR": os.getenv("OUTPUT_DIR", "storage/outputs"),
-        "TEMP_DIR": os.getenv("TEMP_DIR", "storage/temp"),
-        "USE_AI": os.getenv("USE_AI", "True")
-    }
+    # Load configuration from environment / .env
+    config = load_config()
     
     # Ensure directories exist
     for key in ["UPLOAD_DIR", "OUTPUT_DIR", "TEMP_DIR"]:
         os.makedirs(config[key], exist_ok=True)
 
+    if args.manifest or not os.path.isfile(video_input):
+        run_batch_mode(config, args)
+        return
+
     try:
         pipeline = UpscalePipeline(config)
+        if args.preview:
+            result = pipeline.preview(video_input, frames=args.preview_frames, clip_seconds=args.preview_clip)
+            print("\n--- Preview ---")
+            for still in result["stills"]:
+                print(f"Still: {still}")
+            if result["clip_path"]:
+                print(f"Clip: {result['clip_path']}")
+            print(f"New Resolution: {result['new_resolution']}")
+            print(f"Time per frame: {result['sec_per_frame']} seconds")
+            print(f"Projected full run: {result['projected_sec']} seconds for {result['frames_total']} frames")
+            return
+
         result = pipeline.process(video_input)
         
         print("\n--- Upscaling Complete ---")
@@ -43,5 +59,24 @@ def main():
         print(f"\nAn error occurred during processing: {e}")
         sys.exit(1)
 
+def run_batch_mode(config, args):
+    inputs = collect_inputs(args.video, args.manifest)
+    if not inputs:
+        print(f"Error: No videos found for {args.video or args.manifest}.")
+        sys.exit(1)
+
+    start_time = time.time()
+    rows = run_batch(config, inputs, jobs=args.jobs, force=args.force)
+    summary = summarize(rows, time.time() - start_time)
+    report_path = args.report or os.path.join(config["OUTPUT_DIR"], "batch_report.json")
+    write_report(rows, summary, report_path)
+
+    print("\n--- Batch Complete ---")
+    print(f"Completed: {summary['completed']} | Skipped: {summary['skipped']} | Failed: {summary['failed']}")
+    print(f"Frames: {summary['frames']} in {summary['seconds']} seconds ({summary['fps']} fps)")
+    print(f"Report: {report_path}")
+    if summary["failed"]:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
@@ -1,26 +1,31 @@
+import hashlib
+import json
 import os
 import shutil
+import threading
+import time
 import uuid
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, Request
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, UploadFile, File, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from dotenv import load_dotenv
-from app.core.pipeline import UpscalePipeline
-
-# Load configuration
-load_dotenv()
+from app.config import load_config
+from app.core.cluster import ChunkCoordinator
+from app.core.estimator import ThroughputModel
+from app.core.job_queue import JobQueue, QueueFullError
+from app.core.metrics import metrics_registry
+from app.core.model_catalog import select_models
+from app.core.result_cache import ResultCache, cache_key
+from app.core.pipeline import UpscalePipeline, job_settings
+from app.core.resources import resource_manager_from_config
+from app.core.streaming import PLAYLIST_NAME, stream_dir
+from app.utils.ffmpeg import FFmpegRunner
 
 app = FastAPI(title="Video Upscaler AI")
 
 # Configuration
-CONFIG = {
-    "SCALE_FACTOR": os.getenv("SCALE_FACTOR", "2"),
-    "UPLOAD_DIR": os.getenv("UPLOAD_DIR", "storage/uploads"),
-    "OUTPUT_DIR": os.getenv("OUTPUT_DIR", "storage/outputs"),
-    "TEMP_DIR": os.getenv("TEMP_DIR", "storage/temp"),
-    "USE_AI": os.getenv("USE_AI", "True")
-}
+CONFIG = load_config()
 
 # Ensure directories exist
 for key in ["UPLOAD_DIR", "OUTPUT_DIR", "TEMP_DIR"]:
@@ -31,32 +36,219 @@ templates = Jinja2Templates(directory="app/templates")
 # Mount output directory to serve processed videos
 app.mount("/outputs", StaticFiles(directory=CONFIG["OUTPUT_DIR"]), name="outputs")
 
-# In-memory task tracking (for simplicity)
-tasks = {}
+# Finished outputs keyed by upload content and settings, shared with the queue database
+result_cache = None
+if CONFIG["RESULT_CACHE"].lower() == "true":
+    result_cache = ResultCache(CONFIG["QUEUE_DB"], int(CONFIG["RESULT_CACHE_MAX_MB"]) * 1024 * 1024)
+
+# With COORDINATOR enabled, chunks go to registered workers (python -m app.worker) instead of local processes
+coordinator = None
+if CONFIG["COORDINATOR"].lower() == "true":
+    coordinator = ChunkCoordinator(
+        worker_timeout=float(CONFIG["WORKER_TIMEOUT"]),
+        max_attempts=int(CONFIG["MAX_JOB_ATTEMPTS"]),
+        worker_wait=float(CONFIG["WORKER_WAIT"])
+    )
+
+# With CPU_PARTITION enabled, running jobs split the cores instead of each sizing its pools for the whole host
+resource_manager = resource_manager_from_config(CONFIG, max_jobs=int(CONFIG["MAX_CONCURRENT_JOBS"]))
 
-def process_video_task(task_id: str, input_path: str, scale: int, use_ai: bool):
+# Uploads are read and hashed in pieces of this size
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+@app.on_event("startup")
+def preload_models():
+    """Load and warm up the models for the default scale once so jobs share them."""
+    if CONFIG["USE_AI"].lower() != "true":
+        return
     try:
-        # Override config for this specific task
-        task_config = CONFIG.copy()
-        task_config["SCALE_FACTOR"] = str(scale)
-        task_config["USE_AI"] = str(use_ai)
-        
-        pipeline = UpscalePipeline(task_config)
-        result = pipeline.process(input_path)
-        tasks[task_id] = {
-            "status": "completed",
-            "result": result
-        }
+        from app.core.model_registry import registry
+        import torch
     except Exception as e:
-        tasks[task_id] = {
-            "status": "failed",
-            "error": str(e)
-        }
+        print(f"AI dependencies unavailable, skipping model preload: {e}")
+        return
+
+    registry.max_models = int(CONFIG["MAX_LOADED_MODELS"])
+    models = select_models(CONFIG, int(CONFIG["SCALE_FACTOR"]))
+    if not models:
+        print(f"Warning: No model found (MODEL_PATH={CONFIG['MODEL_PATH']}), skipping preload.")
+        return
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    # Same weights variant the jobs' AIUpscalers will ask for
+    precision = "int8" if CONFIG["PRECISION"].lower() == "int8" and device.type == "cpu" else "fp32"
+    for model in models:
+        registry.preload(model["path"], device, precision, CONFIG["CHANNELS_LAST"].lower() == "true")
+
+def process_video_task(job, progress_callback):
+    """Run one queued job through the pipeline (called by a queue worker)."""
+    task_config = build_task_config(job["config"])
+    task_config["PROFILE"] = job["config"].get("profile") or CONFIG["PROFILE"]
+    queue_wait = round(job["started_at"] - job["created_at"], 3)
+
+    budget = None
+    pipeline = None
+    try:
+        budget = resource_manager.acquire(job["task_id"]) if resource_manager is not None else None
+        pipeline = UpscalePipeline(task_config, coordinator=coordinator, budget=budget)
+        result = pipeline.process(
+            job["input_path"], progress_callback=progress_callback, content_hash=job["config"].get("content_hash")
+        )
+    except Exception:
+        metrics_registry.record_job("failed", queue_wait=queue_wait)
+        raise
     finally:
-        # Optionally cleanup upload file after processing
-        # if os.path.exists(input_path):
-        #     os.remove(input_path)
-        pass
+        # Hand the shared model back to the registry and the cores to the other jobs,
+        # also when the pipeline could not be built
+        if pipeline is not None:
+            pipeline.close()
+        if budget is not None:
+            budget.release()
+    result["queue_wait_sec"] = queue_wait
+    if "playlist_path" in result:
+        result["stream_url"] = output_url(result["playlist_path"])
+    metrics_registry.record_job("completed", result["metrics"], queue_wait)
+
+    # Only cache and time outputs the requested upscaler actually produced
+    fell_back = result["metrics"]["counters"].get("fallback_frames", 0) > 0
+    as_requested = not fell_back and bool(pipeline.model_names) == job["config"]["use_ai"]
+    use_ai, scale = job["config"]["use_ai"], job["config"]["scale"]
+    if result_cache is not None and job["cache_key"] and as_requested:
+        # Keyed on the models that ran, which differ from job["cache_key"] if the catalogue changed meanwhile
+        content_hash = job["config"].get("content_hash")
+        key = result_key(content_hash, use_ai, scale, pipeline.model_names) if content_hash else job["cache_key"]
+        result_cache.put(key, job["input_path"], result)
+    if as_requested:
+        width, height = (int(size) for size in result["original_resolution"].split("x"))
+        throughput.record(
+            throughput_key(use_ai, scale, pipeline.model_names),
+            width * height * (result["frames"] - result["frames_resumed"]),
+            result["process_duration_sec"]
+        )
+    return result
+
+def build_task_config(params):
+    """Server config with the per-request settings applied."""
+    task_config = CONFIG.copy()
+    task_config["SCALE_FACTOR"] = str(params["scale"])
+    task_config["USE_AI"] = str(params["use_ai"])
+    return task_config
+
+def output_url(path):
+    """URL under /outputs for a file written inside OUTPUT_DIR."""
+    return "/outputs/" + os.path.relpath(path, CONFIG["OUTPUT_DIR"]).replace(os.sep, "/")
+
+def model_names(use_ai, scale):
+    """AI models a job with these settings runs (empty for the OpenCV tier).
+
+    select_models caches its plan until the model files change, and the
+    job's pipeline reads the same plan. Finished jobs are keyed on the
+    models their pipeline actually ran, in case the files changed in between.
+    """
+    if not use_ai:
+        return []
+    return [model["name"] for model in select_models(CONFIG, scale)]
+
+def model_name(use_ai, scale, names=None):
+    """What produces the output for these settings (or for the given AI models)."""
+    names = model_names(use_ai, scale) if names is None else names
+    if names:
+        return "+".join(names) + f"-{CONFIG['PRECISION'].lower()}"
+    return f"opencv-{CONFIG['INTERPOLATION']}-{CONFIG['SHARPEN']}"
+
+def result_key(content_hash, use_ai, scale, names=None):
+    """Result cache key: the input plus every setting the job's output depends on."""
+    task_config = build_task_config({"scale": scale, "use_ai": use_ai})
+    names = model_names(use_ai, scale) if names is None else names
+    return cache_key(content_hash, job_settings(task_config, names))
+
+def throughput_key(use_ai, scale, names=None):
+    """Tier whose measured throughput predicts jobs with these settings."""
+    return f"{model_name(use_ai, scale, names)}-x{scale}"
+
+def within_limits(estimate, wait, deadline_sec):
+    """Whether a job fits MAX_JOB_SECONDS and its deadline; unknown costs are admitted."""
+    if estimate is None:
+        return True
+    max_seconds = float(CONFIG["MAX_JOB_SECONDS"])
+    if max_seconds and estimate > max_seconds:
+        return False
+    return deadline_sec is None or wait + estimate <= deadline_sec
+
+def serve_cached(key, input_path, params, filename, task_id):
+    """Response for an upload whose result is already cached, or None."""
+    cached = result_cache.get(key) if key is not None else None
+    if cached is None:
+        return None
+    # Same content and settings as an earlier job: reuse its output
+    os.remove(input_path)
+    job = job_queue.add_completed(
+        cached["input_path"],
+        params,
+        dict(cached["result"], cached=True),
+        filename=filename,
+        job_id=task_id,
+        cache_key=key
+    )
+    metrics_registry.inc("upscale_cache_hits_total", help_text="Uploads served from the result cache.")
+    return {"task_id": task_id, "status": job["status"], "result": job["result"]}
+
+def save_upload(upload, path):
+    """Stream an upload to disk and return the sha256 of its content."""
+    digest = hashlib.sha256()
+    with open(path, "wb") as buffer:
+        while True:
+            chunk = upload.file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+            buffer.write(chunk)
+    return digest.hexdigest()
+
+# Persistent job queue with a bounded worker pool
+job_queue = JobQueue(
+    CONFIG["QUEUE_DB"],
+    process_video_task,
+    max_workers=int(CONFIG["MAX_CONCURRENT_JOBS"]),
+    max_queued=int(CONFIG["MAX_QUEUED_JOBS"]),
+    max_attempts=int(CONFIG["MAX_JOB_ATTEMPTS"]),
+    order=CONFIG["QUEUE_ORDER"].lower()
+)
+
+# Measured throughput per upscaler tier on this host, for job time estimates
+throughput = ThroughputModel(CONFIG["QUEUE_DB"])
+
+def calibrate_tiers():
+    """Time the tiers jobs may use that were never measured here, so early jobs get estimates."""
+    default_scale = int(CONFIG["SCALE_FACTOR"])
+    # OpenCV is what jobs are down-tiered to, and cheap to measure at every common scale
+    tiers = [(False, scale) for scale in sorted({2, 4, default_scale})]
+    if CONFIG["USE_AI"].lower() == "true":
+        tiers.insert(0, (True, default_scale))
+    for use_ai, scale in tiers:
+        key = throughput_key(use_ai, scale)
+        if throughput.rate(key) is not None:
+            continue
+        pipeline = UpscalePipeline(build_task_config({"scale": scale, "use_ai": use_ai}))
+        try:
+            if bool(pipeline.model_names) == use_ai:
+                rate = throughput.calibrate(key, pipeline.upscaler)
+                print(f"Calibrated {key}: {rate / 1e6:.2f} Mpixel/s")
+        finally:
+            pipeline.close()
+
+@app.on_event("startup")
+def start_job_queue():
+    # Interrupted jobs are re-queued here and resume from their checkpoints
+    job_queue.start()
+
+@app.on_event("startup")
+def start_calibration():
+    if CONFIG["CALIBRATE"].lower() == "true":
+        threading.Thread(target=calibrate_tiers, name="calibrate-throughput", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_job_queue():
+    job_queue.stop(timeout=5)
 
 @app.get("/")
 async def index(request: Request):
@@ -72,36 +264,263 @@ async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request, "outputs": outputs})
 
 @app.post("/upscale")
-async def upscale_video(
-    background_tasks: BackgroundTasks, 
+def upscale_video(
     file: UploadFile = File(...),
     scale: int = 2,
-    use_ai: bool = True
+    use_ai: bool = True,
+    priority: int = 0,
+    profile: str = None,
+    deadline_sec: float = None
 ):
+    """Queue a video; the response carries the predicted processing time and ETA.
+
+    A plain def, so FastAPI runs it on its thread pool: the upload copy and
+    the ffprobe for the estimate never block the event loop.
+
+    Jobs predicted to exceed MAX_JOB_SECONDS, or to finish later than
+    deadline_sec from now, are moved to the OpenCV tier when DOWN_TIER
+    allows and that fits, and rejected with 422 otherwise.
+    """
     if not file.filename:
         return JSONResponse(status_code=400, content={"error": "No file uploaded"})
+    # Opt-in profiling for this job only; defaults to the PROFILE setting
+    if profile not in (None, "off", "cprofile", "torch"):
+        return JSONResponse(status_code=400, content={"error": "profile must be off, cprofile or torch"})
+
+    # Reject before storing the upload when there is no room in the queue
+    if job_queue.is_full():
+        return JSONResponse(status_code=429, content={"error": "Queue is full, try again later"})
     
     task_id = str(uuid.uuid4())
     file_ext = os.path.splitext(file.filename)[1]
     input_path = os.path.join(CONFIG["UPLOAD_DIR"], f"{task_id}{file_ext}")
     
-    with open(input_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    content_hash = save_upload(file, input_path)
+    params = {"scale": scale, "use_ai": use_ai, "profile": profile, "content_hash": content_hash}
+    key = result_key(content_hash, use_ai, scale) if result_cache is not None else None
+
+    cached = serve_cached(key, input_path, params, file.filename, task_id)
+    if cached is not None:
+        return cached
+
+    # Predict the job's cost on this host before admitting it
+    try:
+        meta = FFmpegRunner().get_video_metadata(input_path)
+    except (RuntimeError, ValueError, KeyError) as e:
+        os.remove(input_path)
+        return JSONResponse(status_code=400, content={"error": f"Could not read the video: {e}"})
+    estimate = throughput.estimate(throughput_key(use_ai, scale), meta)
+    wait = job_queue.estimate_wait(priority, estimate)
+    if not within_limits(estimate, wait, deadline_sec) and use_ai and CONFIG["DOWN_TIER"].lower() == "true":
+        fallback = throughput.estimate(throughput_key(False, scale), meta)
+        fallback_wait = job_queue.estimate_wait(priority, fallback)
+        if within_limits(fallback, fallback_wait, deadline_sec):
+            print(f"Down-tiering {file.filename} to OpenCV (AI estimate {estimate:.0f}s)")
+            use_ai, estimate, wait = False, fallback, fallback_wait
+            params = dict(params, use_ai=False, down_tiered=True)
+            key = result_key(content_hash, False, scale) if result_cache is not None else None
+            cached = serve_cached(key, input_path, params, file.filename, task_id)
+            if cached is not None:
+                return cached
+    if not within_limits(estimate, wait, deadline_sec):
+        os.remove(input_path)
+        return JSONResponse(status_code=422, content={
+            "error": "Job would exceed the time limit or deadline",
+            "estimated_sec": round(estimate, 1),
+            "eta_sec": round(wait + estimate, 1)
+        })
+
+    try:
+        job = job_queue.submit(
+            input_path,
+            params,
+            priority=priority,
+            filename=file.filename,
+            job_id=task_id,
+            cache_key=key,
+            estimated_sec=estimate
+        )
+    except QueueFullError as e:
+        os.remove(input_path)
+        return JSONResponse(status_code=429, content={"error": str(e)})
+
+    if job["task_id"] != task_id:
+        # An identical job is already queued or running; follow that one instead
+        os.remove(input_path)
+        metrics_registry.inc("upscale_jobs_coalesced_total", help_text="Uploads joined to an identical active job.")
     
-    tasks[task_id] = {
-        "status": "processing", 
-        "filename": file.filename,
-        "config": {"scale": scale, "use_ai": use_ai}
+    response = {
+        "task_id": job["task_id"],
+        "status": job["status"],
+        "queue_position": job.get("queue_position"),
+        "estimated_sec": round(job["estimated_sec"], 1) if job["estimated_sec"] is not None else None,
+        "eta_sec": job.get("eta_sec")
     }
-    background_tasks.add_task(process_video_task, task_id, input_path, scale, use_ai)
-    
-    return {"task_id": task_id, "status": "processing"}
+    if params.get("down_tiered"):
+        response["down_tiered"] = True
+    return response
+
+def sweep_previews(max_age_sec):
+    """Delete preview directories older than max_age_sec; their URLs have expired."""
+    root = os.path.join(CONFIG["OUTPUT_DIR"], "previews")
+    if not os.path.isdir(root):
+        return
+    now = time.time()
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if now - os.path.getmtime(path) > max_age_sec:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+@app.post("/preview")
+def preview_video(
+    file: UploadFile = File(...),
+    scale: int = 2,
+    use_ai: bool = True,
+    frames: int = 3,
+    clip_seconds: float = 0.0
+):
+    """Upscale a few sampled frames right away, outside the job queue.
+
+    The stills and clip live in a directory of their own for PREVIEW_TTL_MINUTES.
+    """
+    if not file.filename:
+        return JSONResponse(status_code=400, content={"error": "No file uploaded"})
+    if not 1 <= frames <= 10 or not 0 <= clip_seconds <= 10:
+        return JSONResponse(status_code=400, content={"error": "frames must be 1-10 and clip_seconds 0-10"})
+
+    sweep_previews(float(CONFIG["PREVIEW_TTL_MINUTES"]) * 60)
+    preview_id = str(uuid.uuid4())
+    preview_dir = os.path.join(CONFIG["OUTPUT_DIR"], "previews", preview_id)
+    file_ext = os.path.splitext(file.filename)[1]
+    input_path = os.path.join(CONFIG["TEMP_DIR"], f"preview_{preview_id}{file_ext}")
+    save_upload(file, input_path)
+    pipeline = None
+    try:
+        pipeline = UpscalePipeline(build_task_config({"scale": scale, "use_ai": use_ai}))
+        result = pipeline.preview(input_path, frames=frames, clip_seconds=clip_seconds, preview_dir=preview_dir)
+    except BaseException:
+        shutil.rmtree(preview_dir, ignore_errors=True)
+        raise
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+        os.remove(input_path)
+
+    result["stills"] = [output_url(path) for path in result["stills"]]
+    if result["clip_path"]:
+        result["clip_path"] = output_url(result["clip_path"])
+    result["expires_in_sec"] = int(float(CONFIG["PREVIEW_TTL_MINUTES"]) * 60)
+    return result
 
 @app.get("/status/{task_id}")
 async def get_status(task_id: str):
-    if task_id not in tasks:
+    job = job_queue.get(task_id)
+    if job is None:
         return JSONResponse(status_code=404, content={"error": "Task not found"})
-    return tasks[task_id]
+    if job["status"] == "processing" and CONFIG["STREAM_OUTPUT"].lower() == "true":
+        # Finished parts can be played from here before the job completes
+        video_id = os.path.splitext(os.path.basename(job["input_path"]))[0]
+        playlist_path = os.path.join(stream_dir(CONFIG["OUTPUT_DIR"], video_id), PLAYLIST_NAME)
+        if os.path.exists(playlist_path):
+            job["stream_url"] = output_url(playlist_path)
+    return job
+
+@app.post("/cluster/workers")
+async def register_worker(request: Request):
+    if coordinator is None:
+        return JSONResponse(status_code=404, content={"error": "Not running as a coordinator"})
+    body = await request.json()
+    worker_id = coordinator.register(body.get("name") or request.client.host)
+    return {"worker_id": worker_id, "heartbeat_seconds": coordinator.heartbeat_seconds}
+
+@app.get("/cluster/workers")
+async def list_workers():
+    if coordinator is None:
+        return JSONResponse(status_code=404, content={"error": "Not running as a coordinator"})
+    return {"workers": coordinator.workers()}
+
+@app.post("/cluster/workers/{worker_id}/heartbeat")
+async def worker_heartbeat(worker_id: str):
+    if coordinator is None or not coordinator.heartbeat(worker_id):
+        return JSONResponse(status_code=404, content={"error": "Unknown worker, register again"})
+    return {"ok": True}
+
+@app.post("/cluster/workers/{worker_id}/lease")
+async def lease_chunk(worker_id: str):
+    """Next chunk for a worker; 204 when there is no work, 404 when it must register again."""
+    try:
+        task = coordinator.lease(worker_id) if coordinator is not None else None
+    except KeyError:
+        return JSONResponse(status_code=404, content={"error": "Unknown worker, register again"})
+    if task is None:
+        return Response(status_code=204)
+    return task
+
+@app.get("/cluster/inputs/{job_id}")
+async def chunk_input(job_id: str):
+    try:
+        if coordinator is None:
+            raise KeyError(job_id)
+        return FileResponse(coordinator.input_path(job_id))
+    except KeyError:
+        return JSONResponse(status_code=404, content={"error": "Job is not running"})
+
+@app.post("/cluster/chunks/{task_id}")
+async def upload_chunk(task_id: str, request: Request, worker_id: str, frames: int, reused: int = 0):
+    """Encoded segment of a leased chunk, sent as the raw request body.
+
+    The body is read as a stream, so the handler stays async; file I/O runs
+    on the thread pool to keep the event loop free for other requests.
+    """
+    try:
+        if coordinator is None:
+            raise KeyError(task_id)
+        upload_path = coordinator.upload_path(task_id, worker_id)
+    except KeyError:
+        return JSONResponse(status_code=409, content={"error": "Chunk is not outstanding"})
+    f = await run_in_threadpool(open, upload_path, "wb")
+    try:
+        async for piece in request.stream():
+            await run_in_threadpool(f.write, piece)
+    finally:
+        await run_in_threadpool(f.close)
+    chunk_metrics = json.loads(request.headers.get("X-Chunk-Metrics", "{}"))
+    if not await run_in_threadpool(coordinator.complete, task_id, worker_id, upload_path, frames, reused, chunk_metrics):
+        await run_in_threadpool(os.remove, upload_path)
+        return JSONResponse(status_code=409, content={"error": "Chunk was already finished"})
+    return {"ok": True}
+
+@app.post("/cluster/chunks/{task_id}/fail")
+async def fail_chunk(task_id: str, request: Request, worker_id: str):
+    if coordinator is not None:
+        body = await request.json()
+        coordinator.fail(task_id, worker_id, body.get("error", "unknown error"))
+    return {"ok": True}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text format: per-stage totals, job counts and queue depth."""
+    gauges = [
+        ("upscale_queue_jobs", "Jobs in the queue database, by status.", count, {"status": status})
+        for status, count in job_queue.counts().items()
+    ]
+    if resource_manager is not None:
+        # Totals rather than one series per task, which would grow without bound
+        budgets = resource_manager.budgets()
+        gauges += [
+            ("upscale_budget_jobs", "Running jobs holding a CPU budget.", len(budgets), {}),
+            ("upscale_budget_threads", "CPU threads granted to running jobs in total.",
+             sum(threads for _, threads in budgets), {})
+        ]
+    try:
+        from app.core.model_registry import registry
+        gauges.append(("upscale_models_loaded", "AI models currently in memory.", len(registry.loaded()), {}))
+    except ImportError:
+        pass
+    return PlainTextResponse(metrics_registry.render(gauges), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
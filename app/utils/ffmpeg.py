@@ -1,12 +1,103 @@
 import subprocess
 import json
 import os
+import re
 import shutil
+import numpy as np
+
+
+class FrameReader:
+    """Reads raw BGR24 frames from an FFmpeg decoder process over stdout."""
+    def __init__(self, cmd, frame_size):
+        self.frame_size = frame_size
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=frame_size)
+
+    def readinto(self, frame):
+        """Fill a writable, contiguous uint8 array with the next frame.
+
+        Returns:
+            False once the stream has ended (the array is then unspecified).
+        """
+        view = memoryview(frame).cast("B")
+        filled = 0
+        while filled < self.frame_size:
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                break
+            filled += count
+        if filled < self.frame_size:
+            returncode = self.process.wait()
+            if returncode != 0:
+                raise RuntimeError(f"FFmpeg decoder failed with code {returncode}")
+            return False
+        return True
+
+    def close(self):
+        """Stop the decoder if it is still running (e.g. closed early by the consumer)."""
+        self.process.stdout.close()
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FrameWriter:
+    """Encodes raw BGR24 frames that are written to an FFmpeg process over stdin."""
+    def __init__(self, cmd):
+        self.cmd = cmd
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        """Send one BGR frame (numpy array) to the encoder."""
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        except BrokenPipeError:
+            returncode = self.process.wait()
+            raise RuntimeError(f"FFmpeg encoder exited early with code {returncode}")
+
+    def close(self):
+        """Flush the remaining frames and wait for the encoder to finish."""
+        if self.process.stdin and not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+        returncode = self.process.wait()
+        if returncode != 0:
+            raise RuntimeError(f"FFmpeg encoder failed with code {returncode}")
+
+    def abort(self):
+        """Stop the encoder without finalizing the output."""
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
 
 class FFmpegRunner:
-    def __init__(self, ffmpeg_path=None, ffprobe_path=None):
+    def __init__(self, ffmpeg_path=None, ffprobe_path=None, threads=0):
         self.ffmpeg = ffmpeg_path or os.getenv("FFMPEG_PATH", "ffmpeg")
         self.ffprobe = ffprobe_path or os.getenv("FFPROBE_PATH", "ffprobe")
+        # Codec and filter threads per decoder / encoder; 0 lets FFmpeg decide
+        self.threads = threads
+
+    def _thread_args(self):
+        if not self.threads:
+            return []
+        return ["-threads", str(self.threads), "-filter_threads", str(self.threads)]
 
     def get_video_metadata(self, video_path):
         """Extract metadata using ffprobe."""
@@ -28,50 +119,215 @@ class FFmpegRunner:
         if not video_stream:
             raise ValueError("No video stream found in file.")
 
+        width = int(video_stream['width'])
+        height = int(video_stream['height'])
+        fps = eval(video_stream['avg_frame_rate'])
+        duration = float(data['format']['duration'])
+
+        # FFmpeg auto-rotates on decode, so report the size frames will actually have
+        rotation = video_stream.get('tags', {}).get('rotate')
+        for side_data in video_stream.get('side_data_list', []):
+            rotation = side_data.get('rotation', rotation)
+        if rotation is not None and abs(int(float(rotation))) % 180 == 90:
+            width, height = height, width
+
+        if 'nb_frames' in video_stream:
+            frames = int(video_stream['nb_frames'])
+        else:
+            frames = int(round(duration * fps))
+
         return {
-            "width": int(video_stream['width']),
-            "height": int(video_stream['height']),
-            "fps": eval(video_stream['avg_frame_rate']),
-            "duration": float(data['format']['duration']),
+            "width": width,
+            "height": height,
+            "fps": fps,
+            "frames": frames,
+            "start_time": float(data['format'].get('start_time', 0)),
+            "duration": duration,
             "filesize": int(data['format']['size']),
             "codec": video_stream['codec_name']
         }
 
-    def extract_frames(self, video_path, output_dir):
-        """Extract all frames from video to a directory."""
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        cmd = [
-            self.ffmpeg,
-            "-i", video_path,
-            "-vsync", "0",
-            os.path.join(output_dir, "frame_%06d.png")
+    def read_frames(self, video_path, width, height, start_frame=0, frame_count=None, fps=None):
+        """Decode a video to raw BGR24 frames streamed over a pipe.
+
+        Takes the same arguments as open_reader().
+
+        Yields:
+            numpy arrays of shape (height, width, 3), one per decoded frame.
+        """
+        with self.open_reader(video_path, width, height, start_frame, frame_count, fps) as reader:
+            while True:
+                frame = np.empty((height, width, 3), dtype=np.uint8)
+                if not reader.readinto(frame):
+                    break
+                yield frame
+
+    def open_reader(self, video_path, width, height, start_frame=0, frame_count=None, fps=None):
+        """Start a decoder whose raw BGR24 frames can be read into existing arrays.
+
+        Args:
+            video_path: Path to the source video.
+            width: Frame width as reported by get_video_metadata.
+            height: Frame height as reported by get_video_metadata.
+            start_frame: Index of the first frame to return (needs fps).
+            frame_count: Number of frames to return, or None to read to the end.
+            fps: Frame rate used to turn start_frame into a seek position.
+
+        Returns:
+            A FrameReader; use it as a context manager or call close() when done.
+        """
+        cmd = [self.ffmpeg, "-v", "error", *self._thread_args()]
+        if start_frame:
+            # Accurate input seek: lands half a frame before the wanted frame so
+            # rounding never skips or repeats one (assumes constant frame rate)
+            cmd += ["-ss", f"{(start_frame - 0.5) / fps:.6f}"]
+        cmd += ["-i", video_path, "-vsync", "0"]
+        if frame_count is not None:
+            cmd += ["-frames:v", str(frame_count)]
+        cmd += [
+            "-f", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-"
         ]
-        subprocess.run(cmd, check=True)
+        return FrameReader(cmd, width * height * 3)
+
+    def open_writer(self, output_path, width, height, fps, codec="libx264"):
+        """Start an encoder that takes raw BGR24 frames on stdin.
+
+        The output is video only; mux audio afterwards (see concat_segments).
 
-    def assemble_video(self, frames_dir, audio_path, output_path, fps, codec="libx264"):
-        """Merge upscaled frames and original audio into a final video.
-        
         Args:
-            frames_dir: Directory containing the upscaled PNG frames.
-            audio_path: Path to the original video (to source audio from).
-            output_path: Final output MP4 path.
+            output_path: Output video path.
+            width: Width of the frames that will be written.
+            height: Height of the frames that will be written.
             fps: Frame rate for the output video.
             codec: Video codec to use (libx264 or libx265).
+
+        Returns:
+            A FrameWriter; use it as a context manager or call close() when done.
         """
         cmd = [
             self.ffmpeg,
             "-y", # Overwrite output
+            "-v", "error",
+            "-f", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}",
             "-framerate", str(fps),
-            "-i", os.path.join(frames_dir, "frame_%06d.png"),
-            "-i", audio_path,
+            "-i", "-",
             "-c:v", codec,
             "-pix_fmt", "yuv420p",
-            "-c:a", "copy", # Copy original audio
-            "-map", "0:v:0", # Use video from first input
-            "-map", "1:a:0?", # Use audio from second input (optional if no audio)
-            "-shortest", 
+            *self._thread_args(),
+            output_path
+        ]
+        return FrameWriter(cmd)
+
+    def get_keyframe_times(self, video_path):
+        """Presentation times (seconds) of the video's keyframes, via ffprobe."""
+        cmd = [
+            self.ffprobe,
+            "-v", "quiet",
+            "-select_streams", "v:0",
+            "-skip_frame", "nokey",
+            "-show_entries", "frame=best_effort_timestamp_time",
+            "-print_format", "json",
+            video_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"FFprobe failed: {result.stderr}")
+
+        frames = json.loads(result.stdout).get('frames', [])
+        return [float(f['best_effort_timestamp_time']) for f in frames if 'best_effort_timestamp_time' in f]
+
+    def detect_scene_cuts(self, video_path, threshold=0.4):
+        """Presentation times (seconds) of frames that start a new scene."""
+        cmd = [
+            self.ffmpeg,
+            "-hide_banner",
+            *self._thread_args(),
+            "-i", video_path,
+            "-an",
+            "-vf", f"select='gt(scene,{threshold})',showinfo",
+            "-f", "null",
+            "-"
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Scene detection failed: {result.stderr[-500:]}")
+        return [float(t) for t in re.findall(r"pts_time:\s*([0-9.]+)", result.stderr)]
+
+    def concat_segments(self, segment_paths, output_path, audio_path=None):
+        """Join encoded segments losslessly with the concat demuxer.
+
+        Args:
+            segment_paths: Video-only segments, in playback order, all encoded
+                with the same codec settings.
+            output_path: Final output MP4 path.
+            audio_path: Optional path to the original video to copy audio from.
+        """
+        list_path = output_path + ".concat.txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in segment_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        cmd = [
+            self.ffmpeg,
+            "-y", # Overwrite output
+            "-v", "error",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", list_path
+        ]
+        if audio_path:
+            cmd += [
+                "-i", audio_path,
+                "-map", "0:v:0",
+                "-map", "1:a:0?",
+                "-shortest"
+            ]
+        cmd += ["-c", "copy", output_path]
+        try:
+            subprocess.run(cmd, check=True)
+        finally:
+            os.remove(list_path)
+
+    def fragment_segment(self, segment_path, output_path, start_sec, duration_sec, audio_path=None):
+        """Remux a video-only segment into a fragmented MP4 placed at start_sec.
+
+        The video is stream-copied; audio for the same time range is taken
+        from audio_path and encoded to AAC so the fragment plays on its own.
+
+        Args:
+            segment_path: Encoded segment, e.g. a finished chunk.
+            output_path: Fragmented MP4 to write.
+            start_sec: Position of the segment in the full video.
+            duration_sec: Length of the segment (bounds the audio).
+            audio_path: Optional path to the original video to take audio from.
+        """
+        cmd = [
+            self.ffmpeg,
+            "-y", # Overwrite output
+            "-v", "error",
+            "-i", segment_path
+        ]
+        if audio_path:
+            cmd += [
+                "-ss", f"{start_sec:.6f}",
+                "-t", f"{duration_sec:.6f}",
+                "-i", audio_path,
+                "-map", "1:a:0?",
+                "-c:a", "aac"
+            ]
+        cmd += [
+            "-map", "0:v:0",
+            "-c:v", "copy",
+            # Keep the offset in the fragment times so segments line up in a player
+            "-output_ts_offset", f"{start_sec:.6f}",
+            "-avoid_negative_ts", "disabled",
+            "-f", "mp4",
+            "-movflags", "frag_keyframe+empty_moov+default_base_moof+skip_trailer",
             output_path
         ]
         subprocess.run(cmd, check=True)
@@ -0,0 +1,29 @@
+import argparse
+import os
+import signal
+import sys
+from app.config import load_config
+from app.core.cluster import ChunkWorker
+
+def main():
+    parser = argparse.ArgumentParser(description="Upscale chunks handed out by a coordinator server.")
+    parser.add_argument("--coordinator", default=os.getenv("COORDINATOR_URL", "http://127.0.0.1:8001"),
+                        help="Base URL of the API server running with COORDINATOR=True")
+    parser.add_argument("--name", help="Worker name shown by the coordinator (defaults to host-pid)")
+    args = parser.parse_args()
+
+    # Load configuration from environment / .env; jobs override the output settings
+    config = load_config()
+    os.makedirs(config["TEMP_DIR"], exist_ok=True)
+
+    worker = ChunkWorker(args.coordinator, config, name=args.name)
+    # Finish the current chunk and clean up on termination
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
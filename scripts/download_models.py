@@ -1,6 +1,22 @@
+"""Fetch or register AI models listed in the model manifest.
+
+Usage:
+    python scripts/download_models.py                  # every model in the manifest
+    python scripts/download_models.py --scale 2        # only the x2 models
+    python scripts/download_models.py --name RealESRGAN_x2plus
+    python scripts/download_models.py --register models/my_x2.pth [--url URL]
+"""
+import argparse
 import os
+import sys
 import urllib.request
 
+if __package__ in (None, ""):
+    # Run as a plain script: make the app package importable from the project root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.model_catalog import ModelCatalog
+
 def download_model(url, output_path):
     if os.path.exists(output_path):
         print(f"Model already exists at {output_path}")
@@ -8,18 +24,45 @@ def download_model(url, output_path):
 
     print(f"Downloading model from {url}...")
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
+
     try:
-        urllib.request.urlretrieve(url, output_path)
+        # Download next to the target and rename, so an interrupted download never looks complete
+        tmp_path = output_path + ".part"
+        urllib.request.urlretrieve(url, tmp_path)
+        os.replace(tmp_path, output_path)
         print(f"Download complete: {output_path}")
     except Exception as e:
         print(f"Error downloading model: {e}")
 
+def main():
+    parser = argparse.ArgumentParser(description="Download or register upscaling models.")
+    parser.add_argument("--manifest", default=os.path.join("models", "manifest.json"))
+    parser.add_argument("--scale", type=int, help="Only models with this native scale")
+    parser.add_argument("--name", help="Only the model with this name")
+    parser.add_argument("--register", metavar="PATH", help="Add a local model file to the manifest")
+    parser.add_argument("--url", help="Download URL recorded with --register")
+    args = parser.parse_args()
+
+    catalog = ModelCatalog(args.manifest)
+
+    if args.register:
+        # Scale and architecture are read from the weights with Spandrel
+        entry = catalog.register(args.register, name=args.name, url=args.url)
+        print(f"Registered {entry['name']}: x{entry['scale']} {entry['architecture']} ({entry['file']})")
+        return
+
+    selected = [
+        entry for entry in catalog.models
+        if (args.scale is None or entry["scale"] == args.scale) and (args.name is None or entry["name"] == args.name)
+    ]
+    if not selected:
+        print("No matching models in the manifest.")
+        sys.exit(1)
+    for entry in selected:
+        if "url" not in entry:
+            print(f"{entry['name']} has no download URL; place it at {catalog.path_for(entry)} by hand.")
+            continue
+        download_model(entry["url"], catalog.path_for(entry))
+
 if __name__ == "__main__":
-    # Real-ESRGAN x4plus model URL
-    model_url = "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.1.0/RealESRGAN_x4plus.pth"
-    save_path = os.path.join("models", "RealESRGAN_x4plus.pth")
-    
-    download_model(model_url, save_path)
-    
-    # You can add more models here if needed
+    main()
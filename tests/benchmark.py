@@ -0,0 +1,237 @@
+"""Throughput benchmarks for the upscaling pipeline.
+
+Generates synthetic clips and runs each through UpscalePipeline.process,
+the same entry point the server and CLI use, in one of several pipeline
+modes (serial, overlapped, checkpointed chunks, worker pool). Reports the
+pipeline's own per-stage timings, frames per second and peak RSS as JSON.
+Each case runs in a fresh process so peak RSS is per case; a case whose
+process dies or outlives --timeout is recorded as failed.
+
+Usage:
+    python -m tests.benchmark --output bench.json
+    python -m tests.benchmark --compare bench.json --threshold 0.15
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from queue import Empty
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+from tests.create_dummy_video import create_test_video, CONTENT_TYPES
+
+# Config overrides selecting the pipeline path each mode exercises
+MODES = {
+    "serial": {"OVERLAP": "False", "CHECKPOINT": "False", "WORKERS": "1"},
+    "overlap": {"OVERLAP": "True", "CHECKPOINT": "False", "WORKERS": "1"},
+    "chunked": {"OVERLAP": "True", "CHECKPOINT": "True", "WORKERS": "1", "CHUNK_SECONDS": "1"},
+    "pool": {"OVERLAP": "True", "CHECKPOINT": "True", "WORKERS": "2", "CHUNK_SECONDS": "1"}
+}
+
+# How often the harness checks that a case process is still alive
+POLL_SECONDS = 1.0
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def case_config(case, work_dir, model_path, batch_size):
+    """Pipeline config for a case: the environment's settings plus the case's mode."""
+    from app.config import load_config
+
+    config = load_config()
+    config.update(MODES[case["mode"]])
+    config.update({
+        "SCALE_FACTOR": str(case["scale"]),
+        "USE_AI": str(case["upscaler"] == "ai"),
+        "MODEL_PATH": model_path,
+        "BATCH_SIZE": str(batch_size),
+        "UPLOAD_DIR": os.path.join(work_dir, "uploads"),
+        "OUTPUT_DIR": os.path.join(work_dir, "outputs"),
+        "TEMP_DIR": os.path.join(work_dir, "temp"),
+        "STREAM_OUTPUT": "False",
+        "PROFILE": "off"
+    })
+    for key in ["UPLOAD_DIR", "OUTPUT_DIR", "TEMP_DIR"]:
+        os.makedirs(config[key], exist_ok=True)
+    return config
+
+def run_case(case, work_dir, model_path, batch_size):
+    """Run one benchmark case through UpscalePipeline.process and return its measurements."""
+    from app.core.pipeline import UpscalePipeline
+
+    width, height = case["resolution"]
+    input_path = os.path.join(work_dir, "input.mp4")
+    create_test_video(input_path, case["duration"], case["fps"], (width, height), case["content"])
+
+    pipeline = UpscalePipeline(case_config(case, work_dir, model_path, batch_size))
+    try:
+        if case["upscaler"] == "ai" and not pipeline.model_names:
+            raise RuntimeError(f"AI model not available at {model_path}")
+        start = time.perf_counter()
+        result = pipeline.process(input_path)
+        total = time.perf_counter() - start
+    finally:
+        pipeline.close()
+
+    stages = result["metrics"]["stages_sec"]
+    frame_count = result["frames"]
+    return {
+        "frames": frame_count,
+        "total_sec": round(total, 4),
+        "fps": round(frame_count / total, 2) if total > 0 else None,
+        "upscale_fps": round(frame_count / stages["upscale"], 2) if stages.get("upscale") else None,
+        # Decode and encode overlap inference in most modes, so stages can add up to more than total_sec
+        "stages_sec": stages,
+        "counters": result["metrics"]["counters"],
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+def _case_worker(case, model_path, batch_size, queue):
+    work_dir = tempfile.mkdtemp(prefix="upscale_bench_")
+    try:
+        queue.put({"result": run_case(case, work_dir, model_path, batch_size)})
+    except Exception as e:
+        queue.put({"error": str(e)})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def case_key(case):
+    width, height = case["resolution"]
+    return f"{case['upscaler']}/{width}x{height}/{case['content']}/{case['duration']}s/x{case['scale']}/{case['mode']}"
+
+def _wait_for_case(process, queue, timeout):
+    """Outcome a case process reported, or an error if it died or ran past timeout seconds."""
+    deadline = time.monotonic() + timeout if timeout > 0 else None
+    while True:
+        try:
+            return queue.get(timeout=POLL_SECONDS)
+        except Empty:
+            pass
+        if not process.is_alive():
+            # It may have reported just before exiting
+            try:
+                return queue.get(timeout=POLL_SECONDS)
+            except Empty:
+                process.join()
+                return {"error": f"case process exited with code {process.exitcode}", "exitcode": process.exitcode}
+        if deadline is not None and time.monotonic() > deadline:
+            process.terminate()
+            process.join()
+            return {"error": f"case timed out after {timeout}s", "exitcode": process.exitcode}
+
+def run_benchmarks(cases, model_path, batch_size, repeat=1, timeout=0):
+    """Run every case (best of ``repeat``) in its own process, at most ``timeout`` seconds each (0 for no limit)."""
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for case in cases:
+        key = case_key(case)
+        best = None
+        for _ in range(repeat):
+            queue = context.Queue()
+            process = context.Process(target=_case_worker, args=(case, model_path, batch_size, queue))
+            process.start()
+            outcome = _wait_for_case(process, queue, timeout)
+            process.join()
+            if "error" in outcome:
+                best = outcome
+                break
+            if best is None or outcome["result"]["total_sec"] < best["result"]["total_sec"]:
+                best = outcome
+        results[key] = dict(case, **best)
+        summary = best.get("error") or f"{best['result']['fps']} fps"
+        print(f"{key}: {summary}")
+    return results
+
+def compare(results, baseline, threshold):
+    """Return regressions where fps dropped or a stage slowed by more than threshold."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous or "result" not in previous or "result" not in current:
+            continue
+        old, new = previous["result"], current["result"]
+        if old["fps"] and new["fps"] < old["fps"] * (1 - threshold):
+            regressions.append(f"{key}: fps {old['fps']} -> {new['fps']}")
+        for stage in sorted(set(old["stages_sec"]) | set(new["stages_sec"])):
+            before, after = old["stages_sec"].get(stage, 0), new["stages_sec"].get(stage, 0)
+            # Ignore noise on stages that take only a few milliseconds
+            if before > 0.05 and after > before * (1 + threshold):
+                regressions.append(f"{key}: {stage} {before:.3f}s -> {after:.3f}s")
+    return regressions
+
+def _parse_resolution(value):
+    width, height = value.lower().split("x")
+    return (int(width), int(height))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark upscaler throughput per pipeline stage.")
+    parser.add_argument("--upscalers", default="opencv,ai", help="Comma separated: opencv, ai")
+    parser.add_argument("--resolutions", default="320x240,1280x720", help="Comma separated WIDTHxHEIGHT")
+    parser.add_argument("--durations", default="2", help="Comma separated clip lengths in seconds")
+    parser.add_argument("--contents", default="bouncing,static,noise", help=f"Comma separated: {', '.join(CONTENT_TYPES)}")
+    parser.add_argument("--modes", default="overlap,chunked", help=f"Comma separated pipeline modes: {', '.join(MODES)}")
+    parser.add_argument("--fps", type=int, default=24)
+    parser.add_argument("--scale", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest is kept")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds before a case run is killed and marked failed (0 for no limit)")
+    parser.add_argument("--model", default=os.path.join("models", "RealESRGAN_x4plus.pth"))
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before flagging (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    cases = [
+        {
+            "upscaler": upscaler,
+            "resolution": _parse_resolution(resolution),
+            "duration": float(duration),
+            "content": content,
+            "fps": args.fps,
+            "scale": args.scale,
+            "mode": mode
+        }
+        for upscaler in args.upscalers.split(",")
+        for resolution in args.resolutions.split(",")
+        for duration in args.durations.split(",")
+        for content in args.contents.split(",")
+        for mode in args.modes.split(",")
+    ]
+    unknown = [case["mode"] for case in cases if case["mode"] not in MODES]
+    if unknown:
+        parser.error(f"Unknown mode: {unknown[0]}. Choose from {', '.join(MODES)}")
+
+    results = run_benchmarks(cases, args.model, args.batch_size, args.repeat, args.timeout)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -2,39 +2,80 @@ import cv2
 import numpy as np
 import os
 
-def create_test_video(output_path, duration_sec=2, fps=24, resolution=(320, 240)):
-    """Creates a simple test video with a bouncing square."""
+def _bouncing_frame(i, width, height, state):
+    """Dark background with a bouncing square and the frame index."""
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:, :] = [50, 50, 50] # Dark grey
+    
+    # Draw a bouncing square
+    x, y = state["x"], state["y"]
+    square_size = state["size"]
+    cv2.rectangle(frame, (x, y), (x + square_size, y + square_size), (0, 255, 0), -1)
+    
+    # Add frame index text
+    cv2.putText(frame, f"Frame: {i}", (10, height - 20), 
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    
+    # Move square
+    state["x"] += state["dx"]
+    state["y"] += state["dy"]
+    
+    # Bounce logic
+    if state["x"] <= 0 or state["x"] + square_size >= width: state["dx"] = -state["dx"]
+    if state["y"] <= 0 or state["y"] + square_size >= height: state["dy"] = -state["dy"]
+    return frame
+
+def _static_frame(i, width, height, state):
+    """The same slide for every frame (screen recordings, slideshows)."""
+    if "frame" not in state:
+        frame = np.full((height, width, 3), 240, dtype=np.uint8)
+        cv2.putText(frame, "Static slide", (10, height // 2),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (30, 30, 30), 2)
+        state["frame"] = frame
+    return state["frame"]
+
+def _noise_frame(i, width, height, state):
+    """Random noise: worst case for the encoder and for duplicate detection."""
+    return state["rng"].integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+def _gradient_frame(i, width, height, state):
+    """A smooth colour gradient panning sideways (natural camera motion)."""
+    xs = (np.arange(width) + i * 4) % width
+    row = (xs * 255 // max(width - 1, 1)).astype(np.uint8)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:, :, 0] = row
+    frame[:, :, 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    frame[:, :, 2] = 255 - row
+    return frame
+
+CONTENT_TYPES = {
+    "bouncing": _bouncing_frame,
+    "static": _static_frame,
+    "noise": _noise_frame,
+    "gradient": _gradient_frame
+}
+
+def create_test_video(output_path, duration_sec=2, fps=24, resolution=(320, 240), content="bouncing"):
+    """Creates a synthetic test video (a bouncing square by default).
+
+    Args:
+        output_path: Where to write the MP4.
+        duration_sec: Length of the clip in seconds.
+        fps: Frame rate.
+        resolution: (width, height) of the frames.
+        content: One of CONTENT_TYPES (bouncing, static, noise, gradient).
+    """
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     out = cv2.VideoWriter(output_path, fourcc, fps, resolution)
     
     width, height = resolution
-    square_size = 50
-    x, y = 0, 0
-    dx, dy = 5, 5
+    make_frame = CONTENT_TYPES[content]
+    state = {"x": 0, "y": 0, "dx": 5, "dy": 5, "size": 50, "rng": np.random.default_rng(0)}
     
-    num_frames = duration_sec * fps
+    num_frames = int(duration_sec * fps)
     
     for i in range(num_frames):
-        # Create a solid background
-        frame = np.zeros((height, width, 3), dtype=np.uint8)
-        frame[:, :] = [50, 50, 50] # Dark grey
-        
-        # Draw a bouncing square
-        cv2.rectangle(frame, (x, y), (x + square_size, y + square_size), (0, 255, 0), -1)
-        
-        # Add frame index text
-        cv2.putText(frame, f"Frame: {i}", (10, height - 20), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        
-        out.write(frame)
-        
-        # Move square
-        x += dx
-        y += dy
-        
-        # Bounce logic
-        if x <= 0 or x + square_size >= width: dx = -dx
-        if y <= 0 or y + square_size >= height: dy = -dy
+        out.write(make_frame(i, width, height, state))
         
     out.release()
     print(f"Test video created: {output_path}")
@@ -0,0 +1,161 @@
+"""Quality and speed of AIUpscaler execution modes against fp32.
+
+Decodes a reference clip once, upscales it in fp32 eager mode and then in
+each requested mode, and reports PSNR / SSIM against the fp32 frames together
+with frames per second. The first batch of every mode is a warm-up (tracing
+and compiling happen there) and is timed separately.
+
+Modes are written as precision plus optional flags joined by "+", e.g.
+``bf16``, ``fp32+channels_last``, ``bf16+trace`` or ``int8+compile``.
+
+Usage:
+    python -m tests.precision_report --input clip.mp4 --frames 48
+    python -m tests.precision_report --modes bf16,int8,trace --output modes.json
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from tests.create_dummy_video import create_test_video
+
+DEFAULT_MODES = "bf16,int8,fp32+channels_last,fp32+trace,fp32+compile"
+
+def parse_mode(spec):
+    """Turn "bf16+channels_last+trace" into AIUpscaler keyword arguments."""
+    options = {"precision": "fp32", "channels_last": False, "compile_mode": "off"}
+    for part in spec.split("+"):
+        if part in ("fp32", "bf16", "int8"):
+            options["precision"] = part
+        elif part == "channels_last":
+            options["channels_last"] = True
+        elif part in ("trace", "compile"):
+            options["compile_mode"] = part
+        else:
+            raise ValueError(f"Unknown mode part: {part}")
+    return options
+
+def psnr(reference, image):
+    mse = np.mean((reference.astype(np.float64) - image.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+def ssim(reference, image):
+    """Mean SSIM over the luma channel (Gaussian window, as in Wang et al. 2004)."""
+    a = cv2.cvtColor(reference, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    b = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(x):
+        return cv2.GaussianBlur(x, (11, 11), 1.5)
+
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a ** 2
+    var_b = blur(b * b) - mu_b ** 2
+    cov = blur(a * b) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(ssim_map.mean())
+
+def run_mode(frames, options, scale, model_path, batch_size, device):
+    """Upscale frames in one mode; returns (outputs, fps, warm-up seconds)."""
+    from app.core.ai_upscaler import AIUpscaler
+    from app.core.model_registry import ModelRegistry
+
+    # Private registry so each mode loads (and frees) its own weights variant
+    upscaler = AIUpscaler(scale, model_path=model_path, registry=ModelRegistry(max_models=1), device=device, **options)
+    if upscaler.model is None:
+        raise RuntimeError(f"AI model not available at {model_path}")
+    if upscaler.precision != options["precision"]:
+        # Don't report fp32 numbers under another precision's name
+        upscaler.close()
+        raise RuntimeError(f"{options['precision']} not supported by this model (runs as {upscaler.precision})")
+    batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+
+    start = time.perf_counter()
+    outputs = [out.copy() for out in upscaler.upscale_batch(batches[0])]
+    warmup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for batch in batches[1:]:
+        outputs.extend(out.copy() for out in upscaler.upscale_batch(batch))
+    elapsed = time.perf_counter() - start
+    timed_frames = len(frames) - len(batches[0])
+
+    fell_back = upscaler.fallback_frames
+    upscaler.close()
+    if fell_back:
+        raise RuntimeError(f"{fell_back} frames fell back to OpenCV")
+    fps = timed_frames / elapsed if timed_frames and elapsed > 0 else None
+    return outputs, fps, warmup
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare AIUpscaler execution modes against fp32.")
+    parser.add_argument("--input", help="Reference clip (a synthetic one is generated if omitted)")
+    parser.add_argument("--frames", type=int, default=24, help="Frames decoded from the clip")
+    parser.add_argument("--modes", default=DEFAULT_MODES, help="Comma separated, see module docstring")
+    parser.add_argument("--scale", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--model", default=os.path.join("models", "RealESRGAN_x4plus.pth"))
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+
+    from app.utils.ffmpeg import FFmpegRunner
+
+    work_dir = tempfile.mkdtemp(prefix="upscale_modes_")
+    try:
+        input_path = args.input
+        if input_path is None:
+            input_path = os.path.join(work_dir, "reference.mp4")
+            create_test_video(input_path, duration_sec=2, fps=24, content="gradient")
+        ffmpeg = FFmpegRunner()
+        meta = ffmpeg.get_video_metadata(input_path)
+        frames = [frame.copy() for frame in ffmpeg.read_frames(
+            input_path, meta["width"], meta["height"], frame_count=args.frames, fps=meta["fps"]
+        )]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Reference: {len(frames)} frames at {meta['width']}x{meta['height']}, x{args.scale}")
+    reference, fps, warmup = run_mode(frames, parse_mode("fp32"), args.scale, args.model, args.batch_size, args.device)
+    results = {"fp32": {"fps": fps, "warmup_sec": warmup, "psnr_db": float("inf"), "ssim": 1.0}}
+
+    for spec in args.modes.split(","):
+        try:
+            outputs, fps, warmup = run_mode(frames, parse_mode(spec), args.scale, args.model, args.batch_size, args.device)
+        except Exception as e:
+            results[spec] = {"error": str(e)}
+            continue
+        results[spec] = {
+            "fps": fps,
+            "warmup_sec": warmup,
+            "psnr_db": min(psnr(ref, out) for ref, out in zip(reference, outputs)),
+            "ssim": min(ssim(ref, out) for ref, out in zip(reference, outputs))
+        }
+
+    base_fps = results["fp32"]["fps"]
+    print(f"\n{'mode':<28}{'fps':>8}{'speedup':>9}{'warmup s':>10}{'min PSNR':>10}{'min SSIM':>10}")
+    for spec, result in results.items():
+        if "error" in result:
+            print(f"{spec:<28}  error: {result['error']}")
+            continue
+        speedup = result["fps"] / base_fps if result["fps"] and base_fps else float("nan")
+        print(f"{spec:<28}{result['fps'] or 0:>8.2f}{speedup:>8.2f}x{result['warmup_sec']:>10.2f}"
+              f"{result['psnr_db']:>10.2f}{result['ssim']:>10.4f}")
+
+    if args.output:
+        # JSON has no infinity; identical output is reported as null PSNR
+        serialisable = {
+            spec: {key: (None if value == float("inf") else value) for key, value in result.items()}
+            for spec, result in results.items()
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(serialisable, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
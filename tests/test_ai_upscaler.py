@@ -0,0 +1,153 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+import torch
+from spandrel.architectures.ESRGAN import ESRGAN
+from app.core.ai_upscaler import AIUpscaler
+from app.core.model_registry import ModelRegistry
+
+def create_tiny_model(output_path, scale=4):
+    """Saves a small randomly initialised Real-ESRGAN style model for tests."""
+    torch.manual_seed(0)
+    model = ESRGAN(in_nc=3, out_nc=3, num_filters=8, num_blocks=1, scale=scale)
+    torch.save(model.state_dict(), output_path)
+
+class TestAIUpscaler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model_dir = tempfile.mkdtemp()
+        cls.model_path = os.path.join(cls.model_dir, "tiny_x4.pth")
+        create_tiny_model(cls.model_path)
+
+        rng = np.random.default_rng(0)
+        cls.frames = [rng.integers(0, 256, (24, 32, 3), dtype=np.uint8) for _ in range(3)]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+
+    def test_batch_matches_single_frames(self):
+        """Batched inference should produce the same frames as one-at-a-time."""
+        upscaler = AIUpscaler(scale_factor=4, model_path=self.model_path)
+        singles = [upscaler.upscale_array(f) for f in self.frames]
+        batch = upscaler.upscale_batch(self.frames)
+
+        self.assertEqual(len(batch), len(self.frames))
+        self.assertFalse(np.array_equal(batch[0], upscaler._opencv_fallback(self.frames[0])))
+        for single, batched in zip(singles, batch):
+            self.assertEqual(batched.shape, (96, 128, 3))
+            self.assertLessEqual(np.abs(single.astype(int) - batched.astype(int)).max(), 1)
+
+    def test_results_survive_later_calls(self):
+        """Returned frames belong to the caller; the next batch must not overwrite them."""
+        upscaler = AIUpscaler(scale_factor=4, model_path=self.model_path)
+        first = upscaler.upscale_batch(self.frames[:1])[0]
+        kept = first.copy()
+        upscaler.upscale_batch(self.frames[1:2])
+        np.testing.assert_array_equal(first, kept)
+
+    def test_batch_writes_into_out(self):
+        """With out= the frames land in the caller's arrays, e.g. ring slots."""
+        upscaler = AIUpscaler(scale_factor=4, model_path=self.model_path)
+        expected = upscaler.upscale_batch(self.frames)
+        ring = np.zeros((len(self.frames), 96, 128, 3), dtype=np.uint8)
+        result = upscaler.upscale_batch(self.frames, out=list(ring))
+
+        for slot, frame in zip(result, expected):
+            self.assertTrue(np.shares_memory(slot, ring))
+            np.testing.assert_array_equal(slot, frame)
+
+    def test_tiled_matches_full_frame(self):
+        """Overlapping tiles leave no seams: the error along every tile edge stays small."""
+        frame = np.random.default_rng(1).integers(0, 256, (96, 128, 3), dtype=np.uint8)
+        full = AIUpscaler(scale_factor=4, model_path=self.model_path).upscale_array(frame).astype(int)
+        ys = AIUpscaler._tile_starts(96, 32, 16)
+        xs = AIUpscaler._tile_starts(128, 32, 16)
+        self.assertGreater(min(len(ys), len(xs)), 3)
+
+        # Output rows / columns within two pixels of a tile edge
+        rows = np.zeros(96 * 4, dtype=bool)
+        cols = np.zeros(128 * 4, dtype=bool)
+        for starts, edges in ((ys, rows), (xs, cols)):
+            for start in starts:
+                for edge in (start * 4, (start + 32) * 4):
+                    edges[max(0, edge - 2):edge + 2] = True
+        seams = rows[:, None] | cols[None, :]
+
+        def seam_error(overlap):
+            upscaler = AIUpscaler(scale_factor=4, model_path=self.model_path, tile_size=32, tile_overlap=overlap)
+            tiled = upscaler.upscale_array(frame).astype(int)
+            self.assertEqual(tiled.shape, full.shape)
+            return np.abs(full - tiled)[seams].max(), np.abs(full - tiled).max()
+
+        seam, anywhere = seam_error(16)
+        self.assertLessEqual(seam, 4)
+        self.assertLessEqual(anywhere, 4)
+        # Without overlap the same model and frame do show seams, so the bound above means something
+        self.assertGreater(seam_error(0)[0], 10)
+
+    def test_execution_modes_stay_close_to_fp32(self):
+        """bf16, int8, channels_last and traced modes run the model and stay near fp32."""
+        reference = AIUpscaler(scale_factor=4, model_path=self.model_path, device="cpu").upscale_array(self.frames[0])
+        for options in (
+            {"precision": "bf16"},
+            {"precision": "int8"},
+            {"channels_last": True},
+            {"compile_mode": "trace"},
+            {"precision": "bf16", "channels_last": True, "compile_mode": "trace"}
+        ):
+            upscaler = AIUpscaler(scale_factor=4, model_path=self.model_path, device="cpu", registry=ModelRegistry(), **options)
+            output = upscaler.upscale_array(self.frames[0])
+            output = upscaler.upscale_array(self.frames[0])  # second call uses the cached trace
+            self.assertEqual(upscaler.fallback_frames, 0, options)
+            self.assertLessEqual(np.abs(reference.astype(int) - output.astype(int)).max(), 2, options)
+
+class TestModelRegistry(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model_dir = tempfile.mkdtemp()
+        cls.model_paths = []
+        for scale in (2, 4):
+            path = os.path.join(cls.model_dir, f"tiny_x{scale}.pth")
+            create_tiny_model(path, scale=scale)
+            cls.model_paths.append(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+
+    def test_upscalers_share_one_model(self):
+        """Upscalers using the same registry should get the same model instance."""
+        registry = ModelRegistry()
+        first = AIUpscaler(scale_factor=4, model_path=self.model_paths[1], registry=registry)
+        second = AIUpscaler(scale_factor=4, model_path=self.model_paths[1], registry=registry)
+        self.assertIs(first.model, second.model)
+        self.assertEqual(len(registry.loaded()), 1)
+
+    def test_int8_without_linear_layers_uses_fp32(self):
+        """Conv-only models have nothing to quantise, so int8 shares and reports the fp32 weights."""
+        registry = ModelRegistry()
+        fp32 = AIUpscaler(scale_factor=4, model_path=self.model_paths[1], registry=registry, device="cpu")
+        int8 = AIUpscaler(scale_factor=4, model_path=self.model_paths[1], registry=registry, device="cpu", precision="int8")
+        self.assertEqual(int8.precision, "fp32")
+        self.assertIs(int8.model, fp32.model)
+        self.assertEqual(len(registry.loaded()), 1)
+        int8.close()
+        fp32.close()
+        self.assertEqual(registry._entries[registry.loaded()[0]].refs, 0)
+
+    def test_lru_eviction_skips_models_in_use(self):
+        """Only unreferenced models should be evicted when over capacity."""
+        registry = ModelRegistry(max_models=1)
+        in_use = AIUpscaler(scale_factor=2, model_path=self.model_paths[0], registry=registry)
+        other = AIUpscaler(scale_factor=4, model_path=self.model_paths[1], registry=registry)
+        self.assertEqual(len(registry.loaded()), 2)
+
+        other.close()
+        self.assertEqual([key[0] for key in registry.loaded()], [os.path.abspath(self.model_paths[0])])
+        in_use.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from app.core.batch import collect_inputs, run_batch, summarize, write_report
+from tests.create_dummy_video import create_test_video
+
+class TestBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp()
+        cls.input_dir = os.path.join(cls.dir, "inputs")
+        os.makedirs(cls.input_dir)
+        for name in ("a.mp4", "b.mp4"):
+            create_test_video(os.path.join(cls.input_dir, name))
+        with open(os.path.join(cls.input_dir, "notes.txt"), "w") as f:
+            f.write("not a video")
+        cls.config = {
+            "SCALE_FACTOR": "2",
+            "OUTPUT_DIR": os.path.join(cls.dir, "outputs"),
+            "TEMP_DIR": os.path.join(cls.dir, "temp"),
+            "USE_AI": "False",
+            "CHECKPOINT": "False"
+        }
+        for key in ("OUTPUT_DIR", "TEMP_DIR"):
+            os.makedirs(cls.config[key])
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir, ignore_errors=True)
+
+    def test_collect_inputs(self):
+        expected = [os.path.join(self.input_dir, name) for name in ("a.mp4", "b.mp4")]
+        self.assertEqual(collect_inputs(self.input_dir), expected)
+        self.assertEqual(collect_inputs(os.path.join(self.input_dir, "*.mp4")), expected)
+
+        manifest = os.path.join(self.dir, "manifest.txt")
+        with open(manifest, "w") as f:
+            f.write("# nightly\ninputs/b.mp4\n\n")
+        self.assertEqual(collect_inputs(manifest=manifest), [expected[1]])
+
+    def test_batch_skips_up_to_date_outputs(self):
+        """Each input is upscaled once; a second run only redoes inputs changed since."""
+        inputs = collect_inputs(self.input_dir)
+        rows = run_batch(self.config, inputs, jobs=2)
+        self.assertEqual([row["status"] for row in rows], ["completed", "completed"])
+        self.assertEqual([row["frames"] for row in rows], [48, 48])
+        self.assertTrue(all(os.path.exists(row["output"]) for row in rows))
+
+        later = time.time() + 10
+        os.utime(inputs[1], (later, later))
+        rows = run_batch(self.config, inputs, jobs=2)
+        self.assertEqual([row["status"] for row in rows], ["skipped", "completed"])
+
+        missing = os.path.join(self.dir, "missing", "a.mp4")
+        rows = run_batch(self.config, [os.path.join(self.dir, "c.mp4"), missing], force=True)
+        self.assertEqual([row["status"] for row in rows], ["failed", "failed"])
+
+    def test_reports(self):
+        rows = [
+            {"input": "a.mp4", "output": "out/a.mp4", "status": "completed", "seconds": 2.0,
+             "frames": 48, "fps": 24.0, "error": None},
+            {"input": "b.mp4", "output": "out/b.mp4", "status": "failed", "seconds": 0.5,
+             "frames": 0, "fps": None, "error": "broken"}
+        ]
+        summary = summarize(rows, 2.5)
+        self.assertEqual((summary["completed"], summary["failed"], summary["frames"]), (1, 1, 48))
+
+        json_path = os.path.join(self.dir, "report.json")
+        write_report(rows, summary, json_path)
+        with open(json_path) as f:
+            self.assertEqual(json.load(f)["summary"]["fps"], 19.2)
+
+        csv_path = os.path.join(self.dir, "report.csv")
+        write_report(rows, summary, csv_path)
+        with open(csv_path, newline="") as f:
+            self.assertEqual([row["status"] for row in csv.DictReader(f)], ["completed", "failed"])
+
+if __name__ == '__main__':
+    unittest.main()
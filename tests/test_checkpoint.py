@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from app.core.checkpoint import Checkpoint, prune_checkpoints
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.temp_dir = os.path.join(self.dir, "temp")
+        self.inputs = []
+        for i in range(2):
+            path = os.path.join(self.dir, f"input_{i}.bin")
+            # Same size, head and tail; only the middle differs
+            content = bytearray(10 * 1024 * 1024)
+            content[5 * 1024 * 1024] = i
+            with open(path, "wb") as f:
+                f.write(content)
+            self.inputs.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_key_covers_whole_input(self):
+        first = Checkpoint.for_job(self.temp_dir, self.inputs[0], {})
+        second = Checkpoint.for_job(self.temp_dir, self.inputs[1], {})
+        self.assertNotEqual(first.work_dir, second.work_dir)
+        self.assertTrue(first.resume and second.resume)
+        first.release()
+        second.release()
+
+    def test_running_jobs_never_share_a_directory(self):
+        """A second identical job works privately; the first one's chunks survive it."""
+        first = Checkpoint.for_job(self.temp_dir, self.inputs[0], {})
+        first.set_chunks([(0, None)])
+        second = Checkpoint.for_job(self.temp_dir, self.inputs[0], {})
+        self.assertNotEqual(second.work_dir, first.work_dir)
+        self.assertFalse(second.resume)
+
+        second.discard()
+        self.assertTrue(os.path.exists(first.manifest_path))
+        first.release()
+
+        # Released, so the next job resumes from it
+        again = Checkpoint.for_job(self.temp_dir, self.inputs[0], {})
+        self.assertEqual((again.work_dir, again.chunks), (first.work_dir, [(0, None)]))
+        again.discard()
+
+    def test_prune_skips_locked_directories(self):
+        held = Checkpoint.for_job(self.temp_dir, self.inputs[0], {})
+        stale = Checkpoint.for_job(self.temp_dir, self.inputs[1], {})
+        stale.set_chunks([(0, None)])
+        stale.release()
+        old = time.time() - 3600
+        for checkpoint in (held, stale):
+            os.utime(checkpoint.work_dir, (old, old))
+        os.utime(stale.manifest_path, (old, old))
+
+        prune_checkpoints(self.temp_dir, 60)
+        self.assertTrue(os.path.isdir(held.work_dir))
+        self.assertFalse(os.path.exists(stale.work_dir))
+        held.discard()
+
+if __name__ == '__main__':
+    unittest.main()
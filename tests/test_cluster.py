@@ -0,0 +1,200 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import httpx
+from app.core.cluster import ChunkCoordinator, ChunkWorker
+from tests.create_dummy_video import create_test_video
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestChunkCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.coordinator = ChunkCoordinator(worker_timeout=10, max_attempts=2, clock=self.clock)
+        self.done = []
+        self.errors = []
+        self.left = None
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def start_job(self, chunks):
+        def run():
+            try:
+                self.left = self.coordinator.run_chunks(
+                    "input.mp4", {"fps": 24}, {"SCALE_FACTOR": "2"}, chunks,
+                    lambda i: os.path.join(self.dir, f"chunk_{i}.mp4"),
+                    lambda index, frames, reused, metrics: self.done.append(index),
+                    poll_seconds=0.01
+                )
+            except RuntimeError as e:
+                self.errors.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        while not self.coordinator._pending:
+            time.sleep(0.01)
+        return thread
+
+    def upload(self, task, worker_id):
+        path = self.coordinator.upload_path(task["task_id"], worker_id)
+        with open(path, "wb") as f:
+            f.write(b"segment")
+        return self.coordinator.complete(task["task_id"], worker_id, path, 12, 0, {})
+
+    def test_lost_worker_chunk_is_reassigned(self):
+        """A worker that stops heartbeating loses its chunk to a live one; its late upload is refused."""
+        thread = self.start_job([(0, 0, 12), (1, 12, 12)])
+        lost = self.coordinator.register("lost")
+        alive = self.coordinator.register("alive")
+        lost_task = self.coordinator.lease(lost)
+        first_task = self.coordinator.lease(alive)
+        self.assertEqual((lost_task["index"], first_task["index"]), (0, 1))
+        self.assertTrue(self.upload(first_task, alive))
+
+        self.clock.now += 11
+        self.assertTrue(self.coordinator.heartbeat(alive))
+        retried = self.coordinator.lease(alive)
+        self.assertEqual(retried["index"], 0)
+        self.assertFalse(self.coordinator.heartbeat(lost))
+        self.assertTrue(self.upload(retried, alive))
+        thread.join(timeout=5)
+
+        self.assertEqual(sorted(self.done), [0, 1])
+        self.assertEqual(self.errors, [])
+        with self.assertRaises(KeyError):
+            self.coordinator.upload_path(lost_task["task_id"], lost)
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "chunk_0.mp4")))
+        self.assertIsNone(self.coordinator.lease(alive))
+
+    def test_chunks_come_back_without_workers(self):
+        """With no worker left for worker_wait seconds, unfinished chunks are returned to the job."""
+        thread = self.start_job([(0, 0, 12), (1, 12, 12)])
+        worker = self.coordinator.register("only")
+        self.assertTrue(self.upload(self.coordinator.lease(worker), worker))
+        self.coordinator.lease(worker)
+
+        self.clock.now += 11
+        time.sleep(0.1)
+        self.assertTrue(thread.is_alive())
+        self.clock.now += 60
+        thread.join(timeout=5)
+
+        self.assertEqual((self.done, self.left), ([0], [(1, 12, 12)]))
+        self.assertEqual(self.coordinator._tasks, {})
+
+    def test_chunk_fails_job_after_max_attempts(self):
+        thread = self.start_job([(0, 0, None)])
+        worker = self.coordinator.register("flaky")
+        for _ in range(2):
+            task = self.coordinator.lease(worker)
+            self.coordinator.fail(task["task_id"], worker, "out of memory")
+        thread.join(timeout=5)
+
+        self.assertEqual(len(self.errors), 1)
+        self.assertIn("out of memory", str(self.errors[0]))
+        self.assertIsNone(self.coordinator.lease(worker))
+
+class TestChunkWorker(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.worker = ChunkWorker("http://127.0.0.1:1", {"TEMP_DIR": self.dir})
+        self.requests = []
+        self.worker._request = lambda method, path, data=None, headers=None: self.requests.append(path) or (200, b"")
+        self.worker._fetch_input = lambda job_id: "input.mp4"
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_chunk_with_other_models_fails(self):
+        """A worker whose models differ from the job's reports the chunk failed instead of uploading it."""
+        settings = {"USE_AI": "False", "SCALE_FACTOR": "2", "MODELS": ""}
+        self.assertEqual(self.worker._pipeline_for(settings).model_names, [])
+
+        task = {"task_id": "t1", "job_id": "j1", "index": 0, "start_frame": 0, "frame_count": 12, "meta": {},
+                "settings": dict(settings, MODELS="RealESRGAN_x2plus")}
+        self.worker._process(task)
+        self.assertEqual(len(self.requests), 1)
+        self.assertTrue(self.requests[0].startswith("/cluster/chunks/t1/fail"))
+
+class TestClusterLocalhost(unittest.TestCase):
+    """Coordinator server and two workers as separate processes on localhost."""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = dict(
+            os.environ,
+            USE_AI="False",
+            UPLOAD_DIR=os.path.join(self.dir, "uploads"),
+            OUTPUT_DIR=os.path.join(self.dir, "outputs"),
+            TEMP_DIR=os.path.join(self.dir, "temp"),
+            QUEUE_DB=os.path.join(self.dir, "jobs.db"),
+            RESULT_CACHE="False",
+            CHECKPOINT="False",
+            CHUNK_SECONDS="0.5",
+            COORDINATOR="True",
+            WORKER_TIMEOUT="5"
+        )
+        self.processes = [subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.server:app", "--port", str(self.port), "--log-level", "warning"],
+            env=env
+        )]
+        for name in ("w1", "w2"):
+            self.processes.append(subprocess.Popen(
+                [sys.executable, "-m", "app.worker", "--coordinator", self.url, "--name", name],
+                env=env, stdout=subprocess.DEVNULL
+            ))
+        self.test_input = os.path.join(self.dir, "input.mp4")
+        create_test_video(self.test_input)
+
+    def tearDown(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=10)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def wait_for(self, check, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                value = check()
+                if value:
+                    return value
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.fail("Timed out")
+
+    def test_workers_process_job(self):
+        self.wait_for(lambda: len(httpx.get(f"{self.url}/cluster/workers").json()["workers"]) == 2)
+        with open(self.test_input, "rb") as f:
+            response = httpx.post(f"{self.url}/upscale?scale=2&use_ai=false", files={"file": ("input.mp4", f)})
+        task_id = response.json()["task_id"]
+
+        job = self.wait_for(lambda: (lambda job: job if job["status"] in ("completed", "failed") else None)(
+            httpx.get(f"{self.url}/status/{task_id}").json()
+        ))
+        self.assertEqual(job["status"], "completed", job.get("error"))
+        self.assertEqual(job["result"]["frames"], 48)
+        self.assertEqual(job["result"]["new_resolution"], "640x480")
+        workers = httpx.get(f"{self.url}/cluster/workers").json()["workers"]
+        self.assertEqual(sum(worker["chunks_done"] for worker in workers), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from app.core.base import OpenCVUpscaler
+from app.core.dedupe import FrameDeduplicator
+
+class CountingUpscaler(OpenCVUpscaler):
+    """OpenCV upscaler that counts how many frames it actually processed."""
+    def __init__(self, scale_factor):
+        super().__init__(scale_factor)
+        self.calls = 0
+
+    def upscale_array(self, img):
+        self.calls += 1
+        return super().upscale_array(img)
+
+class TestFrameDeduplicator(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.a = rng.integers(0, 256, (24, 32, 3), dtype=np.uint8)
+        self.b = rng.integers(0, 256, (24, 32, 3), dtype=np.uint8)
+
+    def test_exact_reuses_identical_frames(self):
+        """Repeated frames, within and across batches, are upscaled once."""
+        upscaler = CountingUpscaler(2)
+        dedupe = FrameDeduplicator(mode="exact")
+        first = dedupe.upscale_batch(upscaler, [self.a, self.a.copy(), self.b])
+        second = dedupe.upscale_batch(upscaler, [self.b, self.a])
+
+        self.assertEqual(upscaler.calls, 2)
+        self.assertEqual(dedupe.reused, 3)
+        np.testing.assert_array_equal(first[1], upscaler.upscale_array(self.a))
+        np.testing.assert_array_equal(second[0], first[2])
+
+    def test_perceptual_matches_within_threshold(self):
+        """Small noise is treated as a repeat in perceptual mode but not in exact mode."""
+        noisy = np.clip(self.a.astype(int) + 1, 0, 255).astype(np.uint8)
+        perceptual = FrameDeduplicator(mode="perceptual", threshold=2.0)
+        exact = FrameDeduplicator(mode="exact")
+
+        perceptual.upscale_batch(CountingUpscaler(2), [self.a, noisy])
+        exact.upscale_batch(CountingUpscaler(2), [self.a, noisy])
+        self.assertEqual(perceptual.reused, 1)
+        self.assertEqual(exact.reused, 0)
+
+    def test_index_is_bounded(self):
+        """Only the most recent max_entries results are kept."""
+        upscaler = CountingUpscaler(2)
+        dedupe = FrameDeduplicator(mode="exact", max_entries=1)
+        dedupe.upscale_batch(upscaler, [self.a])
+        dedupe.upscale_batch(upscaler, [self.b])
+        dedupe.upscale_batch(upscaler, [self.a])
+        self.assertEqual(upscaler.calls, 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+import unittest
+from app.core.base import OpenCVUpscaler
+from app.core.estimator import ThroughputModel
+
+class TestThroughputModel(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.model = ThroughputModel(os.path.join(self.tmp_dir, "jobs.db"), alpha=0.5)
+        self.meta = {"width": 1920, "height": 1080, "frames": 100}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_unknown_tier_has_no_estimate(self):
+        self.assertIsNone(self.model.estimate("opencv-x2", self.meta))
+
+    def test_estimate_scales_with_pixels(self):
+        self.model.record("ai-x4", 1920 * 1080 * 10, 20.0)
+        self.assertAlmostEqual(self.model.estimate("ai-x4", self.meta), 200.0)
+        self.assertAlmostEqual(self.model.estimate("ai-x4", dict(self.meta, width=3840, height=2160)), 800.0)
+
+    def test_job_measurements_replace_calibration(self):
+        rate = self.model.calibrate("opencv-x2", OpenCVUpscaler(2), frames=2)
+        self.assertGreater(rate, 0)
+        self.assertAlmostEqual(self.model.rate("opencv-x2"), rate)
+
+        self.model.record("opencv-x2", 1000, 1.0)
+        self.assertEqual(self.model.rate("opencv-x2"), 1000)
+        self.model.record("opencv-x2", 3000, 1.0)
+        self.assertEqual(self.model.rate("opencv-x2"), 2000)
+        # A later calibration never overrides what real jobs measured
+        self.model.calibrate("opencv-x2", OpenCVUpscaler(2), frames=2)
+        self.assertEqual(self.model.rates()[0]["samples"], 2)
+        self.assertEqual(self.model.rate("opencv-x2"), 2000)
+
+if __name__ == '__main__':
+    unittest.main()
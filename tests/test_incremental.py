@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from app.core.ai_upscaler import AIUpscaler
+from app.core.base import OpenCVUpscaler
+from app.core.incremental import IncrementalUpscaler
+from app.core.metrics import JobMetrics, MetricsRegistry
+from tests.test_ai_upscaler import create_tiny_model
+
+class CountingUpscaler(OpenCVUpscaler):
+    """OpenCV upscaler that counts the input pixels it processed."""
+    def __init__(self, scale_factor):
+        super().__init__(scale_factor)
+        self.pixels = 0
+
+    def upscale_array(self, img):
+        self.pixels += img.shape[0] * img.shape[1]
+        return super().upscale_array(img)
+
+class TestIncrementalUpscaler(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.background = rng.integers(0, 256, (64, 96, 3), dtype=np.uint8)
+        self.moved = self.background.copy()
+        self.moved[40:48, 70:78] = 255
+
+    def test_only_changed_tiles_are_recomputed(self):
+        """A small change re-runs one tile plus margin and matches a full upscale."""
+        upscaler = CountingUpscaler(2)
+        incremental = IncrementalUpscaler(upscaler, tile_size=32, margin=4, refresh_interval=0)
+        first, unchanged, moved = incremental.upscale_batch([self.background, self.background.copy(), self.moved])
+
+        self.assertEqual((incremental.tiles_checked, incremental.tiles_recomputed), (18, 7))
+        self.assertEqual(upscaler.pixels, 64 * 96 + 36 * 36)
+        np.testing.assert_array_equal(unchanged, first)
+        np.testing.assert_array_equal(moved, OpenCVUpscaler(2).upscale_array(self.moved))
+
+    def test_writes_into_out(self):
+        """With out= the composited frames match the returned ones and earlier results stay intact."""
+        frames = [self.background, self.background.copy(), self.moved]
+        expected = IncrementalUpscaler(CountingUpscaler(2), tile_size=32, refresh_interval=0).upscale_batch(frames)
+        incremental = IncrementalUpscaler(CountingUpscaler(2), tile_size=32, refresh_interval=0)
+        first = incremental.upscale_batch(frames[:1])[0]
+        kept = first.copy()
+        ring = np.zeros((2, 128, 192, 3), dtype=np.uint8)
+        incremental.upscale_batch(frames[1:], out=list(ring))
+
+        np.testing.assert_array_equal(first, kept)
+        np.testing.assert_array_equal(ring[0], expected[1])
+        np.testing.assert_array_equal(ring[1], expected[2])
+
+    def test_small_change_in_large_tile(self):
+        """A few changed pixels mark their tile changed however large it is."""
+        incremental = IncrementalUpscaler(CountingUpscaler(2), tile_size=64, refresh_interval=0)
+        cursor = self.background.copy()
+        cursor[10:12, 20:22] ^= 0x80
+        incremental.upscale_batch([self.background, cursor])
+        self.assertEqual((incremental.tiles_checked, incremental.tiles_recomputed), (4, 3))
+
+    def test_threshold_and_refresh(self):
+        """Noise below the threshold is skipped until it adds up; refreshes run the whole frame."""
+        incremental = IncrementalUpscaler(CountingUpscaler(2), tile_size=32, threshold=2.0, refresh_interval=0)
+        frames = [np.clip(self.background.astype(int) + step, 0, 255).astype(np.uint8) for step in range(4)]
+        incremental.upscale_batch(frames[:3])
+        # +1 and +2 stay within the threshold of the first frame, +3 does not
+        self.assertEqual(incremental.tiles_recomputed, 6)
+        incremental.upscale_batch(frames[3:])
+        self.assertEqual(incremental.tiles_recomputed, 12)
+
+        refreshing = IncrementalUpscaler(CountingUpscaler(2), tile_size=32, refresh_interval=3)
+        refreshing.upscale_batch([self.background] * 4)
+        self.assertEqual(refreshing.tiles_recomputed, 12)
+
+    def test_model_tiles_stay_close_to_full_frames(self):
+        """With context margin, model output for changed tiles blends in with the full frame."""
+        model_dir = tempfile.mkdtemp()
+        try:
+            model_path = os.path.join(model_dir, "tiny_x4.pth")
+            create_tiny_model(model_path)
+            upscaler = AIUpscaler(scale_factor=4, model_path=model_path)
+            incremental = IncrementalUpscaler(upscaler, tile_size=32, margin=8, refresh_interval=0)
+            result = incremental.upscale_batch([self.background, self.moved])[1]
+            full = upscaler.upscale_array(self.moved)
+            self.assertEqual(incremental.tiles_recomputed, 7)
+            self.assertLess(np.abs(full.astype(int) - result.astype(int)).mean(), 1)
+        finally:
+            shutil.rmtree(model_dir, ignore_errors=True)
+
+    def test_exported_metric_names(self):
+        """Tile counters reach /metrics under their own names, with a single _total."""
+        incremental = IncrementalUpscaler(CountingUpscaler(2), tile_size=32, refresh_interval=0)
+        incremental.upscale_batch([self.background, self.moved])
+        # Same counters the pipeline records for an incremental range
+        metrics = JobMetrics()
+        metrics.count("tiles_checked", incremental.tiles_checked)
+        metrics.count("tiles_recomputed", incremental.tiles_recomputed)
+        registry = MetricsRegistry()
+        registry.record_job("completed", metrics.as_dict())
+        text = registry.render()
+
+        self.assertIn("upscale_tiles_checked_total 12", text)
+        self.assertIn("upscale_tiles_recomputed_total 7", text)
+        self.assertNotIn("_total_total", text)
+
+if __name__ == "__main__":
+    unittest.main()
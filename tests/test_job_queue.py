@@ -0,0 +1,108 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from app.core.job_queue import JobQueue, QueueFullError
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "jobs.db")
+        self.ran = []
+        self.done = threading.Event()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def handler(self, job, progress_callback):
+        progress_callback(10, 10)
+        self.ran.append(job["filename"])
+        if len(self.ran) == 3:
+            self.done.set()
+        return {"status": "success"}
+
+    def test_priority_order_and_completion(self):
+        """Higher priority jobs run first and finish with progress and fps recorded."""
+        queue = JobQueue(self.db_path, self.handler, max_workers=1)
+        low = queue.submit("a.mp4", {"scale": 2}, filename="low")
+        queue.submit("b.mp4", {"scale": 2}, priority=5, filename="high")
+        queue.submit("c.mp4", {"scale": 2}, filename="low-later")
+        self.assertEqual(queue.get(low["task_id"])["queue_position"], 2)
+
+        queue.start()
+        self.assertTrue(self.done.wait(10))
+        queue.stop(timeout=5)
+
+        self.assertEqual(self.ran, ["high", "low", "low-later"])
+        job = queue.get(low["task_id"])
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["progress"], 100.0)
+        self.assertEqual(job["result"], {"status": "success"})
+
+    def test_shortest_job_first(self):
+        """With order="sjf", equal-priority jobs run shortest estimate first and ETAs add up."""
+        queue = JobQueue(self.db_path, self.handler, max_workers=1, order="sjf")
+        long_job = queue.submit("a.mp4", {}, filename="long", estimated_sec=60)
+        queue.submit("b.mp4", {}, filename="unknown")
+        short_job = queue.submit("c.mp4", {}, filename="short", estimated_sec=10)
+
+        self.assertEqual(queue.get(short_job["task_id"])["queue_position"], 1)
+        self.assertEqual(queue.get(short_job["task_id"])["eta_sec"], 10)
+        self.assertEqual(queue.get(long_job["task_id"])["eta_sec"], 70)
+        self.assertEqual(queue.estimate_wait(estimated_sec=30), 10)
+        self.assertEqual(queue.estimate_wait(priority=1), 0)
+
+        queue.start()
+        self.assertTrue(self.done.wait(10))
+        queue.stop(timeout=5)
+        self.assertEqual(self.ran, ["short", "long", "unknown"])
+
+    def test_admission_control(self):
+        """Submitting beyond max_queued raises QueueFullError."""
+        queue = JobQueue(self.db_path, self.handler, max_queued=1)
+        queue.submit("a.mp4", {})
+        self.assertTrue(queue.is_full())
+        with self.assertRaises(QueueFullError):
+            queue.submit("b.mp4", {})
+
+    def test_queue_survives_restart(self):
+        """Queued jobs persist in SQLite and are visible to a new queue instance."""
+        first = JobQueue(self.db_path, self.handler)
+        job = first.submit("a.mp4", {"scale": 4}, filename="kept")
+
+        second = JobQueue(self.db_path, self.handler)
+        restored = second.get(job["task_id"])
+        self.assertEqual(restored["status"], "queued")
+        self.assertEqual(restored["config"], {"scale": 4})
+
+    def test_interrupted_jobs_are_requeued(self):
+        """A job left processing by a crash is queued again on recovery, up to max_attempts."""
+        first = JobQueue(self.db_path, self.handler, max_attempts=1)
+        job = first.submit("a.mp4", {}, filename="crashed")
+        first._claim_next()
+
+        second = JobQueue(self.db_path, self.handler, max_attempts=2)
+        second.recover()
+        self.assertEqual(second.get(job["task_id"])["status"], "queued")
+
+        second._claim_next()
+        third = JobQueue(self.db_path, self.handler, max_attempts=2)
+        third.recover()
+        self.assertEqual(third.get(job["task_id"])["status"], "failed")
+
+    def test_identical_jobs_are_coalesced(self):
+        """A job with the cache key of an active job joins it instead of queueing again."""
+        queue = JobQueue(self.db_path, self.handler, max_queued=1)
+        first = queue.submit("a.mp4", {}, cache_key="same")
+        second = queue.submit("b.mp4", {}, cache_key="same")
+        self.assertEqual(second["task_id"], first["task_id"])
+        self.assertEqual(queue.counts(), {"queued": 1})
+
+        # Once finished, the same key starts a new job
+        queue._update(first["task_id"], status="completed")
+        third = queue.submit("c.mp4", {}, cache_key="same")
+        self.assertNotEqual(third["task_id"], first["task_id"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from app.core.metrics import JobMetrics, MetricsRegistry, profiled
+
+class TestJobMetrics(unittest.TestCase):
+    def test_stages_and_merge(self):
+        """Stage time accumulates, iterator waits are charged and worker metrics merge in."""
+        metrics = JobMetrics()
+        with metrics.stage("upscale"):
+            time.sleep(0.01)
+
+        def slow_items():
+            for i in range(3):
+                time.sleep(0.01)
+                yield i
+
+        self.assertEqual(list(metrics.timed_iter("decode", slow_items())), [0, 1, 2])
+        metrics.count("frames", 3)
+        metrics.merge({"stages_sec": {"upscale": 1.0}, "counters": {"frames": 2, "temp_bytes": 10}})
+
+        result = metrics.as_dict()
+        self.assertGreaterEqual(result["stages_sec"]["decode"], 0.03)
+        self.assertGreater(result["stages_sec"]["upscale"], 1.0)
+        self.assertEqual(result["counters"], {"frames": 5, "temp_bytes": 10})
+
+    def test_prometheus_render(self):
+        registry = MetricsRegistry()
+        registry.record_job("completed", {"stages_sec": {"decode": 1.5}, "counters": {"frames": 48, "retries_total": 1}},
+                            queue_wait=2.0)
+        registry.record_job("failed", queue_wait=1.0)
+        text = registry.render([("upscale_queue_jobs", "Jobs by status.", 3, {"status": "queued"})])
+
+        self.assertIn('upscale_stage_seconds_total{stage="decode"} 1.5', text)
+        self.assertIn('upscale_jobs_total{status="completed"} 1', text)
+        self.assertIn('upscale_jobs_total{status="failed"} 1', text)
+        self.assertIn("upscale_frames_total 48", text)
+        self.assertIn("upscale_retries_total 1", text)
+        self.assertNotIn("_total_total", text)
+        self.assertIn("# TYPE upscale_queue_wait_seconds summary", text)
+        self.assertIn("upscale_queue_wait_seconds_sum 3.0", text)
+        self.assertIn("upscale_queue_wait_seconds_count 2", text)
+        self.assertNotIn("# TYPE upscale_queue_wait_seconds_sum", text)
+        self.assertIn("# TYPE upscale_queue_jobs gauge", text)
+        self.assertIn('upscale_queue_jobs{status="queued"} 3', text)
+
+    def test_cprofile_report(self):
+        work_dir = tempfile.mkdtemp()
+        try:
+            with profiled("cprofile", os.path.join(work_dir, "job_profile")) as report:
+                sum(range(1000))
+            self.assertTrue(os.path.exists(report["path"]))
+
+            with profiled("off", os.path.join(work_dir, "unused")) as report:
+                pass
+            self.assertNotIn("path", report)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from app.core.ai_upscaler import AIUpscaler
+from app.core.base import ChainedUpscaler
+from app.core.model_catalog import ModelCatalog, plan_models, select_models
+from app.core.model_registry import ModelRegistry
+from tests.test_ai_upscaler import create_tiny_model
+
+class TestModelCatalog(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model_dir = tempfile.mkdtemp()
+        cls.manifest_path = os.path.join(cls.model_dir, "manifest.json")
+        catalog = ModelCatalog(cls.manifest_path)
+        for scale in (2, 4):
+            path = os.path.join(cls.model_dir, f"tiny_x{scale}.pth")
+            create_tiny_model(path, scale=scale)
+            catalog.register(path)
+        cls.x2, cls.x4 = catalog.available()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+
+    def names(self, chain):
+        return [entry["name"] for entry in chain]
+
+    def test_register_records_native_scale(self):
+        catalog = ModelCatalog(self.manifest_path)
+        self.assertEqual([(m["name"], m["scale"], m["architecture"]) for m in catalog.models],
+                         [("tiny_x2", 2, "ESRGAN"), ("tiny_x4", 4, "ESRGAN")])
+
+    def test_plan_prefers_native_scale(self):
+        self.assertEqual(self.names(plan_models([self.x4, self.x2], 2)), ["tiny_x2"])
+        self.assertEqual(self.names(plan_models([self.x4, self.x2], 4)), ["tiny_x4"])
+        # Order within a chain is left to the cost estimate
+        self.assertEqual(sorted(self.names(plan_models([self.x4, self.x2], 8))), ["tiny_x2", "tiny_x4"])
+
+    def test_plan_chains_or_resizes_without_native_model(self):
+        # Two x2 passes before falling back to resizing an x4 result
+        self.assertEqual(self.names(plan_models([self.x2], 4)), ["tiny_x2", "tiny_x2"])
+        self.assertEqual(self.names(plan_models([self.x4], 2)), ["tiny_x4"])
+        self.assertEqual(self.names(plan_models([self.x2], 3)), ["tiny_x2", "tiny_x2"])
+        self.assertEqual(plan_models([], 2), [])
+
+    def test_select_models_honours_model_path(self):
+        config = {"MODEL_PATH": self.x4["path"], "MODEL_MANIFEST": self.manifest_path}
+        self.assertEqual(self.names(select_models(config, 2)), ["tiny_x2"])
+        fixed = dict(config, MODEL_SELECTION="fixed")
+        self.assertEqual(self.names(select_models(fixed, 2)), ["tiny_x4"])
+
+    def test_select_models_cached_until_files_change(self):
+        """The plan is reused without inspecting weights, and redone once a model file or the manifest changes."""
+        model_dir = tempfile.mkdtemp()
+        try:
+            manifest_path = os.path.join(model_dir, "manifest.json")
+            listed = os.path.join(model_dir, "tiny_x2.pth")
+            loose = os.path.join(model_dir, "loose_x4.pth")
+            shutil.copy(self.x2["path"], listed)
+            shutil.copy(self.x4["path"], loose)
+            catalog = ModelCatalog(manifest_path)
+            catalog.register(listed)
+            config = {"MODEL_PATH": loose, "MODEL_MANIFEST": manifest_path}
+
+            self.assertEqual(self.names(select_models(config, 4)), ["loose_x4"])
+            with mock.patch("app.core.model_catalog.inspect_model") as inspect:
+                self.assertEqual(self.names(select_models(config, 4)), ["loose_x4"])
+                inspect.assert_not_called()
+
+            os.remove(loose)
+            self.assertEqual(self.names(select_models(config, 4)), ["tiny_x2", "tiny_x2"])
+            catalog.models = []
+            catalog.save()
+            self.assertEqual(select_models(config, 4), [])
+        finally:
+            shutil.rmtree(model_dir, ignore_errors=True)
+
+    def test_chained_upscaler_reaches_exact_size(self):
+        registry = ModelRegistry()
+        frame = np.random.default_rng(0).integers(0, 256, (12, 16, 3), dtype=np.uint8)
+        stages = [AIUpscaler(scale_factor=2, model_path=self.x2["path"], registry=registry) for _ in range(2)]
+        chained = ChainedUpscaler(stages, 4)
+        self.assertEqual(chained.upscale_array(frame).shape, (48, 64, 3))
+        self.assertEqual(chained.fallback_frames, 0)
+
+        shrunk = ChainedUpscaler([AIUpscaler(scale_factor=4, model_path=self.x4["path"], registry=registry)], 3)
+        self.assertEqual(shrunk.upscale_batch([frame])[0].shape, (36, 48, 3))
+        chained.close()
+        shrunk.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+from app.core.base import OpenCVUpscaler, INTERPOLATIONS
+
+class TestOpenCVUpscaler(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.frames = [rng.integers(0, 256, (24, 32, 3), dtype=np.uint8) for _ in range(9)]
+
+    def test_threaded_batch_keeps_order(self):
+        """The thread pool returns the same frames, in order, as the serial path."""
+        serial = OpenCVUpscaler(2, threads=1)
+        threaded = OpenCVUpscaler(2, threads=4)
+        expected = [serial.upscale_array(f) for f in self.frames]
+        result = threaded.upscale_batch(self.frames)
+        threaded.close()
+
+        self.assertEqual(len(result), len(expected))
+        for a, b in zip(result, expected):
+            np.testing.assert_array_equal(a, b)
+
+    def test_batch_writes_into_out(self):
+        """With out= the frames land in the caller's arrays, sharpened or not."""
+        for sharpen in (0.0, 0.5):
+            upscaler = OpenCVUpscaler(2, sharpen=sharpen, threads=4)
+            ring = np.zeros((len(self.frames), 48, 64, 3), dtype=np.uint8)
+            upscaler.upscale_batch(self.frames, out=list(ring))
+            upscaler.close()
+            for slot, frame in zip(ring, self.frames):
+                np.testing.assert_array_equal(slot, upscaler.upscale_array(frame))
+
+    def test_interpolations_and_sharpen(self):
+        """Every kernel produces the scaled size; sharpening changes the output."""
+        for name in INTERPOLATIONS:
+            out = OpenCVUpscaler(3, interpolation=name).upscale_array(self.frames[0])
+            self.assertEqual(out.shape, (72, 96, 3))
+
+        plain = OpenCVUpscaler(2).upscale_array(self.frames[0])
+        sharp = OpenCVUpscaler(2, sharpen=0.5).upscale_array(self.frames[0])
+        self.assertFalse(np.array_equal(plain, sharp))
+
+        with self.assertRaises(ValueError):
+            OpenCVUpscaler(2, interpolation="bogus")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import threading
+import unittest
+import numpy as np
+from app.core.metrics import JobMetrics
+from app.core.overlap import run_overlapped
+
+class CountingReader:
+    """Stands in for FrameReader: frame i is filled with the value i."""
+    def __init__(self, frames):
+        self.frames = frames
+        self.next = 0
+
+    def readinto(self, frame):
+        if self.next == self.frames:
+            return False
+        frame[...] = self.next
+        self.next += 1
+        return True
+
+class CollectingWriter:
+    """Stands in for FrameWriter, optionally failing after some frames."""
+    def __init__(self, fail_after=None):
+        self.frames = []
+        self.fail_after = fail_after
+
+    def write(self, frame):
+        if self.fail_after is not None and len(self.frames) == self.fail_after:
+            raise RuntimeError("encoder died")
+        self.frames.append(frame.copy())
+
+def double(frames, out):
+    for frame, target in zip(frames, out):
+        target[...] = np.repeat(np.repeat(frame, 2, axis=0), 2, axis=1)
+    return out
+
+class TestRunOverlapped(unittest.TestCase):
+    def run_stages(self, reader, writer, upscale_batch=double, ring_frames=3):
+        return run_overlapped(reader, writer, upscale_batch, 2, (4, 6, 3), (8, 12, 3), ring_frames, JobMetrics())
+
+    def test_frames_arrive_in_order(self):
+        """Every frame passes through a small ring, in order and upscaled."""
+        writer = CollectingWriter()
+        self.assertEqual(self.run_stages(CountingReader(11), writer), 11)
+        self.assertEqual([int(frame[0, 0, 0]) for frame in writer.frames], list(range(11)))
+        self.assertEqual(writer.frames[0].shape, (8, 12, 3))
+
+    def test_stage_failures_propagate(self):
+        """An error in any stage stops the others and is raised to the caller."""
+        threads_before = threading.active_count()
+        with self.assertRaisesRegex(RuntimeError, "encoder died"):
+            self.run_stages(CountingReader(50), CollectingWriter(fail_after=5))
+
+        def broken(frames, out):
+            raise ValueError("inference failed")
+
+        with self.assertRaisesRegex(ValueError, "inference failed"):
+            self.run_stages(CountingReader(50), CollectingWriter(), upscale_batch=broken)
+        self.assertEqual(threading.active_count(), threads_before)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 import os
 import shutil
+import subprocess
+import cv2
 from dotenv import dotenv_values
 from app.core.pipeline import UpscalePipeline
 from tests.create_dummy_video import create_test_video
@@ -47,6 +49,120 @@ class TestVideoUpscaling(unittest.TestCase):
         except Exception as e:
             self.fail(f"Metadata extraction failed: {e}. Ensure ffprobe is installed.")
 
+    def test_read_frames_streaming(self):
+        """Test that frames are decoded in memory with the expected shape."""
+        meta = self.pipeline.ffmpeg.get_video_metadata(self.test_input)
+        frames = list(self.pipeline.ffmpeg.read_frames(self.test_input, meta['width'], meta['height']))
+        self.assertEqual(len(frames), meta['frames'])
+        self.assertEqual(frames[0].shape, (240, 320, 3))
+
+    def test_chunked_frames_match_serial(self):
+        """Frames read chunk by chunk must be exactly the frames of a full decode."""
+        from app.core.chunking import plan_chunks
+        ffmpeg = self.pipeline.ffmpeg
+        meta = ffmpeg.get_video_metadata(self.test_input)
+        serial = list(ffmpeg.read_frames(self.test_input, meta['width'], meta['height']))
+
+        chunks = plan_chunks(ffmpeg, self.test_input, meta, mode="time", chunk_seconds=0.5)
+        self.assertGreater(len(chunks), 1)
+        chunked = []
+        for start, count in chunks:
+            chunked += ffmpeg.read_frames(self.test_input, meta['width'], meta['height'], start, count, meta['fps'])
+
+        self.assertEqual(len(chunked), len(serial))
+        for a, b in zip(chunked, serial):
+            self.assertTrue((a == b).all())
+
+    def test_overlapped_matches_serial(self):
+        """Running decode / upscale / encode concurrently writes the same frames."""
+        meta = self.pipeline.ffmpeg.get_video_metadata(self.test_input)
+        outputs = []
+        for overlap in ("True", "False"):
+            pipeline = UpscalePipeline(dict(self.config, OVERLAP=overlap, RING_FRAMES="3"))
+            output_path = os.path.join(self.config["TEMP_DIR"], f"overlap_{overlap}.mp4")
+            written, _ = pipeline.upscale_range(self.test_input, meta, output_path)
+            self.assertEqual(written, 48)
+            outputs.append(list(pipeline.ffmpeg.read_frames(output_path, 640, 480)))
+            pipeline.close()
+        for a, b in zip(*outputs):
+            self.assertTrue((a == b).all())
+
+    def test_parallel_pipeline_opencv(self):
+        """Chunked processing across worker processes produces the full video."""
+        config = dict(self.config, WORKERS="2", CHUNK_SECONDS="0.5")
+        pipeline = UpscalePipeline(config)
+        result = pipeline.process(self.test_input)
+
+        self.assertEqual(result['frames'], 48)
+        self.assertEqual(result['new_resolution'], "640x480")
+        meta = pipeline.ffmpeg.get_video_metadata(result['output_path'])
+        self.assertEqual(meta['frames'], 48)
+        # Worker metrics are merged into the job's totals
+        self.assertEqual(result['metrics']['counters']['frames'], 48)
+        for stage in ("probe", "plan", "decode", "upscale", "encode", "mux"):
+            self.assertIn(stage, result['metrics']['stages_sec'])
+
+    def test_resume_after_failure(self):
+        """A job that dies midway resumes from its finished chunks on the next run."""
+        config = dict(self.config, CHUNK_SECONDS="0.5")
+        failing = UpscalePipeline(config)
+        upscale_array = failing.upscaler.upscale_array
+        calls = []
+
+        def fail_after_two_chunks(img):
+            calls.append(1)
+            if len(calls) > 24:
+                raise RuntimeError("simulated crash")
+            return upscale_array(img)
+
+        failing.upscaler.upscale_array = fail_after_two_chunks
+        with self.assertRaises(RuntimeError):
+            failing.process(self.test_input)
+
+        result = UpscalePipeline(config).process(self.test_input)
+        self.assertEqual(result['frames'], 48)
+        self.assertEqual(result['frames_resumed'], 24)
+        self.assertEqual([d for d in os.listdir(config["TEMP_DIR"]) if d.startswith("resume_")], [])
+
+    def test_streamed_output(self):
+        """Finished chunks are listed in the playlist while the job is still running."""
+        config = dict(self.config, STREAM_OUTPUT="True", CHECKPOINT="False", CHUNK_SECONDS="0.5")
+        pipeline = UpscalePipeline(config)
+        playlist_path = os.path.join(config["OUTPUT_DIR"], "streams", "test_input", "index.m3u8")
+        listed = []
+
+        def record_playlist(done, total):
+            with open(playlist_path) as f:
+                playlist = f.read()
+            listed.append((playlist.count("#EXTINF"), "#EXT-X-ENDLIST" in playlist))
+
+        result = pipeline.process(self.test_input, progress_callback=record_playlist)
+
+        self.assertEqual(result['playlist_path'], playlist_path)
+        counts = [count for count, ended in listed]
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(counts[-1], 4)
+        # Segments appear chunk by chunk and the playlist only ends with the job
+        self.assertIn(1, counts)
+        self.assertFalse(any(ended for count, ended in listed))
+        with open(playlist_path) as f:
+            self.assertTrue(f.read().rstrip().endswith("#EXT-X-ENDLIST"))
+        # The playlist plays back as the whole video
+        joined_path = os.path.join(config["TEMP_DIR"], "joined.mp4")
+        subprocess.run([pipeline.ffmpeg.ffmpeg, "-v", "error", "-y", "-i", playlist_path, "-c", "copy", joined_path], check=True)
+        self.assertEqual(pipeline.ffmpeg.get_video_metadata(joined_path)['frames'], 48)
+        self.assertEqual(pipeline.ffmpeg.get_video_metadata(result['output_path'])['frames'], 48)
+
+    def test_preview_samples_frames(self):
+        """A preview writes side-by-side stills and projects the full run from them."""
+        result = self.pipeline.preview(self.test_input, frames=2, clip_seconds=0.25)
+
+        self.assertEqual(len(result['stills']), 2)
+        still = cv2.imread(result['stills'][0])
+        self.assertEqual(still.shape, (480, 1280, 3))
+        self.assertEqual(self.pipeline.ffmpeg.get_video_metadata(result['clip_path'])['frames'], 6)
+        self.assertGreater(result['projected_sec'], 0)
+
     def test_full_pipeline_opencv(self):
         """Test the full pipeline using OpenCV fallback."""
         try:
@@ -0,0 +1,83 @@
+import os
+import shutil
+import unittest
+from app.core.base import OpenCVUpscaler
+from app.core.pipeline import UpscalePipeline
+from app.core.resources import ResourceManager, available_cores, parse_cores
+from tests.create_dummy_video import create_test_video
+
+class TestResourceManager(unittest.TestCase):
+    def test_parse_cores(self):
+        self.assertEqual(parse_cores("0-3, 8,10-11"), [0, 1, 2, 3, 8, 10, 11])
+        self.assertEqual(parse_cores(""), [])
+
+    def test_shares_follow_running_jobs(self):
+        """Budgets shrink as jobs are admitted and grow back as they finish."""
+        manager = ResourceManager(cores=range(8), max_jobs=3)
+        first = manager.acquire("a")
+        self.assertEqual(first.threads, 8)
+        second = manager.acquire("b")
+        self.assertEqual((first.threads, second.threads), (4, 4))
+        self.assertEqual(manager.budgets(), [("a", 4), ("b", 4)])
+
+        first.release()
+        self.assertEqual(manager.budgets(), [("b", 8)])
+        manager.acquire("c")
+        manager.acquire("d")
+        self.assertEqual(second.threads, 2)
+        self.assertEqual(manager.pool_threads, 2)
+
+    def test_more_jobs_than_cores_share(self):
+        manager = ResourceManager(cores=[0, 1], max_jobs=3)
+        budgets = [manager.acquire(job_id) for job_id in "abc"]
+        self.assertEqual([budget.threads for budget in budgets], [1, 1, 1])
+
+    def test_process_pools_are_sized_once(self):
+        manager = ResourceManager(cores=available_cores(), pin=hasattr(os, "sched_setaffinity"))
+        if manager.pin:
+            self.assertEqual(sorted(os.sched_getaffinity(0)), manager.cores)
+        with manager.acquire("a") as first, manager.acquire("b") as second:
+            first.apply()
+            self.assertFalse(second.apply())
+        self.assertEqual(manager.budgets(), [])
+
+class TestPipelineBudget(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = {
+            "SCALE_FACTOR": "2",
+            "OUTPUT_DIR": "tests/storage_resources/outputs",
+            "TEMP_DIR": "tests/storage_resources/temp",
+            "USE_AI": "False",
+            "CHECKPOINT": "False"
+        }
+        for key in ("OUTPUT_DIR", "TEMP_DIR"):
+            os.makedirs(cls.config[key], exist_ok=True)
+        cls.test_input = "tests/storage_resources/input.mp4"
+        create_test_video(cls.test_input)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree("tests/storage_resources", ignore_errors=True)
+
+    def test_pipeline_follows_budget(self):
+        """The OpenCV frame pool and FFmpeg threads take the job's current share of the cores."""
+        manager = ResourceManager(cores=range(8), max_jobs=2)
+        budget = manager.acquire("job")
+        pipeline = UpscalePipeline(self.config, budget=budget)
+        self.assertIsInstance(pipeline.upscaler, OpenCVUpscaler)
+
+        result = pipeline.process(self.test_input)
+        self.assertEqual(result['frames'], 48)
+        self.assertEqual((pipeline.ffmpeg.threads, pipeline.upscaler.threads), (8, 8))
+
+        # A second job is admitted mid-run: the next batch is capped at half
+        other = manager.acquire("other")
+        pipeline._apply_budget()
+        self.assertEqual((pipeline.ffmpeg.threads, pipeline.upscaler.threads), (4, 4))
+        other.release()
+        budget.release()
+        pipeline.close()
+
+if __name__ == '__main__':
+    unittest.main()
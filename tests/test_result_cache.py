@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+from app.core.pipeline import job_settings
+from app.core.result_cache import ResultCache, cache_key
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = ResultCache(os.path.join(self.tmp_dir, "jobs.db"), max_bytes=250)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def add_entry(self, name, size=50):
+        """Create an upload/output pair of size bytes each and cache it."""
+        paths = []
+        for kind in ("input", "output"):
+            path = os.path.join(self.tmp_dir, f"{name}_{kind}.mp4")
+            with open(path, "wb") as f:
+                f.write(b"\0" * size)
+            paths.append(path)
+        key = cache_key(name, {"SCALE_FACTOR": "2", "MODELS": "model"})
+        self.cache.put(key, paths[0], {"output_path": paths[1]})
+        return key, paths
+
+    def test_key_depends_on_settings(self):
+        settings = job_settings({"SCALE_FACTOR": "2", "USE_AI": "True", "DEDUPE": "off"}, ["model"])
+        self.assertEqual(cache_key("abc", settings), cache_key("abc", dict(reversed(list(settings.items())))))
+        for change in ({"SCALE_FACTOR": "4"}, {"USE_AI": "False"}, {"DEDUPE": "perceptual"}, {"INCREMENTAL": "True"},
+                       {"PRECISION": "int8"}, {"SHARPEN": "0.5"}):
+            self.assertNotEqual(cache_key("abc", settings), cache_key("abc", dict(settings, **change)), change)
+        self.assertNotEqual(cache_key("abc", settings), cache_key("abd", settings))
+
+    def test_hit_and_lru_eviction(self):
+        """Over the size cap the least recently used entry and its files are removed."""
+        first, first_paths = self.add_entry("first")
+        second, second_paths = self.add_entry("second")
+        self.assertEqual(self.cache.get(first)["result"]["output_path"], first_paths[1])
+
+        # first was just used, so adding a third entry evicts second
+        self.add_entry("third")
+        self.assertIsNone(self.cache.get(second))
+        self.assertFalse(any(os.path.exists(path) for path in second_paths))
+        self.assertIsNotNone(self.cache.get(first))
+        self.assertEqual(self.cache.total_bytes(), 200)
+
+    def test_missing_output_is_a_miss(self):
+        key, paths = self.add_entry("gone")
+        os.remove(paths[1])
+        self.assertIsNone(self.cache.get(key))
+
+if __name__ == "__main__":
+    unittest.main()
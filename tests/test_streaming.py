@@ -0,0 +1,40 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from app.core.streaming import _init_size
+
+def box(box_type, payload=b"", size=None):
+    return struct.pack(">I4s", len(payload) + 8 if size is None else size, box_type) + payload
+
+class TestInitSize(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def init_size(self, content):
+        path = os.path.join(self.dir, "segment.mp4")
+        with open(path, "wb") as f:
+            f.write(content)
+        return _init_size(path)
+
+    def test_finds_first_fragment(self):
+        large = struct.pack(">I4sQ", 1, b"moov", 20) + b"\0" * 4
+        self.assertEqual(self.init_size(box(b"ftyp", b"\0" * 8) + large + box(b"moof")), 36)
+
+    def test_rejects_malformed_boxes(self):
+        """Boxes that run to the end of file or are smaller than their header end the scan."""
+        for content in (
+            box(b"ftyp", b"\0" * 8) + box(b"mdat", b"\0" * 8, size=0),
+            box(b"ftyp", size=4) + box(b"moof"),
+            struct.pack(">I4sQ", 1, b"moov", 8) + box(b"moof"),
+            box(b"ftyp", b"\0" * 8)
+        ):
+            with self.assertRaises(ValueError):
+                self.init_size(content)
+
+if __name__ == '__main__':
+    unittest.main()